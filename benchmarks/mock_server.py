@@ -0,0 +1,223 @@
+import re
+import json
+import time
+import pathlib
+import argparse
+import threading
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+BENCH_DIR = pathlib.Path(__file__).resolve().parent
+FIXTURES_DIR = BENCH_DIR / "fixtures"
+SCENARIOS_PATH = BENCH_DIR / "scenarios.json"
+
+# Every benchmark prompt starts with this tag; it selects the script the server replays
+_TAG = re.compile(r"\[bench scenario=(?P<scenario>[\w-]+) session=(?P<session>[\w-]+)\]")
+
+# Tool call arguments are streamed in this many fragments, as real servers split them
+ARGUMENT_FRAGMENTS = 3
+
+
+def load_scenarios(path=SCENARIOS_PATH) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def bench_prompt(scenario, session, text="") -> str:
+    return f"[bench scenario={scenario} session={session}] {text}".strip()
+
+
+def _fill(value, variables):
+    """Replaces {name} placeholders in every string of a scripted step."""
+    if isinstance(value, str):
+        for name, replacement in variables.items():
+            value = value.replace("{" + name + "}", replacement)
+        return value
+    if isinstance(value, list):
+        return [_fill(item, variables) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, variables) for key, item in value.items()}
+    return value
+
+
+def step_deltas(step) -> list:
+    """Splits a scripted step into the chat.completion.chunk deltas it is streamed as."""
+    if "tool_calls" not in step:
+        return [{"content": word} for word in re.findall(r"\S+\s*", step.get("text", ""))] or [{"content": ""}]
+
+    deltas = []
+    for index, call in enumerate(step["tool_calls"]):
+        arguments = json.dumps(call.get("arguments", {}), ensure_ascii=False)
+        size = -(-len(arguments) // ARGUMENT_FRAGMENTS)
+        fragments = [arguments[i:i + size] for i in range(0, len(arguments), size)] or ["{}"]
+        for number, fragment in enumerate(fragments):
+            entry = {"index": index, "function": {"arguments": fragment}}
+            if number == 0:
+                # Only the first fragment of a call carries its id and name
+                entry.update(id=f"call_{index}", type="function")
+                entry["function"]["name"] = call["name"]
+            deltas.append({"tool_calls": [entry]})
+    return deltas
+
+
+def model_seconds(step, latency, chunk_delay) -> float:
+    """Time the server spends before and between the chunks of a step."""
+    return latency + chunk_delay * (len(step_deltas(step)) - 1)
+
+
+def select_step(scenarios, messages, base_url):
+    """
+    Picks the scripted step for a request. The step index is the number of assistant
+    tool-call messages since the last user message, so the server keeps no state and
+    any number of sessions can run at once.
+    """
+    last_user = max((i for i, message in enumerate(messages) if message.get("role") == "user"), default=None)
+    if last_user is None:
+        return {"text": "Hello."}
+    match = _TAG.search(str(messages[last_user].get("content") or ""))
+    if match is None or match["scenario"] not in scenarios:
+        return {"text": "Hello."}
+
+    steps = scenarios[match["scenario"]]["steps"]
+    index = sum(1 for message in messages[last_user + 1:]
+                if message.get("role") == "assistant" and message.get("tool_calls"))
+    step = steps[min(index, len(steps) - 1)]
+    return _fill(step, {"session": match["session"], "base_url": base_url})
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /v1/chat/completions plus fixture pages and a Serper-style search."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body: bytes, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data, status=200):
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json")
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json({"ok": True})
+        elif self.path == "/stats":
+            with self.server.stats_lock:
+                self._send_json(dict(self.server.stats))
+        elif self.path.startswith("/fixtures/"):
+            path = (FIXTURES_DIR / urlsplit(self.path).path[len("/fixtures/"):]).resolve()
+            if path.parent != FIXTURES_DIR or not path.is_file():
+                self._send_json({"error": "not found"}, status=404)
+                return
+            content_type = "text/html; charset=utf-8" if path.suffix == ".html" else "application/octet-stream"
+            self._send(200, path.read_bytes(), content_type)
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        if self.path == "/v1/chat/completions":
+            self._count("completions")
+            self._completion(self._read_json())
+        elif self.path == "/serper/search":
+            self._count("searches")
+            query = self._read_json().get("q", "")
+            with open(FIXTURES_DIR / "search.json", "r", encoding="utf-8") as f:
+                results = _fill(json.load(f), {"base_url": self.server.base_url, "query": query})
+            self._send_json(results)
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _count(self, name):
+        with self.server.stats_lock:
+            self.server.stats[name] = self.server.stats.get(name, 0) + 1
+
+    def _chunk(self, delta, finish_reason=None):
+        return {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": self.server.model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+    def _completion(self, request):
+        step = select_step(self.server.scenarios, request.get("messages") or [], self.server.base_url)
+        finish_reason = "tool_calls" if "tool_calls" in step else "stop"
+        time.sleep(self.server.latency)
+
+        if not request.get("stream"):
+            # Used by the context summarizer
+            message = {"role": "assistant", "content": step.get("text", "")}
+            self._send_json({"id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+                             "model": self.server.model,
+                             "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}]})
+            return
+
+        # Chunked encoding keeps the connection reusable, like a real model server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        deltas = step_deltas(step)
+        deltas[0] = {"role": "assistant", **deltas[0]}
+        for number, delta in enumerate(deltas):
+            if number:
+                time.sleep(self.server.chunk_delay)
+            self._write_event(json.dumps(self._chunk(delta)))
+        self._write_event(json.dumps(self._chunk({}, finish_reason)))
+        self._write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _write_event(self, data: str):
+        body = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(body):x}\r\n".encode("ascii") + body + b"\r\n")
+        self.wfile.flush()
+
+
+def create_server(host="127.0.0.1", port=0, latency=0.0, chunk_delay=0.0, scenarios=None) -> ThreadingHTTPServer:
+    """Builds the server (port 0 picks a free port); latency and chunk_delay are in seconds."""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.scenarios = scenarios if scenarios is not None else load_scenarios()
+    server.latency = latency
+    server.chunk_delay = chunk_delay
+    server.model = "bench-mock"
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    return server
+
+
+def serve(host, port, latency, chunk_delay, ready=None):
+    """Entry point for running the server in its own process; puts its base URL on ready once listening."""
+    server = create_server(host, port, latency, chunk_delay)
+    if ready is not None:
+        ready.put(server.base_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible model server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Delay before the first chunk of a reply")
+    parser.add_argument("--chunk-ms", type=float, default=5, help="Delay between streamed chunks")
+    args = parser.parse_args()
+
+    print(f"Mock model server is listening on http://{args.host}:{args.port}/v1")
+    serve(args.host, args.port, args.latency_ms / 1000, args.chunk_ms / 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+import os
+import gc
+import sys
+import json
+import time
+import asyncio
+import pathlib
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+import multiprocessing
+from datetime import datetime, timezone
+from benchmarks.mock_server import bench_prompt, load_scenarios, model_seconds, serve
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+BENCH_DIR = pathlib.Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+# Metrics shown by --compare: (report section, key, True if higher is better)
+_COMPARED = [
+    ("latency", "mean_ms", False),
+    ("latency", "overhead_per_step_ms", False),
+    ("memory", "retained_kb_per_session", False),
+    ("throughput", "turns_per_second", True),
+]
+
+
+def _configure_environment(base_url, work_dir, storage):
+    """Points the agent at the mock server and keeps every file it writes in work_dir."""
+    # Set before src is imported: several modules read their settings at import time,
+    # and load_dotenv() does not override variables that are already set
+    os.environ.update({
+        "AI_PROVIDER": "ollama",
+        "OLLAMA_BASE_URL": f"{base_url}/v1",
+        "OLLAMA_MODEL_NAME": "bench-mock",
+        "DOCS_BASE_DIR": str(work_dir / "docs"),
+        "DOC_STORAGE": storage,
+        "DOC_STORAGE_PATH": str(work_dir / "docs.sqlite3"),
+        "DOC_WATCH": "off",
+        "SESSION_DB_PATH": str(work_dir / "sessions.sqlite3"),
+        "ARXIV_DB_PATH": str(work_dir / "arxiv.sqlite3"),
+        "CONTEXT_SUMMARIZE": "false",
+        # Web tools hit the fixtures on every call instead of the tool cache
+        "TOOL_CACHE_PATH": "",
+        "TOOL_CACHE_TTL_SEARCH_WEB": "0",
+        "TOOL_CACHE_TTL_FETCH_WEB_CONTENT": "0",
+        "SEARCH_BACKENDS": "serper",
+        "SEARCH_API_KEY": "bench",
+        "SERPER_API_URL": f"{base_url}/serper/search",
+        "HTTP_MAX_RETRIES": "0",
+    })
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _summary(seconds) -> dict:
+    return {
+        "mean_ms": round(statistics.fmean(seconds) * 1000, 2),
+        "p50_ms": round(_percentile(seconds, 0.5) * 1000, 2),
+        "p95_ms": round(_percentile(seconds, 0.95) * 1000, 2),
+        "max_ms": round(max(seconds) * 1000, 2),
+    }
+
+
+async def _turn(agent, session, scenario, name) -> dict:
+    """Runs one scripted turn; returns its latency, time to first text and any errors."""
+    from src.agent_core import AIStreamEvent
+
+    start = time.perf_counter()
+    first_text = None
+    tool_errors = 0
+    response = None
+    async for event in agent.stream_message_async(bench_prompt(scenario, name), chat_session=session):
+        if event.type == AIStreamEvent.TEXT and first_text is None:
+            first_text = time.perf_counter() - start
+        elif event.type == AIStreamEvent.TOOL_RESULT and str(event.text).startswith("Error"):
+            tool_errors += 1
+        elif event.type == AIStreamEvent.DONE:
+            response = event.response
+    return {
+        "seconds": time.perf_counter() - start,
+        "first_text": first_text,
+        "tool_errors": tool_errors,
+        "failed": response is None or response.text.startswith("Error:"),
+    }
+
+
+async def bench_latency(agent, scenarios, turns, latency, chunk_delay) -> dict:
+    """Sequential turns on fresh sessions: end-to-end latency and the overhead beyond the model's own time."""
+    results = {}
+    for scenario, spec in scenarios.items():
+        # Warm-up turns load lazy imports and open connections before timing starts
+        for i in range(2):
+            await _turn(agent, agent.create_session(), scenario, f"warmup{i}")
+
+        samples = [await _turn(agent, agent.create_session(), scenario, f"latency{i}") for i in range(turns)]
+        seconds = [sample["seconds"] for sample in samples]
+        first_text = [sample["first_text"] for sample in samples if sample["first_text"] is not None]
+        steps = spec["steps"]
+        model_ms = sum(model_seconds(step, latency, chunk_delay) for step in steps) * 1000
+        summary = _summary(seconds)
+        results[scenario] = {
+            **summary,
+            "first_text_ms": round(statistics.fmean(first_text) * 1000, 2) if first_text else None,
+            "model_steps": len(steps),
+            "model_ms": round(model_ms, 2),
+            # Time spent outside the model: chunk parsing, tool execution and prompt building
+            "overhead_ms": round(summary["mean_ms"] - model_ms, 2),
+            "overhead_per_step_ms": round((summary["mean_ms"] - model_ms) / len(steps), 2),
+            "tool_errors": sum(sample["tool_errors"] for sample in samples),
+            "failed_turns": sum(sample["failed"] for sample in samples),
+        }
+    return results
+
+
+async def bench_memory(agent, scenarios, count) -> dict:
+    """Memory kept alive per session after one turn of each scenario, and its serialized size."""
+    names = list(scenarios)
+    tracemalloc.start()
+    try:
+        sessions = []
+        for i in range(count):
+            session = agent.create_session()
+            for scenario in names:
+                await _turn(agent, session, scenario, f"memory{i}")
+            sessions.append(session)
+        gc.collect()
+        with_sessions = tracemalloc.get_traced_memory()[0]
+        serialized = [len(json.dumps(agent.serialize_session(session)).encode("utf-8")) for session in sessions]
+        del sessions, session
+        gc.collect()
+        without_sessions = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return {
+        "sessions": count,
+        "turns_per_session": len(names),
+        "retained_kb_per_session": round((with_sessions - without_sessions) / count / 1024, 2),
+        "serialized_kb_per_session": round(statistics.fmean(serialized) / 1024, 2),
+    }
+
+
+async def bench_throughput(agent, scenarios, concurrency, rounds) -> list:
+    """N sessions at once, each running `rounds` turns in order, cycling through the scenarios."""
+    names = list(scenarios)
+    results = []
+    for sessions in concurrency:
+        async def run_session(index):
+            session = agent.create_session()
+            return [await _turn(agent, session, names[(index + i) % len(names)], f"load{sessions}x{index}")
+                    for i in range(rounds)]
+
+        start = time.perf_counter()
+        samples = [sample for per_session in await asyncio.gather(*(run_session(i) for i in range(sessions)))
+                   for sample in per_session]
+        elapsed = time.perf_counter() - start
+        results.append({
+            "sessions": sessions,
+            "turns": len(samples),
+            "seconds": round(elapsed, 3),
+            "turns_per_second": round(len(samples) / elapsed, 2),
+            **_summary([sample["seconds"] for sample in samples]),
+            "tool_errors": sum(sample["tool_errors"] for sample in samples),
+            "failed_turns": sum(sample["failed"] for sample in samples),
+        })
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _metrics(report) -> dict:
+    """Flattens the compared metrics of a report into {label: (value, higher_is_better)}."""
+    values = {}
+    for section, key, higher_is_better in _COMPARED:
+        data = report.get(section) or {}
+        if isinstance(data, list):
+            # Throughput runs, one per concurrency level
+            entries = {f"{section}[{item['sessions']} sessions]": item for item in data}
+        elif key in data:
+            entries = {section: data}
+        else:
+            # Latency, one entry per scenario
+            entries = {f"{section}[{name}]": item for name, item in data.items()}
+        for label, item in entries.items():
+            if isinstance(item, dict) and isinstance(item.get(key), (int, float)):
+                values[f"{label}.{key}"] = (item[key], higher_is_better)
+    return values
+
+
+def compare(report, baseline, threshold=0.1) -> list:
+    """Lines describing how each metric moved against a baseline report; regressions are marked."""
+    lines = []
+    old = _metrics(baseline)
+    for label, (value, higher_is_better) in _metrics(report).items():
+        if label not in old or not old[label][0]:
+            continue
+        change = (value - old[label][0]) / abs(old[label][0])
+        worse = -change if higher_is_better else change
+        marker = "REGRESSION" if worse > threshold else ""
+        lines.append(f"{label:<55} {old[label][0]:>10} -> {value:>10} ({change:+.1%}) {marker}".rstrip())
+    return lines
+
+
+async def run(args, scenarios) -> dict:
+    # Imported only after _configure_environment has run
+    from src.agent_core import MyAgent
+    from src.tools.tool_definitions import doc_manager
+
+    start = time.perf_counter()
+    agent = MyAgent()
+    startup = time.perf_counter() - start
+
+    report = {"startup_ms": round(startup * 1000, 2)}
+    report["latency"] = await bench_latency(agent, scenarios, args.turns, args.latency_ms / 1000, args.chunk_ms / 1000)
+    if args.memory_sessions:
+        report["memory"] = await bench_memory(agent, scenarios, args.memory_sessions)
+    report["throughput"] = await bench_throughput(agent, scenarios, args.concurrency, args.rounds)
+    # Write pending index.md updates now; at exit the temporary docs folder is already gone
+    if doc_manager.index_maintainer is not None:
+        doc_manager.index_maintainer.flush()
+    report["peak_rss_mb"] = _peak_rss_mb()
+    return report
+
+
+def _print_report(report):
+    print(f"Agent startup: {report['startup_ms']} ms")
+    print("\nLatency per turn (sequential, fresh session):")
+    for scenario, item in report["latency"].items():
+        print(f"  {scenario:<10} mean {item['mean_ms']:>8} ms  p95 {item['p95_ms']:>8} ms  "
+              f"model {item['model_ms']:>8} ms  overhead/step {item['overhead_per_step_ms']:>7} ms  "
+              f"errors {item['tool_errors'] + item['failed_turns']}")
+    if "memory" in report:
+        memory = report["memory"]
+        print(f"\nMemory: {memory['retained_kb_per_session']} KB retained and "
+              f"{memory['serialized_kb_per_session']} KB serialized per session")
+    print("\nThroughput:")
+    for item in report["throughput"]:
+        print(f"  {item['sessions']:>4} sessions  {item['turns_per_second']:>8} turns/s  "
+              f"p50 {item['p50_ms']:>8} ms  p95 {item['p95_ms']:>8} ms  "
+              f"errors {item['tool_errors'] + item['failed_turns']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline agent benchmarks against a mock model server")
+    parser.add_argument("--turns", type=int, default=20, help="Timed turns per scenario for latency")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        help="Comma-separated numbers of concurrent sessions for throughput")
+    parser.add_argument("--rounds", type=int, default=3, help="Turns per session in the throughput runs")
+    parser.add_argument("--memory-sessions", type=int, default=50, help="Sessions for the memory run (0 skips it)")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Mock model delay before the first chunk")
+    parser.add_argument("--chunk-ms", type=float, default=2, help="Mock model delay between streamed chunks")
+    parser.add_argument("--scenarios", default="", help="Comma-separated scenarios to run (default: all)")
+    parser.add_argument("--storage", choices=["files", "sqlite"], default="files", help="Document storage backend")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/bench-<time>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+    args.concurrency = [int(n) for n in args.concurrency.split(",") if n.strip()]
+
+    scenarios = load_scenarios()
+    if args.scenarios:
+        scenarios = {name: scenarios[name] for name in args.scenarios.split(",") if name in scenarios}
+
+    # The mock server gets its own process so it does not compete with the agent for the GIL
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    server = context.Process(target=serve, args=("127.0.0.1", 0, args.latency_ms / 1000, args.chunk_ms / 1000, ready),
+                             daemon=True)
+    server.start()
+    try:
+        base_url = ready.get(timeout=30)
+        with tempfile.TemporaryDirectory(prefix="my_agent_bench_") as work_dir:
+            _configure_environment(base_url, pathlib.Path(work_dir), args.storage)
+            report = asyncio.run(run(args, scenarios))
+    finally:
+        server.terminate()
+        server.join()
+
+    report = {
+        "meta": {
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "settings": {
+            "turns": args.turns, "concurrency": args.concurrency, "rounds": args.rounds,
+            "memory_sessions": args.memory_sessions, "latency_ms": args.latency_ms, "chunk_ms": args.chunk_ms,
+            "scenarios": list(scenarios), "storage": args.storage,
+        },
+        **report,
+    }
+
+    output = pathlib.Path(args.output) if args.output else \
+        RESULTS_DIR / f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    _print_report(report)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare}:")
+        for line in compare(report, baseline):
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
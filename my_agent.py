@@ -35,28 +35,66 @@ def run_web(env, port=None):
     subprocess.run(cmd, env=env)
 
 
-def run_telegram(env):
+def run_telegram(env, webhook=False):
     print("Starting Telegram Bot...")
-    # Get the absolute path to src/telegram_bot.py
-    telegram_bot_path = os.path.join(project_root, "src", "telegram_bot.py")
+    # Long polling (src/telegram_bot.py) or a local webhook server (src/telegram_webhook.py)
+    script = "telegram_webhook.py" if webhook else "telegram_bot.py"
+    telegram_bot_path = os.path.join(project_root, "src", script)
     subprocess.run([sys.executable, telegram_bot_path], env=env)
 
 
+def run_api(env, port=None):
+    print("Starting API server...")
+    api_server_path = os.path.join(project_root, "src", "api_server.py")
+    if port:
+        env["API_PORT"] = str(port)
+    subprocess.run([sys.executable, api_server_path], env=env)
+
+
+def run_bench(env):
+    # Offline benchmarks against a local mock model server; options: python benchmarks/run_bench.py --help
+    print("Running benchmarks...")
+    run_bench_path = os.path.join(project_root, "benchmarks", "run_bench.py")
+    subprocess.run([sys.executable, run_bench_path], env=env)
+
+
+def run_doc_copy(env, command, folder):
+    # Copies documents between the configured storage (DOC_STORAGE) and a plain folder
+    doc_transfer_path = os.path.join(project_root, "src", "doc_transfer.py")
+    subprocess.run([sys.executable, doc_transfer_path, command, os.path.abspath(folder)], env=env)
+
+
 def main():
     parser = argparse.ArgumentParser(description="My Agent CLI")
-    parser.add_argument("--run", choices=["web", "telegram"], required=True, help="Target to run")
+    parser.add_argument("--run", choices=["web", "telegram", "api", "bench"], help="Target to run")
     parser.add_argument("--dir", default="docs", help="Base directory for DocumentManager (default: docs)")
-    parser.add_argument("--port", type=int, help="Port for the Streamlit server (default: use Streamlit's default)")
+    parser.add_argument("--port", type=int, help="Port for the Streamlit or API server (default: Streamlit's default / API_PORT)")
+    parser.add_argument("--webhook", action="store_true",
+                        help="With --run telegram: receive updates on a local webhook server instead of polling")
+    parser.add_argument("--export-docs", metavar="FOLDER",
+                        help="Export every document from the configured storage to FOLDER as files")
+    parser.add_argument("--import-docs", metavar="FOLDER",
+                        help="Import the documents in FOLDER into the configured storage")
     
     args = parser.parse_args()
+    if not (args.run or args.export_docs or args.import_docs):
+        parser.error("one of --run, --export-docs or --import-docs is required")
 
     # Set up the environment for subprocesses
     subprocess_env = _setup_pythonpath_env(args.dir)
 
-    if args.run == "web":
+    if args.export_docs:
+        run_doc_copy(subprocess_env, "export", args.export_docs)
+    elif args.import_docs:
+        run_doc_copy(subprocess_env, "import", args.import_docs)
+    elif args.run == "web":
         run_web(subprocess_env, args.port)
     elif args.run == "telegram":
-        run_telegram(subprocess_env)
+        run_telegram(subprocess_env, args.webhook)
+    elif args.run == "api":
+        run_api(subprocess_env, args.port)
+    elif args.run == "bench":
+        run_bench(subprocess_env)
 
 
 if __name__ == "__main__":
@@ -1,18 +1,22 @@
 import os
 import json
 import inspect
+import typing
+import functools
 from abc import ABC, abstractmethod
-from google import genai
-# pyright: ignore[reportMissingImports]
-from google.genai import types as gemini_types
-from openai import OpenAI
 from dotenv import load_dotenv  # pyright: ignore[reportMissingImports]
 from src.tools.tool_definitions import tools
+from src.tool_executor import ToolCall, ToolExecutor
+from src.context_manager import (
+    SUMMARY_INSTRUCTION, ContextManager, ContextMetrics, GeminiContentAdapter, OpenAIMessageAdapter)
 from src.instruction import SYSTEM_INSTRUCTION
 
 # Load environment variables
 load_dotenv()
 
+# Upper bound on model <-> tool round-trips within a single turn
+MAX_TOOL_ITERATIONS = 15
+
 
 def function_to_schema(func):
     """Converts a Python function to an OpenAI-style JSON schema."""
@@ -34,7 +38,7 @@ def function_to_schema(func):
             param_type = "number"
         elif param.annotation == bool:
             param_type = "boolean"
-        elif param.annotation == list:
+        elif param.annotation == list or typing.get_origin(param.annotation) is list:
             param_type = "array"
         elif param.annotation == dict:
             param_type = "object"
@@ -43,6 +47,12 @@ def function_to_schema(func):
             "type": param_type,
             "description": f"The {name} parameter."  # 실제 docstring에서 파싱하면 더 좋음
         }
+        if param_type == "array":
+            # list[str] 등 원소 타입이 지정된 경우 items 스키마 추가
+            item_types = typing.get_args(param.annotation)
+            item_type = {int: "integer", float: "number", bool: "boolean"}.get(
+                item_types[0] if item_types else str, "string")
+            parameters["properties"][name]["items"] = {"type": item_type}
 
         if param.default is inspect.Parameter.empty:
             parameters["required"].append(name)
@@ -57,13 +67,25 @@ def function_to_schema(func):
     }
 
 
+@functools.cache
+def _system_instruction() -> str:
+    """The system prompt followed by the tool descriptions; the tool list is fixed, so it is built once."""
+    return SYSTEM_INSTRUCTION + "\n\n" + MyAgent._generate_tool_instructions(tools)
+
+
+@functools.cache
+def _tools_schema() -> list:
+    return [function_to_schema(t) for t in tools]
+
+
 class AIResponse:
     """Unified response object to maintain compatibility with existing UI/Bot."""
 
-    def __init__(self, text="", parts=None, candidates=None):
+    def __init__(self, text="", parts=None, candidates=None, metrics=None):
         self.text = text
         self.parts = parts or []
         self.candidates = candidates or []
+        self.metrics = metrics  # ContextMetrics for the turn, if available
 
 
 class AICandidate:
@@ -91,122 +113,455 @@ class AIFunctionCall:
         self.arguments = args
 
 
+class AIStreamEvent:
+    """A single event emitted while a response is being streamed."""
+
+    TEXT = "text"              # A text delta from the model
+    TOOL_CALL = "tool_call"    # The model requested a tool call
+    TOOL_RESULT = "tool_result"  # A tool call finished
+    DONE = "done"              # The turn is complete; carries the final AIResponse
+
+    def __init__(self, type, text="", function_call=None, response=None):
+        self.type = type
+        self.text = text
+        self.function_call = function_call
+        self.response = response
+
+
+class _TurnState(ABC):
+    """
+    Provider-independent bookkeeping for one streamed turn.
+
+    The sync and async provider loops only differ in how they perform I/O;
+    chunk parsing, session updates and event creation live here so both loops
+    share them.
+    """
+
+    def __init__(self, session, context):
+        self.session = session
+        self.context = context
+        self.metrics = ContextMetrics(context.token_budget)
+        self.all_parts = []
+        self.text = ""
+
+    def tool_call_events(self, calls):
+        events = []
+        for call in calls:
+            function_call = AIFunctionCall(call.name, call.args)
+            # Add to parts for UI visibility
+            self.all_parts.append(AIPart(function_call=function_call))
+            events.append(AIStreamEvent(AIStreamEvent.TOOL_CALL, function_call=function_call))
+        return events
+
+    def tool_result_events(self, calls, results):
+        self.add_tool_results(calls, results)
+        return [AIStreamEvent(AIStreamEvent.TOOL_RESULT, text=result,
+                              function_call=AIFunctionCall(call.name, call.args))
+                for call, result in zip(calls, results)]
+
+    def done_event(self):
+        candidate = AICandidate(AIContent(self.all_parts))
+        response = AIResponse(text=self.text, parts=self.all_parts,
+                              candidates=[candidate], metrics=self.metrics)
+        return AIStreamEvent(AIStreamEvent.DONE, response=response)
+
+    def max_iterations_event(self):
+        return AIStreamEvent(AIStreamEvent.DONE, response=AIResponse(
+            text="Error: Maximum tool call iterations reached.", metrics=self.metrics))
+
+    def begin_message(self):
+        """Prepares the next model request, keeping the prompt within the token budget."""
+        self.text = ""
+        self.context.compact(self.session, self.metrics)
+
+    @abstractmethod
+    def feed(self, chunk) -> list:
+        """Consumes one streamed chunk and returns the events it produces."""
+        pass
+
+    @abstractmethod
+    def end_message(self) -> list:
+        """Records the model message in the session and returns its tool calls."""
+        pass
+
+    @abstractmethod
+    def add_tool_results(self, calls, results):
+        """Appends the results of the tool calls to the session."""
+        pass
+
+
+def _summarize_enabled() -> bool:
+    """Background summarization of compacted turns costs extra model calls, so it is opt-in."""
+    return os.getenv("CONTEXT_SUMMARIZE", "false").lower() in ("1", "true", "yes")
+
+
 class BaseProvider(ABC):
     @abstractmethod
-    def send_message(self, prompt, session=None):
+    def stream_message(self, prompt, session=None):
+        """Yields AIStreamEvent objects; the last event is always DONE."""
         pass
 
+    @abstractmethod
+    async def stream_message_async(self, prompt, session=None):
+        """Async variant of stream_message; tools run off the event loop."""
+        yield
+
     @abstractmethod
     def create_session(self):
         pass
 
+    @abstractmethod
+    def serialize_session(self, session) -> list:
+        """Converts a session into a JSON-serializable list."""
+        pass
+
+    @abstractmethod
+    def deserialize_session(self, data):
+        """Rebuilds a session from the output of serialize_session."""
+        pass
+
+    @abstractmethod
+    def session_history(self, session) -> list:
+        """Returns the user/assistant text exchanges of a session as role/content dicts."""
+        pass
+
+    def send_message(self, prompt, session=None):
+        response = None
+        for event in self.stream_message(prompt, session=session):
+            if event.type == AIStreamEvent.DONE:
+                response = event.response
+        return response
+
+    async def send_message_async(self, prompt, session=None):
+        response = None
+        async for event in self.stream_message_async(prompt, session=session):
+            if event.type == AIStreamEvent.DONE:
+                response = event.response
+        return response
+
+
+class _GeminiTurn(_TurnState):
+    def __init__(self, session, prompt, context):
+        from google.genai import types as gemini_types  # pyright: ignore[reportMissingImports]
+
+        super().__init__(session, context)
+        session.append(gemini_types.Content(
+            role="user", parts=[gemini_types.Part(text=prompt)]))
+        self.parts = []
+
+    def begin_message(self):
+        super().begin_message()
+        self.parts = []
+
+    def feed(self, chunk):
+        events = []
+        if not chunk.candidates or not chunk.candidates[0].content:
+            return events
+        for part in chunk.candidates[0].content.parts or []:
+            if part.text and not part.thought:
+                self.text += part.text
+                events.append(AIStreamEvent(AIStreamEvent.TEXT, text=part.text))
+                # Merge streamed text fragments into a single history part
+                previous = self.parts[-1] if self.parts else None
+                if previous is not None and previous.text and not previous.thought:
+                    previous.text += part.text
+                    continue
+            self.parts.append(part)
+        return events
+
+    def end_message(self):
+        from google.genai import types as gemini_types  # pyright: ignore[reportMissingImports]
+
+        if self.parts:
+            self.session.append(gemini_types.Content(role="model", parts=self.parts))
+        if self.text:
+            self.all_parts.append(AIPart(text=self.text))
+        return [ToolCall(p.function_call.name, dict(p.function_call.args or {}), p.function_call.id)
+                for p in self.parts if p.function_call]
+
+    def add_tool_results(self, calls, results):
+        from google.genai import types as gemini_types  # pyright: ignore[reportMissingImports]
+
+        self.session.append(gemini_types.Content(role="user", parts=[
+            gemini_types.Part(function_response=gemini_types.FunctionResponse(
+                id=call.call_id, name=call.name, response={"result": result}))
+            for call, result in zip(calls, results)
+        ]))
+
 
 class GeminiProvider(BaseProvider):
     def __init__(self, model_name):
+        # Provider SDKs are slow to import, so only the selected one is loaded
+        from google import genai  # pyright: ignore[reportMissingImports]
+
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not found.")
         self.client = genai.Client(api_key=api_key)
         self.model_name = model_name
         self.config = self._create_config()
+        self.tool_executor = ToolExecutor(tools)
+        self.context = ContextManager(
+            GeminiContentAdapter(self.config.system_instruction),
+            summarizer=self._summarize if _summarize_enabled() else None)
 
     def _create_config(self):
-        tool_instructions = MyAgent._generate_tool_instructions(tools)
-        system_instruction = SYSTEM_INSTRUCTION + "\n\n" + tool_instructions
+        from google.genai import types as gemini_types  # pyright: ignore[reportMissingImports]
+
+        # Tool calls are executed by our ToolExecutor so that independent calls
+        # from one model message can run in parallel.
         return gemini_types.GenerateContentConfig(
-            system_instruction=system_instruction,
+            system_instruction=_system_instruction(),
             tools=tools,
             automatic_function_calling=gemini_types.AutomaticFunctionCallingConfig(
-                disable=False)
+                disable=True)
         )
 
+    def _summarize(self, text):
+        from google.genai import types as gemini_types  # pyright: ignore[reportMissingImports]
+
+        response = self.client.models.generate_content(
+            model=self.model_name, contents=text,
+            config=gemini_types.GenerateContentConfig(system_instruction=SUMMARY_INSTRUCTION))
+        return response.text
+
     def create_session(self):
-        return self.client.chats.create(model=self.model_name, config=self.config)
+        # The session is the list of Content objects sent with every request,
+        # so the sync and async clients can share it.
+        return []
+
+    def serialize_session(self, session):
+        return [content.model_dump(mode="json", exclude_none=True) for content in session]
+
+    def deserialize_session(self, data):
+        from google.genai import types as gemini_types  # pyright: ignore[reportMissingImports]
+
+        return [gemini_types.Content.model_validate(item) for item in data]
+
+    def session_history(self, session):
+        history = []
+        for content in session:
+            parts = content.parts or []
+            if self.context.adapter.is_summary(content) or any(p.function_response for p in parts):
+                continue
+            text = "".join(p.text for p in parts if p.text and not p.thought)
+            if text:
+                role = "user" if content.role == "user" else "assistant"
+                history.append({"role": role, "content": text})
+        return history
+
+    def stream_message(self, prompt, session=None):
+        if session is None:
+            session = self.create_session()
 
-    def send_message(self, prompt, session=None):
+        turn = _GeminiTurn(session, prompt, self.context)
+
+        for _ in range(MAX_TOOL_ITERATIONS):
+            turn.begin_message()
+            for chunk in self.client.models.generate_content_stream(
+                    model=self.model_name, contents=session, config=self.config):
+                yield from turn.feed(chunk)
+
+            calls = turn.end_message()
+            if not calls:
+                yield turn.done_event()
+                return
+
+            yield from turn.tool_call_events(calls)
+            results = self.tool_executor.run(calls)
+            yield from turn.tool_result_events(calls, results)
+
+        yield turn.max_iterations_event()
+
+    async def stream_message_async(self, prompt, session=None):
         if session is None:
             session = self.create_session()
 
-        response = session.send_message(prompt)
+        turn = _GeminiTurn(session, prompt, self.context)
 
-        # Ensure compatibility
-        if hasattr(response, 'candidates') and response.candidates:
-            candidate = response.candidates[0]
+        for _ in range(MAX_TOOL_ITERATIONS):
+            turn.begin_message()
+            stream = await self.client.aio.models.generate_content_stream(
+                model=self.model_name, contents=session, config=self.config)
+            async for chunk in stream:
+                for event in turn.feed(chunk):
+                    yield event
 
-            if candidate.content and hasattr(candidate.content, 'parts'):
-                for part in response.candidates[0].content.parts:
-                    if hasattr(part, 'call') and part.call:
-                        part.function_call = part.call
+            calls = turn.end_message()
+            if not calls:
+                yield turn.done_event()
+                return
 
-        return response
+            for event in turn.tool_call_events(calls):
+                yield event
+            results = await self.tool_executor.run_async(calls)
+            for event in turn.tool_result_events(calls, results):
+                yield event
+
+        yield turn.max_iterations_event()
+
+
+class _OllamaTurn(_TurnState):
+    def __init__(self, session, prompt, context):
+        super().__init__(session, context)
+        session.append({"role": "user", "content": prompt})
+        self.tool_calls = {}
+
+    def begin_message(self):
+        super().begin_message()
+        self.tool_calls = {}  # Streamed tool calls arrive in fragments keyed by index
+
+    def feed(self, chunk):
+        events = []
+        if not chunk.choices:
+            return events
+        delta = chunk.choices[0].delta
+
+        if delta.content:
+            self.text += delta.content
+            events.append(AIStreamEvent(AIStreamEvent.TEXT, text=delta.content))
+
+        for fragment in delta.tool_calls or []:
+            index = fragment.index if fragment.index is not None else len(self.tool_calls)
+            entry = self.tool_calls.setdefault(
+                index, {"id": None, "name": "", "arguments": ""})
+            if fragment.id:
+                entry["id"] = fragment.id
+            if fragment.function:
+                entry["name"] += fragment.function.name or ""
+                entry["arguments"] += fragment.function.arguments or ""
+        return events
+
+    def end_message(self):
+        message = {"role": "assistant", "content": self.text}
+        calls = []
+        if self.tool_calls:
+            message["tool_calls"] = []
+            for index, entry in sorted(self.tool_calls.items()):
+                call_id = entry["id"] or f"call_{index}"
+                arguments = entry["arguments"] or "{}"
+                message["tool_calls"].append({
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": entry["name"], "arguments": arguments}
+                })
+                try:
+                    func_args = json.loads(arguments)
+                except json.JSONDecodeError:
+                    func_args = {}
+                calls.append(ToolCall(entry["name"], func_args, call_id))
+        self.session.append(message)
+
+        if self.text:
+            self.all_parts.append(AIPart(text=self.text))
+        return calls
+
+    def add_tool_results(self, calls, results):
+        # Results go back in the original tool_call_id order
+        for call, result in zip(calls, results):
+            self.session.append({
+                "role": "tool",
+                "tool_call_id": call.call_id,
+                "name": call.name,
+                "content": result
+            })
 
 
 class OllamaProvider(BaseProvider):
     def __init__(self, model_name):
+        from openai import AsyncOpenAI, OpenAI  # pyright: ignore[reportMissingImports]
+
         base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1")
         self.client = OpenAI(base_url=base_url, api_key="ollama")
+        self.async_client = AsyncOpenAI(base_url=base_url, api_key="ollama")
         self.model_name = model_name
-        self.tools_schema = [function_to_schema(t) for t in tools]
-        self.tool_map = {t.__name__: t for t in tools}
+        self.tools_schema = _tools_schema()
+        self.tool_executor = ToolExecutor(tools)
+        self.context = ContextManager(
+            OpenAIMessageAdapter(),
+            summarizer=self._summarize if _summarize_enabled() else None)
+
+    def _summarize(self, text):
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "system", "content": SUMMARY_INSTRUCTION},
+                      {"role": "user", "content": text}])
+        return response.choices[0].message.content
 
     def create_session(self):
-        tool_instructions = MyAgent._generate_tool_instructions(tools)
-        system_msg = SYSTEM_INSTRUCTION + '\n\n' + tool_instructions
-
-        return [{"role": "system", "content": system_msg}]
+        return [{"role": "system", "content": _system_instruction()}]
+
+    def serialize_session(self, session):
+        # The system prompt is rebuilt on load, so it is not stored with every session
+        return list(session[1:])
+
+    def deserialize_session(self, data):
+        return self.create_session() + list(data)
+
+    def session_history(self, session):
+        return [{"role": msg["role"], "content": msg["content"]}
+                for msg in session
+                if msg.get("role") in ("user", "assistant") and msg.get("content")]
+
+    def _completion_args(self, session):
+        return {
+            "model": self.model_name,
+            "messages": session,
+            "tools": self.tools_schema,
+            "tool_choice": "auto",
+            "stream": True
+        }
 
-    def send_message(self, prompt, session=None):
+    def stream_message(self, prompt, session=None):
         if session is None:
             session = self.create_session()
 
-        session.append({"role": "user", "content": prompt})
+        turn = _OllamaTurn(session, prompt, self.context)
 
-        all_parts = []
-        max_iterations = 15
+        for _ in range(MAX_TOOL_ITERATIONS):
+            turn.begin_message()
+            for chunk in self.client.chat.completions.create(**self._completion_args(session)):
+                yield from turn.feed(chunk)
 
-        for _ in range(max_iterations):
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=session,
-                tools=self.tools_schema,
-                tool_choice="auto"
-            )
+            calls = turn.end_message()
+            if not calls:
+                # No more tool calls, return final response
+                yield turn.done_event()
+                return
 
-            message = response.choices[0].message
-            session.append(message)
+            # Execute tool calls (independent calls run in parallel)
+            yield from turn.tool_call_events(calls)
+            results = self.tool_executor.run(calls)
+            yield from turn.tool_result_events(calls, results)
 
-            if message.content:
-                all_parts.append(AIPart(text=message.content))
+        yield turn.max_iterations_event()
 
-            if not message.tool_calls:
-                # No more tool calls, return final response
-                candidate = AICandidate(AIContent(all_parts))
-                return AIResponse(text=message.content or "", parts=all_parts, candidates=[candidate])
+    async def stream_message_async(self, prompt, session=None):
+        if session is None:
+            session = self.create_session()
 
-            # Execute tool calls
-            for tool_call in message.tool_calls:
-                func_name = tool_call.function.name
-                func_args_str = tool_call.function.arguments
-                func_args = json.loads(func_args_str)
+        turn = _OllamaTurn(session, prompt, self.context)
 
-                # Add to parts for UI visibility
-                all_parts.append(
-                    AIPart(function_call=AIFunctionCall(func_name, func_args)))
+        for _ in range(MAX_TOOL_ITERATIONS):
+            turn.begin_message()
+            stream = await self.async_client.chat.completions.create(
+                **self._completion_args(session))
+            async for chunk in stream:
+                for event in turn.feed(chunk):
+                    yield event
 
-                if func_name in self.tool_map:
-                    try:
-                        result = self.tool_map[func_name](**func_args)
-                    except Exception as e:
-                        result = f"Error executing {func_name}: {e}"
+            calls = turn.end_message()
+            if not calls:
+                yield turn.done_event()
+                return
 
-                    session.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "name": func_name,
-                        "content": str(result)
-                    })
+            for event in turn.tool_call_events(calls):
+                yield event
+            results = await self.tool_executor.run_async(calls)
+            for event in turn.tool_result_events(calls, results):
+                yield event
 
-        return AIResponse(text="Error: Maximum tool call iterations reached.")
+        yield turn.max_iterations_event()
 
 
 class MyAgent:
@@ -257,10 +612,33 @@ class MyAgent:
     def send_message(self, prompt: str, chat_session=None):
         return self.provider.send_message(prompt, session=chat_session)
 
+    def stream_message(self, prompt: str, chat_session=None):
+        """Yields AIStreamEvent objects (text deltas, tool calls, tool results, done)."""
+        return self.provider.stream_message(prompt, session=chat_session)
+
+    async def send_message_async(self, prompt: str, chat_session=None):
+        return await self.provider.send_message_async(prompt, session=chat_session)
+
+    def stream_message_async(self, prompt: str, chat_session=None):
+        """Async iterator variant of stream_message for use inside an event loop."""
+        return self.provider.stream_message_async(prompt, session=chat_session)
+
     def create_session(self):
         """Creates a new chat session using the current provider."""
         return self.provider.create_session()
 
+    def serialize_session(self, session) -> list:
+        """Converts a chat session into a compact JSON-serializable list."""
+        return self.provider.serialize_session(session)
+
+    def deserialize_session(self, data):
+        """Rebuilds a chat session from the output of serialize_session."""
+        return self.provider.deserialize_session(data)
+
+    def session_history(self, session) -> list:
+        """Returns the visible user/assistant messages of a chat session."""
+        return self.provider.session_history(session)
+
 
 if __name__ == "__main__":
 
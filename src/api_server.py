@@ -0,0 +1,246 @@
+import os
+import hmac
+import json
+import uuid
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+import uvicorn  # pyright: ignore[reportMissingImports]
+from fastapi import Depends, FastAPI, HTTPException, Request  # pyright: ignore[reportMissingImports]
+from fastapi.responses import StreamingResponse  # pyright: ignore[reportMissingImports]
+from pydantic import BaseModel  # pyright: ignore[reportMissingImports]
+from dotenv import load_dotenv  # pyright: ignore[reportMissingImports]
+from src.agent_core import AIStreamEvent, MyAgent
+from src.dispatcher import UserDispatcher
+from src.session_store import SessionStore
+from src.tools.tool_definitions import doc_manager
+
+
+# Load environment variables
+load_dotenv()
+
+# Logging setup
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Initialize MyAgent
+agent = MyAgent()
+
+# Chat sessions: bounded in memory, persisted across restarts
+session_store = SessionStore(agent)
+
+# Turns run on a bounded worker pool: different sessions concurrently, each session's turns in order
+dispatcher = UserDispatcher(
+    workers=int(os.getenv("API_WORKERS", "16")),
+    max_queue=int(os.getenv("API_MAX_QUEUE", "5")),
+    rate=float(os.getenv("API_RATE_PER_MINUTE", "60")) / 60,
+    burst=int(os.getenv("API_RATE_BURST", "10")),
+)
+
+# Optional bearer token required on every request
+API_KEY = os.getenv("API_KEY", "")
+
+# Seconds without events after which an SSE comment is sent to keep the connection open
+KEEPALIVE_SECONDS = 15
+
+
+class MessageRequest(BaseModel):
+    content: str
+    stream: bool = True
+
+
+def _session_key(session_id) -> str:
+    return f"api:{session_id}"
+
+
+def _check_api_key(request: Request):
+    if API_KEY and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {API_KEY}"):
+        raise HTTPException(status_code=401, detail="Invalid or missing API key")
+
+
+async def _require_session(session_id):
+    if not await asyncio.to_thread(session_store.exists, _session_key(session_id)):
+        raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
+
+
+def _event_payload(event):
+    """Returns (SSE event name, JSON-serializable data) for an agent stream event."""
+    if event.type == AIStreamEvent.TEXT:
+        return "text", {"text": event.text}
+    if event.type == AIStreamEvent.TOOL_CALL:
+        return "tool_call", {"name": event.function_call.name, "args": event.function_call.args}
+    if event.type == AIStreamEvent.TOOL_RESULT:
+        return "tool_result", {"name": event.function_call.name, "result": event.text}
+    return "done", {"text": event.response.text if event.response is not None else ""}
+
+
+async def _run_turn(session_id, content, events: asyncio.Queue):
+    """Runs one agent turn and puts its events on the queue, followed by None."""
+    key = _session_key(session_id)
+    try:
+        if not await asyncio.to_thread(session_store.exists, key):
+            await events.put(("error", {"message": f"Session not found: {session_id}"}))
+            return
+        chat_session = await asyncio.to_thread(session_store.get, key)
+        async for event in agent.stream_message_async(content, chat_session=chat_session):
+            await events.put(_event_payload(event))
+        await asyncio.to_thread(session_store.save, key, chat_session)
+    except asyncio.CancelledError:
+        # The history may stop mid tool loop, so fall back to the last saved state
+        session_store.discard(key)
+        raise
+    except Exception as e:
+        # Same for a failed turn: the next message must not build on half a tool loop
+        session_store.discard(key)
+        logger.error("Error in session %s: %s", session_id, e)
+        await events.put(("error", {"message": str(e)}))
+    finally:
+        events.put_nowait(None)
+
+
+def _submit_turn(session_id, content):
+    """Queues a turn behind the session's earlier ones; returns (events queue, job state)."""
+    events = asyncio.Queue()
+    state = {"task": None, "abandoned": False}
+
+    async def job():
+        if state["abandoned"]:
+            return
+        state["task"] = asyncio.current_task()
+        await _run_turn(session_id, content, events)
+
+    result = dispatcher.submit(session_id, job)
+    if result == UserDispatcher.QUEUE_FULL:
+        raise HTTPException(status_code=429, detail="Too many messages waiting for this session")
+    if result == UserDispatcher.RATE_LIMITED:
+        raise HTTPException(status_code=429, detail="Rate limit exceeded for this session")
+    return events, state
+
+
+def _abandon(state):
+    # The client went away: skip the turn if it has not started, otherwise abort it
+    state["abandoned"] = True
+    if state["task"] is not None and not state["task"].done():
+        state["task"].cancel()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await dispatcher.start()
+    try:
+        yield
+    finally:
+        await dispatcher.stop()
+
+
+app = FastAPI(title="My Agent API", lifespan=lifespan, dependencies=[Depends(_check_api_key)])
+
+
+@app.post("/v1/sessions", status_code=201)
+async def create_session():
+    session_id = uuid.uuid4().hex
+    await asyncio.to_thread(session_store.save, _session_key(session_id), agent.create_session())
+    return {"session_id": session_id}
+
+
+@app.get("/v1/sessions/{session_id}")
+async def get_session(session_id: str):
+    await _require_session(session_id)
+    chat_session = await asyncio.to_thread(session_store.get, _session_key(session_id))
+    return {"session_id": session_id, "messages": agent.session_history(chat_session),
+            "pending": dispatcher.pending(session_id)}
+
+
+@app.delete("/v1/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    await _require_session(session_id)
+    dispatcher.cancel(session_id)
+    dispatcher.forget(session_id)
+    await asyncio.to_thread(session_store.delete, _session_key(session_id))
+
+
+@app.post("/v1/sessions/{session_id}/cancel")
+async def cancel_turn(session_id: str):
+    await _require_session(session_id)
+    return {"cancelled": dispatcher.cancel(session_id)}
+
+
+@app.post("/v1/sessions/{session_id}/messages")
+async def send_message(session_id: str, message: MessageRequest, request: Request):
+    """Sends a message; streams text and tool events as Server-Sent Events unless stream is false."""
+    await _require_session(session_id)
+    events, state = _submit_turn(session_id, message.content)
+
+    if not message.stream:
+        text, tool_calls = "", []
+        try:
+            while (item := await events.get()) is not None:
+                name, data = item
+                if name == "error":
+                    raise HTTPException(status_code=500, detail=data["message"])
+                if name == "tool_call":
+                    tool_calls.append(data)
+                elif name == "done":
+                    text = data["text"]
+        except asyncio.CancelledError:
+            _abandon(state)
+            raise
+        return {"text": text, "tool_calls": tool_calls}
+
+    async def stream():
+        finished = False
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(events.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if item is None:
+                    finished = True
+                    break
+                name, data = item
+                yield f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+        finally:
+            # Also runs when the client disconnects mid-stream
+            if not finished:
+                _abandon(state)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/v1/documents")
+async def list_documents(prefix: str = "", folder: str = "", offset: int = 0, limit: int = 200):
+    files, total = doc_manager.tree.list(prefix=prefix, folder=folder or None,
+                                         offset=max(0, offset), limit=max(1, min(limit, 1000)))
+    return {"documents": files, "total": total, "offset": offset}
+
+
+@app.get("/v1/documents/{path:path}")
+async def read_document(path: str, offset: int = 0, limit: int = 0, unit: str = "lines", section: str = ""):
+    try:
+        version = await asyncio.to_thread(doc_manager.get_version, path)
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    if not version:
+        raise HTTPException(status_code=404, detail=f"Document not found: {path}")
+    content = await asyncio.to_thread(doc_manager.read_doc, path, offset, limit, unit, section)
+    return {"path": path, "version": version, "content": content}
+
+
+def main():
+    host = os.getenv("API_HOST", "127.0.0.1")
+    port = int(os.getenv("API_PORT", "8000"))
+    print(f"API server is listening on http://{host}:{port}")
+    uvicorn.run(app, host=host, port=port)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nAPI server stopped.")
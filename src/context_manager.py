@@ -0,0 +1,319 @@
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+# Markers for messages produced by compaction
+STUB_PREFIX = "[Compacted tool result]"
+SUMMARY_PREFIX = "[Summary of earlier conversation]"
+SUMMARY_PENDING = "Earlier messages were removed to save context; a summary is being prepared."
+SUMMARY_REMOVED = "Earlier messages were removed to save context."
+
+SUMMARY_INSTRUCTION = (
+    "Summarize the following conversation excerpt between a user and an AI assistant. "
+    "Keep facts, decisions, file paths, URLs and open questions. Be concise."
+)
+
+
+def estimate_tokens(text) -> int:
+    """Cheap token estimate (~4 UTF-8 bytes per token, so CJK text counts higher than ASCII)."""
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = str(text)
+    return len(text.encode("utf-8")) // 4 + 1
+
+
+class ContextMetrics:
+    """Prompt size statistics for a single turn."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.requests = 0
+        self.prompt_tokens = 0       # Estimated size of the most recent request
+        self.peak_prompt_tokens = 0
+        self.stubbed_tool_results = 0
+        self.dropped_messages = 0
+
+    def record(self, prompt_tokens):
+        self.requests += 1
+        self.prompt_tokens = prompt_tokens
+        self.peak_prompt_tokens = max(self.peak_prompt_tokens, prompt_tokens)
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return f"ContextMetrics({self.as_dict()})"
+
+
+class OpenAIMessageAdapter:
+    """Reads and rewrites OpenAI-style message dicts (used by OllamaProvider sessions)."""
+
+    base_tokens = 0
+
+    @staticmethod
+    def tokens(msg) -> int:
+        total = estimate_tokens(msg.get("content"))
+        for tool_call in msg.get("tool_calls") or []:
+            function = tool_call.get("function", {})
+            total += estimate_tokens(function.get("name")) + estimate_tokens(function.get("arguments"))
+        return total + 4  # Per-message overhead
+
+    @staticmethod
+    def is_pinned(msg) -> bool:
+        return msg.get("role") == "system"
+
+    @staticmethod
+    def is_turn_start(msg) -> bool:
+        return msg.get("role") == "user"
+
+    @staticmethod
+    def is_summary(msg) -> bool:
+        return msg.get("role") == "system" and str(msg.get("content", "")).startswith(SUMMARY_PREFIX)
+
+    @staticmethod
+    def stub_tool_result(msg, stub_chars):
+        """Returns a stubbed copy of a tool result message, or None if msg is not one."""
+        content = str(msg.get("content") or "")
+        if msg.get("role") != "tool" or content.startswith(STUB_PREFIX) or len(content) <= stub_chars:
+            return None
+        stub = (f"{STUB_PREFIX} {msg.get('name', 'tool')} returned {len(content)} chars; "
+                f"call the tool again if the full output is needed. Preview: {content[:stub_chars]}")
+        return {**msg, "content": stub}
+
+    @staticmethod
+    def summary_message(text):
+        return {"role": "system", "content": f"{SUMMARY_PREFIX}\n{text}"}
+
+    @staticmethod
+    def summary_text(msg) -> str:
+        return str(msg.get("content", ""))[len(SUMMARY_PREFIX):].strip()
+
+    @staticmethod
+    def set_summary_text(msg, text):
+        msg["content"] = f"{SUMMARY_PREFIX}\n{text}"
+
+    @staticmethod
+    def transcript(msg) -> str:
+        text = str(msg.get("content") or "")
+        for tool_call in msg.get("tool_calls") or []:
+            function = tool_call.get("function", {})
+            text += f"\n[called {function.get('name')}({function.get('arguments')})]"
+        return f"{msg.get('role')}: {text.strip()}"
+
+
+class GeminiContentAdapter:
+    """Reads and rewrites google.genai Content objects (used by GeminiProvider sessions)."""
+
+    def __init__(self, system_instruction=""):
+        # The system instruction lives in the request config but is sent every time
+        self.base_tokens = estimate_tokens(system_instruction)
+
+    @staticmethod
+    def tokens(content) -> int:
+        total = 4
+        for part in content.parts or []:
+            if part.text:
+                total += estimate_tokens(part.text)
+            if part.function_call:
+                total += estimate_tokens(part.function_call.name)
+                total += estimate_tokens(json.dumps(part.function_call.args or {}, ensure_ascii=False))
+            if part.function_response:
+                total += estimate_tokens(json.dumps(part.function_response.response or {},
+                                                    ensure_ascii=False, default=str))
+        return total
+
+    @classmethod
+    def is_pinned(cls, content) -> bool:
+        return cls.is_summary(content)
+
+    @classmethod
+    def is_turn_start(cls, content) -> bool:
+        parts = content.parts or []
+        return (content.role == "user" and any(p.text for p in parts)
+                and not any(p.function_response for p in parts) and not cls.is_summary(content))
+
+    @staticmethod
+    def is_summary(content) -> bool:
+        parts = content.parts or []
+        return bool(parts) and bool(parts[0].text) and parts[0].text.startswith(SUMMARY_PREFIX)
+
+    @staticmethod
+    def stub_tool_result(content, stub_chars):
+        from google.genai import types as gemini_types  # pyright: ignore[reportMissingImports]
+
+        parts = content.parts or []
+        if not any(p.function_response for p in parts):
+            return None
+
+        changed = False
+        new_parts = []
+        for part in parts:
+            response = part.function_response
+            result = str((response.response or {}).get("result", "")) if response else ""
+            if response and not result.startswith(STUB_PREFIX) and len(result) > stub_chars:
+                stub = (f"{STUB_PREFIX} {response.name} returned {len(result)} chars; "
+                        f"call the tool again if the full output is needed. Preview: {result[:stub_chars]}")
+                part = gemini_types.Part(function_response=gemini_types.FunctionResponse(
+                    id=response.id, name=response.name, response={"result": stub}))
+                changed = True
+            new_parts.append(part)
+
+        return gemini_types.Content(role=content.role, parts=new_parts) if changed else None
+
+    @staticmethod
+    def summary_message(text):
+        from google.genai import types as gemini_types  # pyright: ignore[reportMissingImports]
+
+        return gemini_types.Content(role="user", parts=[
+            gemini_types.Part(text=f"{SUMMARY_PREFIX}\n{text}")])
+
+    @staticmethod
+    def summary_text(content) -> str:
+        return content.parts[0].text[len(SUMMARY_PREFIX):].strip()
+
+    @staticmethod
+    def set_summary_text(content, text):
+        content.parts[0].text = f"{SUMMARY_PREFIX}\n{text}"
+
+    @staticmethod
+    def transcript(content) -> str:
+        lines = []
+        for part in content.parts or []:
+            if part.text:
+                lines.append(part.text)
+            if part.function_call:
+                lines.append(f"[called {part.function_call.name}({part.function_call.args})]")
+            if part.function_response:
+                lines.append(f"[{part.function_response.name} returned a result]")
+        return f"{content.role}: " + "\n".join(lines).strip()
+
+
+class ContextManager:
+    """
+    Keeps a session's prompt within a token budget.
+
+    The system prompt and the most recent turns are always kept verbatim. When the
+    estimated prompt exceeds the budget, tool results of older turns are collapsed
+    into short stubs first; if that is not enough, the oldest turns are removed and
+    replaced by a summary message. With a summarizer, the summary is produced in the
+    background so the current request is not delayed.
+    """
+
+    def __init__(self, adapter, token_budget=None, keep_turns=None, stub_chars=None, summarizer=None):
+        self.adapter = adapter
+        self.token_budget = token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "32000"))
+        self.keep_turns = max(1, keep_turns or int(os.getenv("CONTEXT_KEEP_TURNS", "4")))
+        self.stub_chars = stub_chars or int(os.getenv("CONTEXT_STUB_CHARS", "200"))
+        self.summarizer = summarizer
+        self._summary_pool = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="summarizer") if summarizer else None
+        self._summary_lock = threading.Lock()
+
+    def estimate(self, session) -> int:
+        return self.adapter.base_tokens + sum(self.adapter.tokens(m) for m in session)
+
+    def _recent_start(self, session) -> int:
+        """Index of the first message that belongs to the last `keep_turns` turns."""
+        seen = 0
+        for index in range(len(session) - 1, -1, -1):
+            if self.adapter.is_turn_start(session[index]):
+                seen += 1
+                if seen == self.keep_turns:
+                    return index
+        return 0
+
+    def compact(self, session, metrics=None) -> int:
+        """Compacts the session in place and returns the estimated prompt size."""
+        total = self.estimate(session)
+
+        if total > self.token_budget:
+            total = self._stub_old_tool_results(session, total, metrics)
+        if total > self.token_budget:
+            total = self._drop_old_turns(session, total, metrics)
+
+        if metrics is not None:
+            metrics.record(total)
+        return total
+
+    def _stub_old_tool_results(self, session, total, metrics):
+        recent_start = self._recent_start(session)
+        for index in range(recent_start):
+            stub = self.adapter.stub_tool_result(session[index], self.stub_chars)
+            if stub is None:
+                continue
+            total += self.adapter.tokens(stub) - self.adapter.tokens(session[index])
+            session[index] = stub
+            if metrics is not None:
+                metrics.stubbed_tool_results += 1
+            if total <= self.token_budget:
+                break
+        return total
+
+    def _pinned_count(self, session) -> int:
+        head = 0
+        while head < len(session) and self.adapter.is_pinned(session[head]):
+            head += 1
+        return head
+
+    def _drop_old_turns(self, session, total, metrics):
+        # Drop whole turns so tool calls and their results are never separated
+        while total > self.token_budget:
+            head = self._pinned_count(session)
+            recent_start = self._recent_start(session)
+            if head >= recent_start:
+                break
+
+            end = head + 1
+            while end < recent_start and not self.adapter.is_turn_start(session[end]):
+                end += 1
+
+            dropped = session[head:end]
+            del session[head:end]
+            self._summarize(session, dropped)
+            total = self.estimate(session)
+            if metrics is not None:
+                metrics.dropped_messages += len(dropped)
+
+        logger.info("Context compacted to ~%d tokens (budget %d)", total, self.token_budget)
+        return total
+
+    def _summary_message(self, session):
+        for msg in session:
+            if self.adapter.is_summary(msg):
+                return msg
+            if not self.adapter.is_pinned(msg):
+                break
+        return None
+
+    def _summarize(self, session, dropped):
+        """Folds dropped messages into the session's summary message."""
+        summary = self._summary_message(session)
+        if summary is None:
+            placeholder = SUMMARY_PENDING if self._summary_pool else SUMMARY_REMOVED
+            summary = self.adapter.summary_message(placeholder)
+            session.insert(self._pinned_count(session), summary)
+
+        if self._summary_pool is None:
+            return
+
+        transcript = "\n".join(self.adapter.transcript(m) for m in dropped)
+        self._summary_pool.submit(self._update_summary, summary, transcript)
+
+    def _update_summary(self, summary, transcript):
+        with self._summary_lock:
+            previous = self.adapter.summary_text(summary)
+            if previous in (SUMMARY_PENDING, SUMMARY_REMOVED):
+                previous = ""
+            try:
+                text = self.summarizer(f"{previous}\n\n{transcript}".strip())
+            except Exception as e:
+                logger.warning("Background summarization failed: %s", e)
+                return
+            if text:
+                self.adapter.set_summary_text(summary, text.strip())
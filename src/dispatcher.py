@@ -0,0 +1,146 @@
+import time
+import asyncio
+import logging
+from collections import deque
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Allows bursts of up to `burst` events, refilled at `rate` events per second."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def full(self) -> bool:
+        """True once the bucket has refilled; it then behaves like a new one."""
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class UserDispatcher:
+    """
+    Runs jobs on a bounded pool of asyncio workers: jobs of different users run
+    concurrently, while the jobs of one user run strictly one after another in the
+    order they were submitted.
+
+    A user waiting for a worker is queued once, no matter how many jobs they have
+    pending, so one busy user cannot take over the pool. Each user may have at most
+    `max_queue` jobs pending or running and is rate-limited by a token bucket.
+    Buckets of idle users are dropped once they have refilled, so they do not pile up.
+    """
+
+    # Idle buckets are pruned when there are this many (or twice as many as last time)
+    PRUNE_BUCKETS = 1024
+
+    ACCEPTED = "accepted"
+    QUEUE_FULL = "queue_full"
+    RATE_LIMITED = "rate_limited"
+
+    def __init__(self, workers: int = 8, max_queue: int = 5, rate: float = 1 / 3, burst: int = 5):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.rate = rate
+        self.burst = max(1, burst)
+
+        self._jobs = {}      # user -> deque of pending job factories
+        self._running = {}   # user -> asyncio.Task of the job in progress
+        self._buckets = {}   # user -> TokenBucket
+        self._prune_at = self.PRUNE_BUCKETS
+        self._ready = None   # asyncio.Queue of users with pending jobs and nothing running
+        self._tasks = []
+
+    async def start(self):
+        """Starts the workers on the running event loop."""
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"dispatch-worker-{i}")
+                       for i in range(self.workers)]
+
+    async def stop(self):
+        """Stops the workers and cancels the jobs in progress; pending jobs are dropped."""
+        for task in list(self._running.values()) + self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._jobs.clear()
+
+    def submit(self, user, job) -> str:
+        """
+        Queues job (a coroutine function without arguments) for user. Returns ACCEPTED,
+        or QUEUE_FULL / RATE_LIMITED when the job was rejected.
+        """
+        pending = self._jobs.get(user)
+        if (len(pending) if pending else 0) + (user in self._running) >= self.max_queue:
+            return self.QUEUE_FULL
+        bucket = self._buckets.get(user)
+        if bucket is None:
+            if len(self._buckets) >= self._prune_at:
+                self._prune_buckets()
+            bucket = self._buckets[user] = TokenBucket(self.rate, self.burst)
+        if not bucket.take():
+            return self.RATE_LIMITED
+
+        if pending is None:
+            pending = self._jobs[user] = deque()
+            # The user enters the ready queue only when they have nothing queued or running
+            if user not in self._running:
+                self._ready.put_nowait(user)
+        pending.append(job)
+        return self.ACCEPTED
+
+    def cancel(self, user) -> bool:
+        """Aborts the user's job in progress; their queued jobs still run. Returns whether one was running."""
+        task = self._running.get(user)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def forget(self, user):
+        """Drops the user's rate-limit state, e.g. when their session is deleted; queued jobs still run."""
+        self._buckets.pop(user, None)
+        if user not in self._running and not self._jobs.get(user):
+            self._jobs.pop(user, None)
+
+    def _prune_buckets(self):
+        for user in [user for user, bucket in self._buckets.items()
+                     if bucket.full() and user not in self._jobs and user not in self._running]:
+            del self._buckets[user]
+        self._prune_at = max(self.PRUNE_BUCKETS, 2 * len(self._buckets))
+
+    def pending(self, user) -> int:
+        """Number of the user's jobs that are queued or running."""
+        return len(self._jobs.get(user, ())) + (user in self._running)
+
+    async def _worker(self):
+        while True:
+            user = await self._ready.get()
+            pending = self._jobs.get(user)
+            if not pending:
+                self._jobs.pop(user, None)
+                continue
+            task = asyncio.create_task(pending.popleft()())
+            self._running[user] = task
+            try:
+                # A cancelled job must not take its worker down with it
+                await asyncio.wait([task])
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error("Job for %s failed: %s", user, task.exception())
+            finally:
+                del self._running[user]
+                if pending:
+                    self._ready.put_nowait(user)
+                else:
+                    self._jobs.pop(user, None)
@@ -0,0 +1,32 @@
+import os
+import sys
+import argparse
+from dotenv import load_dotenv  # pyright: ignore[reportMissingImports]
+from src.tools.doc_storage import FileStorage, copy_documents, get_storage
+
+
+# Load environment variables (DOC_STORAGE, DOC_STORAGE_PATH)
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy documents between the configured storage and a folder")
+    parser.add_argument("command", choices=["export", "import"],
+                        help="export: configured storage -> folder; import: folder -> configured storage")
+    parser.add_argument("folder", help="Folder to export to or import from")
+    args = parser.parse_args()
+
+    storage = get_storage(os.path.abspath(os.environ.get("DOCS_BASE_DIR", "docs")))
+    folder = FileStorage(args.folder)
+    if isinstance(storage, FileStorage) and storage.base_dir.resolve() == folder.base_dir.resolve():
+        sys.exit("The folder is the document storage itself.")
+
+    if args.command == "export":
+        print(f"Exported {copy_documents(storage, folder)} documents to {args.folder}")
+    else:
+        print(f"Imported {copy_documents(folder, storage)} documents from {args.folder}")
+        print("The search indexes are rebuilt the next time the agent starts.")
+
+
+if __name__ == "__main__":
+    main()
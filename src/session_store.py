@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import pathlib
+import threading
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    Keeps chat sessions in a bounded in-memory LRU (hot tier) backed by SQLite (cold tier).
+
+    Sessions are persisted as compressed, provider-serialized message lists after
+    every turn, so they survive restarts and can be evicted from memory at any time
+    and rehydrated on demand. Memory stays flat no matter how many users there are.
+    """
+
+    def __init__(self, agent, db_path=None, max_hot=None, idle_seconds=None):
+        self.agent = agent
+        self.db_path = db_path or os.getenv("SESSION_DB_PATH", "data/sessions.sqlite3")
+        self.max_hot = max(1, max_hot or int(os.getenv("SESSION_MAX_HOT", "256")))
+        self.idle_seconds = idle_seconds or float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+
+        self._hot = OrderedDict()  # key -> (session, last_access)
+        self._lock = threading.RLock()
+
+        if self.db_path != ":memory:":
+            pathlib.Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " key TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)")
+        self._db.commit()
+
+    def _encode(self, session) -> bytes:
+        data = self.agent.serialize_session(session)
+        return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    def _decode(self, blob: bytes):
+        return self.agent.deserialize_session(json.loads(zlib.decompress(blob).decode("utf-8")))
+
+    def _load(self, key):
+        row = self._db.execute("SELECT data FROM sessions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return self._decode(row[0])
+        except Exception as e:
+            logger.warning("Discarding unreadable session %s: %s", key, e)
+            return None
+
+    def _touch(self, key, session):
+        self._hot[key] = (session, time.monotonic())
+        self._hot.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        """Drops idle sessions and trims the hot tier; persisted copies stay in SQLite."""
+        now = time.monotonic()
+        while self._hot:
+            key, (_, last_access) = next(iter(self._hot.items()))
+            if len(self._hot) > self.max_hot or now - last_access > self.idle_seconds:
+                self._hot.popitem(last=False)
+            else:
+                break
+
+    def get(self, key):
+        """Returns the session for key, rehydrating or creating it as needed."""
+        key = str(key)
+        with self._lock:
+            if key in self._hot:
+                session = self._hot[key][0]
+            else:
+                session = self._load(key)
+                if session is None:
+                    session = self.agent.create_session()
+            self._touch(key, session)
+            return session
+
+    def save(self, key, session):
+        """Persists the session after a turn and keeps it in the hot tier."""
+        key = str(key)
+        blob = self._encode(session)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (key, data, updated_at) VALUES (?, ?, ?)",
+                (key, blob, time.time()))
+            self._db.commit()
+            self._touch(key, session)
+
+    def discard(self, key):
+        """Drops the in-memory copy, so the next get() returns the last saved state (e.g. after an aborted turn)."""
+        with self._lock:
+            self._hot.pop(str(key), None)
+
+    def reset(self, key):
+        """Replaces the session for key with a fresh one and returns it."""
+        self.delete(key)
+        return self.get(key)
+
+    def delete(self, key):
+        key = str(key)
+        with self._lock:
+            self._hot.pop(key, None)
+            self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+            self._db.commit()
+
+    def exists(self, key) -> bool:
+        key = str(key)
+        with self._lock:
+            if key in self._hot:
+                return True
+            return self._db.execute(
+                "SELECT 1 FROM sessions WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._hot)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
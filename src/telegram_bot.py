@@ -1,12 +1,16 @@
 import os
+import time
 import logging
 import asyncio
 from telegram import Update  # pyright: ignore[reportMissingImports]
+from telegram.error import BadRequest, RetryAfter  # pyright: ignore[reportMissingImports]
 
 from telegram.ext import (  # pyright: ignore[reportMissingImports]
     ApplicationBuilder, ContextTypes, MessageHandler, filters, CommandHandler)
 from dotenv import load_dotenv  # pyright: ignore[reportMissingImports]
-from src.agent_core import MyAgent
+from src.agent_core import AIStreamEvent, MyAgent
+from src.dispatcher import UserDispatcher
+from src.session_store import SessionStore
 
 
 # Load environment variables
@@ -28,91 +32,228 @@ AUTHORIZED_USERS = set(
     int(uid.strip()) for uid in authorized_users_str.split(',') if uid.strip()
 ) if authorized_users_str else set()
 
-# Store chat sessions per user
-user_sessions = {}
+# Chat sessions per user: bounded in memory, persisted across restarts
+session_store = SessionStore(agent)
 
+# Turns run on a bounded worker pool: different users concurrently, each user's turns in order
+dispatcher = UserDispatcher(
+    workers=int(os.getenv("TELEGRAM_WORKERS", "8")),
+    max_queue=int(os.getenv("TELEGRAM_MAX_QUEUE", "5")),
+    rate=float(os.getenv("TELEGRAM_RATE_PER_MINUTE", "20")) / 60,
+    burst=int(os.getenv("TELEGRAM_RATE_BURST", "5")),
+)
+
+# Minimum seconds between edits of a streamed reply (Telegram rate-limits message edits)
+EDIT_INTERVAL = float(os.getenv("TELEGRAM_EDIT_INTERVAL", "1.0"))
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+
+class StreamingReply:
+    """Progressively edits a Telegram reply message as text deltas arrive."""
+
+    def __init__(self, message, interval=EDIT_INTERVAL):
+        self.message = message  # The user's message being replied to
+        self.interval = interval
+        self.sent = None        # The bot message currently being edited
+        self.text = ""
+        self.shown = ""
+        self.last_edit = 0.0
+
+    async def append(self, delta: str):
+        self.text += delta
+
+        # Continue in a new message once the current one is full
+        while len(self.text) > MAX_MESSAGE_LENGTH:
+            head, self.text = self.text[:MAX_MESSAGE_LENGTH], self.text[MAX_MESSAGE_LENGTH:]
+            await self._show(head, force=True)
+            self.sent = None
+            self.shown = ""
+
+        if time.monotonic() - self.last_edit >= self.interval:
+            await self._show(self.text)
+
+    async def finish(self, fallback_text: str = ""):
+        if not self.text.strip() and self.sent is None:
+            self.text = fallback_text
+        await self._show(self.text, force=True)
+
+    async def _show(self, text: str, force: bool = False):
+        if not text.strip() or text == self.shown:
+            return
+        try:
+            if self.sent is None:
+                self.sent = await self.message.reply_text(text, parse_mode=None)
+            else:
+                await self.sent.edit_text(text, parse_mode=None)
+            self.shown = text
+        except RetryAfter as e:
+            # Intermediate edits can simply be skipped; the final one must land
+            if not force:
+                return
+            await asyncio.sleep(e.retry_after)
+            await self._show(text, force=True)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+        self.last_edit = time.monotonic()
+
+
+def _session_key(user_id) -> str:
+    return f"telegram:{user_id}"
 
-async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle the /clear command."""
-    user_id = update.effective_user.id
 
-    # Check if the user is authorized
+async def _is_authorized(update: Update) -> bool:
+    user_id = update.effective_user.id
     if AUTHORIZED_USERS and user_id not in AUTHORIZED_USERS:
         logging.warning(f"Unauthorized access attempt from user ID: {user_id}")
         await update.message.reply_text("Sorry, you don't have access to this bot.")
-        return
+        return False
+    return True
 
-    # Reset the session for this user
-    user_sessions[user_id] = agent.create_session()
-    logging.info(f"Chat history cleared for user ID: {user_id}")
-    await update.message.reply_text("Chat history cleared.")
 
+async def _submit(update: Update, job):
+    """Queues a job behind the user's earlier messages and tells them if it was rejected."""
+    result = dispatcher.submit(update.effective_user.id, job)
+    if result == UserDispatcher.QUEUE_FULL:
+        await update.message.reply_text(
+            "You already have several requests waiting. Please wait for the replies, or send /cancel.")
+    elif result == UserDispatcher.RATE_LIMITED:
+        await update.message.reply_text("You're sending messages too quickly. Please wait a moment.")
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle incoming messages from Telegram."""
+
+async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /clear command."""
+    if not await _is_authorized(update):
+        return
     user_id = update.effective_user.id
-    text = update.message.text
 
-    # Check if the user is authorized
-    if AUTHORIZED_USERS and user_id not in AUTHORIZED_USERS:
-        logging.warning(f"Unauthorized access attempt from user ID: {user_id}")
-        await update.message.reply_text("Sorry, you don't have access to this bot.")
+    async def clear():
+        # Runs in the user's queue, so a turn in progress finishes first
+        session_store.reset(_session_key(user_id))
+        logging.info(f"Chat history cleared for user ID: {user_id}")
+        await update.message.reply_text("Chat history cleared.")
+
+    await _submit(update, clear)
+
+
+async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /cancel command: abort the turn in progress (queued messages still run)."""
+    if not await _is_authorized(update):
         return
+    if dispatcher.cancel(update.effective_user.id):
+        logging.info(f"Turn cancelled for user ID: {update.effective_user.id}")
+    else:
+        await update.message.reply_text("Nothing to cancel.")
 
-    if not text:
+
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle incoming messages from Telegram."""
+    if not await _is_authorized(update):
+        return
+    if not update.message.text:
         return
+    await _submit(update, lambda: run_turn(update, context))
 
-    # Get or create chat session for this user
-    if user_id not in user_sessions:
-        user_sessions[user_id] = agent.create_session()
 
-    chat_session = user_sessions[user_id]
+async def run_turn(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Runs one agent turn for a message; called by the dispatcher in the user's order."""
+    user_id = update.effective_user.id
+    text = update.message.text
 
-    # Send a typing indicator
-    await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+    # Get or create chat session for this user
+    chat_session = session_store.get(_session_key(user_id))
+
+    reply = StreamingReply(update.message)
 
     try:
-        # Get response from MyAgent
-        response_obj = agent.send_message(text, chat_session=chat_session)
-
-        response_text = ""
-        if hasattr(response_obj, 'text') and response_obj.text:
-            response_text = response_obj.text
-        elif (hasattr(response_obj, 'candidates') and response_obj.candidates and
-              response_obj.candidates[0].content and response_obj.candidates[0].content.parts):
-            for part in response_obj.candidates[0].content.parts:
-                if part.text:
-                    response_text += part.text
-                if part.function_call:
-                    # Inform user about tool calls (optional, but helpful for transparency)
-                    tool_info = f"\n\n🛠️ *Tool Called:* `{part.function_call.name}`"
-                    response_text += tool_info
+        # Send a typing indicator
+        await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+
+        # Stream the response from MyAgent, editing the reply as text arrives
+        response_obj = None
+        tool_info = ""
+        async for event in agent.stream_message_async(text, chat_session=chat_session):
+            if event.type == AIStreamEvent.TEXT:
+                await reply.append(event.text)
+            elif event.type == AIStreamEvent.TOOL_CALL:
+                # Inform user about tool calls if no text is produced (transparency)
+                tool_info += f"\n\n🛠️ Tool Called: {event.function_call.name}"
+                await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+            elif event.type == AIStreamEvent.DONE:
+                response_obj = event.response
+
+        if response_obj is not None and response_obj.text and not reply.text:
+            fallback_text = response_obj.text
+        elif tool_info:
+            fallback_text = tool_info.strip()
         else:
-            response_text = "Sorry, something went wrong while generating the response."
+            fallback_text = "Sorry, something went wrong while generating the response."
 
-        # Send response back to Telegram
-        await update.message.reply_text(response_text, parse_mode=None)
+        await reply.finish(fallback_text)
+        await asyncio.to_thread(session_store.save, _session_key(user_id), chat_session)
 
+    except asyncio.CancelledError:
+        # /cancel: the history may stop mid tool loop, so fall back to the last saved state
+        session_store.discard(_session_key(user_id))
+        await reply.append("\n\n⏹️ Cancelled.")
+        await reply.finish()
+        raise
     except Exception as e:
+        # Same for a failed turn: the next message must not build on half a tool loop
+        session_store.discard(_session_key(user_id))
         logging.error(f"Error handling message: {e}")
         await update.message.reply_text(f"An error occurred: {e}")
 
 
-def main():
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-
-    if not token:
-        print("Error: TELEGRAM_BOT_TOKEN not found in .env file.")
-        return
-
-    application = ApplicationBuilder().token(token).build()
+def build_application(token):
+    """Creates the Telegram application with this bot's handlers (shared by polling and webhook mode)."""
+    builder = ApplicationBuilder().token(token)
+    # A local Bot API server, or a stub of it for offline tests (e.g. http://127.0.0.1:8081/bot)
+    if os.getenv("TELEGRAM_API_URL"):
+        builder = builder.base_url(os.getenv("TELEGRAM_API_URL"))
+    application = builder.build()
 
     # Add handlers
     application.add_handler(CommandHandler("clear", clear_command))
+    application.add_handler(CommandHandler("cancel", cancel_command))
     
     message_handler = MessageHandler(
         filters.TEXT & (~filters.COMMAND), handle_message)
     application.add_handler(message_handler)
+    return application
+
+
+async def serve_updates(token, updates):
+    """
+    Webhook worker: processes raw update dicts taken from updates (a multiprocessing
+    queue filled by src/telegram_webhook.py) until None arrives.
+    """
+    application = build_application(token)
+    await application.initialize()
+    await dispatcher.start()
+    try:
+        while (data := await asyncio.to_thread(updates.get)) is not None:
+            # Handlers only queue work on the dispatcher, so updates are taken in arrival order
+            await application.process_update(Update.de_json(data, application.bot))
+    finally:
+        await dispatcher.stop()
+        await application.shutdown()
+
+
+def main():
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+
+    if not token:
+        print("Error: TELEGRAM_BOT_TOKEN not found in .env file.")
+        return
+
+    application = build_application(token)
+    # Handlers only queue work on the dispatcher, so updates are taken in order (keeping each
+    # user's messages ordered) while the turns themselves run concurrently on its workers
+    application.post_init = lambda app: dispatcher.start()
+    application.post_shutdown = lambda app: dispatcher.stop()
 
     print("Telegram Bot is running...")
     application.run_polling()
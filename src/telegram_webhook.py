@@ -0,0 +1,202 @@
+import os
+import hmac
+import json
+import zlib
+import queue
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from contextlib import asynccontextmanager
+import requests  # pyright: ignore[reportMissingModuleSource]
+import uvicorn  # pyright: ignore[reportMissingImports]
+from fastapi import FastAPI, HTTPException, Request, Response  # pyright: ignore[reportMissingImports]
+from dotenv import load_dotenv  # pyright: ignore[reportMissingImports]
+
+
+# Load environment variables
+load_dotenv()
+
+# Logging setup
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+WEBHOOK_PATH = os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram/webhook")
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Update fields whose "from" (or "chat") identifies the user an update belongs to
+_SENDER_FIELDS = ("message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+                  "shipping_query", "pre_checkout_query", "poll_answer", "my_chat_member", "chat_member",
+                  "chat_join_request", "channel_post", "edited_channel_post")
+
+
+def update_user_key(data: dict):
+    """Returns the user (or chat) an update belongs to, falling back to its update_id."""
+    for field in _SENDER_FIELDS:
+        item = data.get(field)
+        if isinstance(item, dict):
+            sender = item.get("from") or item.get("user") or item.get("chat") or {}
+            if "id" in sender:
+                return sender["id"]
+    return data.get("update_id", 0)
+
+
+def _worker_main(token, updates):
+    # Imported here so the front process does not load the agent and its tools
+    from src.telegram_bot import serve_updates
+    try:
+        asyncio.run(serve_updates(token, updates))
+    except KeyboardInterrupt:
+        pass
+
+
+class WorkerPool:
+    """
+    Bot worker processes behind the webhook endpoint. Every update of a user goes to
+    the same worker, so the worker's dispatcher keeps that user's messages in order
+    and /cancel reaches the turn it is meant for.
+    """
+
+    def __init__(self, token, count, max_pending):
+        self.token = token
+        self.count = max(1, count)
+        self.max_pending = max_pending
+        self.queues = []
+        self.processes = []
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        for i in range(self.count):
+            updates = context.Queue(maxsize=self.max_pending)
+            process = context.Process(target=_worker_main, args=(self.token, updates),
+                                      name=f"telegram-worker-{i}", daemon=True)
+            process.start()
+            self.queues.append(updates)
+            self.processes.append(process)
+
+    def route(self, data: dict) -> bool:
+        """Hands an update to its user's worker; False if that worker is backed up."""
+        index = zlib.crc32(str(update_user_key(data)).encode("utf-8")) % self.count
+        try:
+            self.queues[index].put_nowait(data)
+            return True
+        except queue.Full:
+            return False
+
+    def alive(self) -> int:
+        return sum(1 for process in self.processes if process.is_alive())
+
+    def stop(self, timeout=10):
+        for updates in self.queues:
+            try:
+                updates.put(None, timeout=1)
+            except queue.Full:
+                pass
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+def create_app(token=None, secret=None, workers=None, max_pending=None) -> FastAPI:
+    """Builds the ASGI app that receives Telegram updates and passes them to the worker processes."""
+    token = token or os.getenv("TELEGRAM_BOT_TOKEN")
+    secret = secret if secret is not None else os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+    if not secret:
+        raise ValueError("TELEGRAM_WEBHOOK_SECRET must be set to run the webhook")
+    pool = WorkerPool(token, workers or int(os.getenv("TELEGRAM_WEBHOOK_WORKERS", "2")),
+                      max_pending or int(os.getenv("TELEGRAM_WEBHOOK_MAX_PENDING", "1000")))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        pool.start()
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(pool.stop)
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.pool = pool
+
+    @app.post(WEBHOOK_PATH)
+    async def webhook(request: Request):
+        # Telegram sends the secret given to setWebhook with every request
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+            raise HTTPException(status_code=403, detail="Invalid secret token")
+        try:
+            data = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON")
+        if not isinstance(data, dict) or "update_id" not in data:
+            raise HTTPException(status_code=400, detail="Not a Telegram update")
+        if not pool.route(data):
+            # Telegram retries undelivered updates later
+            return Response(status_code=503)
+        return {"ok": True}
+
+    @app.get("/healthz")
+    async def healthz():
+        alive = pool.alive()
+        if alive < pool.count:
+            raise HTTPException(status_code=503, detail=f"{alive} of {pool.count} workers alive")
+        return {"workers": alive}
+
+    return app
+
+
+async def _register_webhook(token, url, secret):
+    from telegram import Bot  # pyright: ignore[reportMissingImports]
+
+    async with Bot(token, base_url=os.getenv("TELEGRAM_API_URL") or "https://api.telegram.org/bot") as bot:
+        await bot.set_webhook(url, secret_token=secret,
+                              max_connections=int(os.getenv("TELEGRAM_WEBHOOK_MAX_CONNECTIONS", "40")))
+
+
+def replay(path, url, secret):
+    """Posts recorded updates (a JSON array, or one JSON object per line) to a running webhook."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    updates = json.loads(text) if text.startswith("[") else [json.loads(line) for line in text.splitlines() if line.strip()]
+    for data in updates:
+        response = requests.post(url, json=data, headers={SECRET_HEADER: secret}, timeout=10)
+        print(f"update {data.get('update_id')}: HTTP {response.status_code}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telegram bot in webhook mode")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="Post recorded update JSON from FILE to a running webhook instead of serving")
+    args = parser.parse_args()
+
+    host = os.getenv("TELEGRAM_WEBHOOK_HOST", "127.0.0.1")
+    port = int(os.getenv("TELEGRAM_WEBHOOK_PORT", "8443"))
+    secret = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+
+    if args.replay:
+        replay(args.replay, f"http://{host}:{port}{WEBHOOK_PATH}", secret)
+        return
+
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not token:
+        print("Error: TELEGRAM_BOT_TOKEN not found in .env file.")
+        return
+    if not secret:
+        print("Error: TELEGRAM_WEBHOOK_SECRET not found in .env file.")
+        return
+
+    # The public HTTPS address that forwards to this server; registered with Telegram when set
+    public_url = os.getenv("TELEGRAM_WEBHOOK_URL")
+    if public_url:
+        asyncio.run(_register_webhook(token, public_url, secret))
+
+    print(f"Telegram Bot webhook is listening on http://{host}:{port}{WEBHOOK_PATH}")
+    uvicorn.run(create_app(token, secret), host=host, port=port)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nTelegram Bot stopped.")
@@ -0,0 +1,135 @@
+import os
+import asyncio
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Document tools whose calls are ordered per path.
+# Calls that share a path are executed sequentially in their original order.
+DOC_PATH_TOOLS = {"write_doc", "append_doc", "replace_in_doc", "patch_doc",
+                  "read_doc", "outline_doc", "rename_doc", "move_doc", "delete_doc"}
+
+
+class ToolCall:
+    """A single tool invocation requested by the model."""
+
+    def __init__(self, name, args, call_id=None):
+        self.name = name
+        # Valid JSON that is not an object (e.g. a list) is treated like unparsable arguments
+        self.args = args if isinstance(args, dict) else {}
+        self.call_id = call_id
+
+
+def _normalize_doc_path(path) -> str:
+    path = str(path or "").replace("\\", "/").strip()
+    return posixpath.normpath(path).lstrip("/").lower()
+
+
+def _doc_paths(call: ToolCall) -> set:
+    """Returns the normalized document paths a tool call reads or mutates."""
+    if call.name not in DOC_PATH_TOOLS:
+        return set()
+
+    filepath = call.args.get("filepath")
+    paths = {_normalize_doc_path(filepath)}
+
+    if call.name == "rename_doc":
+        parent = posixpath.dirname(_normalize_doc_path(filepath))
+        paths.add(_normalize_doc_path(
+            posixpath.join(parent, str(call.args.get("new_name", "")))))
+    elif call.name == "move_doc":
+        name = posixpath.basename(_normalize_doc_path(filepath))
+        paths.add(_normalize_doc_path(
+            posixpath.join(str(call.args.get("target_dir", "")), name)))
+
+    return paths
+
+
+class ToolExecutor:
+    """
+    Executes the tool calls of one model message on a bounded thread pool.
+
+    Independent calls run in parallel. Document calls that touch the same path
+    are grouped into a single lane and run one after another, so parallel calls
+    never race on the same file. Results are always returned in call order.
+    """
+
+    def __init__(self, tools_list, max_workers=None):
+        self.tool_map = {t.__name__: t for t in tools_list}
+        if max_workers is None:
+            max_workers = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+        self.max_workers = max(1, max_workers)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="tool")
+
+    def invoke(self, call: ToolCall) -> str:
+        """Runs a single tool call and returns its result as a string."""
+        func = self.tool_map.get(call.name)
+        if func is None:
+            return f"Error: Unknown tool {call.name}"
+        try:
+            return str(func(**call.args))
+        except Exception as e:
+            return f"Error executing {call.name}: {e}"
+
+    def _lanes(self, calls) -> list:
+        """Groups call indices so that calls sharing a document path stay ordered."""
+        lanes = []
+        lane_of_path = {}
+
+        for index, call in enumerate(calls):
+            paths = _doc_paths(call)
+            joined = {lane_of_path[p] for p in paths if p in lane_of_path}
+
+            if not joined:
+                lane = [index]
+                lanes.append(lane)
+            else:
+                # Merge every lane this call depends on, preserving call order.
+                merged = sorted(i for lane_id in joined for i in lanes[lane_id])
+                lane = merged + [index]
+                for lane_id in joined:
+                    lanes[lane_id] = None
+                lanes.append(lane)
+
+            lane_id = len(lanes) - 1
+            for lane_index in lane:
+                for p in _doc_paths(calls[lane_index]):
+                    lane_of_path[p] = lane_id
+
+        return [lane for lane in lanes if lane]
+
+    def _run_lane(self, calls, lane, results):
+        for index in lane:
+            results[index] = self.invoke(calls[index])
+
+    def run(self, calls) -> list:
+        """Executes the calls and returns their results in the original order."""
+        calls = list(calls)
+        results = [None] * len(calls)
+        if not calls:
+            return results
+
+        lanes = self._lanes(calls)
+        if len(lanes) == 1:
+            # Nothing to parallelize; avoid the thread hop.
+            self._run_lane(calls, lanes[0], results)
+            return results
+
+        futures = [self._pool.submit(self._run_lane, calls, lane, results)
+                   for lane in lanes]
+        for future in futures:
+            future.result()
+        return results
+
+    async def run_async(self, calls) -> list:
+        """Awaitable variant of run; tools execute on the pool, not the event loop."""
+        calls = list(calls)
+        results = [None] * len(calls)
+        futures = [asyncio.wrap_future(self._pool.submit(self._run_lane, calls, lane, results))
+                   for lane in self._lanes(calls)]
+        await asyncio.gather(*futures)
+        return results
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -1,7 +1,168 @@
-import arxiv  # pyright: ignore[reportMissingImports]
+import os
+import re
+import json
+import time
+import sqlite3
+import pathlib
+import threading
 from typing import List, Dict
 
 
+# Largest page requested from the arXiv API; smaller searches request only what they need
+PAGE_SIZE = int(os.getenv("ARXIV_PAGE_SIZE", "50"))
+# Search results are reused for this many seconds; paper metadata is kept indefinitely
+QUERY_TTL = float(os.getenv("ARXIV_QUERY_TTL", str(24 * 60 * 60)))
+
+# One client for the whole process so its HTTP session and rate-limit clock are shared.
+# arXiv asks for at most one request every 3 seconds, so requests go through a lock.
+# The arxiv package is imported with the first request rather than at startup.
+_client = None
+_client_lock = threading.Lock()
+
+_VERSION_SUFFIX = re.compile(r"v\d+$")
+
+
+def normalize_arxiv_id(value: str) -> str:
+    """Turns "arXiv:2107.05580v1", "https://arxiv.org/abs/2107.05580" etc. into "2107.05580"."""
+    value = value.strip()
+    for marker in ("arxiv.org/abs/", "arxiv.org/pdf/"):
+        if marker in value:
+            value = value.split(marker, 1)[1]
+    if value.lower().startswith("arxiv:"):
+        value = value[6:]
+    value = value.split("?")[0].split("#")[0].rstrip("/")
+    if value.endswith(".pdf"):
+        value = value[:-4]
+    return _VERSION_SUFFIX.sub("", value)
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class ArxivStore:
+    """
+    Local SQLite store of arXiv paper metadata keyed by arXiv ID (without version),
+    plus the IDs each search query returned, so repeat searches and lookups by ID
+    are answered without calling the API.
+    """
+
+    def __init__(self, db_path=None, query_ttl=QUERY_TTL):
+        self.db_path = db_path or os.getenv("ARXIV_DB_PATH", "data/arxiv.sqlite3")
+        self.query_ttl = query_ttl
+        self._lock = threading.Lock()
+
+        if self.db_path != ":memory:":
+            pathlib.Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS papers ("
+            " id TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS queries ("
+            " query TEXT PRIMARY KEY, ids TEXT NOT NULL, max_results INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL)")
+        self._db.commit()
+
+    def put_papers(self, papers):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO papers (id, data, fetched_at) VALUES (?, ?, ?)",
+                [(paper["id"], json.dumps(paper, ensure_ascii=False), now) for paper in papers])
+            self._db.commit()
+
+    def get_papers(self, ids) -> dict:
+        """Returns {id: paper} for the IDs that are stored."""
+        ids = list(ids)
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, data FROM papers WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall()
+        return {paper_id: json.loads(data) for paper_id, data in rows}
+
+    def put_query(self, query, max_results, ids):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO queries (query, ids, max_results, fetched_at) VALUES (?, ?, ?, ?)",
+                (_normalize_query(query), json.dumps(ids), max_results, time.time()))
+            self._db.commit()
+
+    def get_query(self, query, max_results):
+        """Returns the stored result IDs for a query if they are fresh and cover max_results."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT ids, max_results, fetched_at FROM queries WHERE query = ?",
+                (_normalize_query(query),)).fetchone()
+        if row is None or time.time() - row[2] > self.query_ttl:
+            return None
+        ids = json.loads(row[0])
+        # A smaller earlier search can answer this one only if it already returned everything
+        if row[1] < max_results and len(ids) >= row[1]:
+            return None
+        return ids[:max_results]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ArxivStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArxivStore()
+    return _store
+
+
+def _to_paper(result) -> Dict:
+    return {
+        "id": normalize_arxiv_id(result.get_short_id()),
+        "title": result.title,
+        "authors": ", ".join([author.name for author in result.authors]),
+        "summary": result.summary,
+        "published": result.published.date().isoformat() if result.published else "",
+        "url": result.entry_id,
+        "pdf_url": result.pdf_url
+    }
+
+
+def _fetch(search) -> List[Dict]:
+    import arxiv  # pyright: ignore[reportMissingImports]
+
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = arxiv.Client(page_size=PAGE_SIZE, delay_seconds=3.0, num_retries=3)
+        # Request no more than the search needs so small searches stay small
+        _client.page_size = max(1, min(PAGE_SIZE, search.max_results or PAGE_SIZE))
+        return [_to_paper(result) for result in _client.results(search)]
+
+
+def _search(query: str, max_results: int) -> List[Dict]:
+    store = get_store()
+    ids = store.get_query(query, max_results)
+    if ids is not None:
+        papers = store.get_papers(ids)
+        if len(papers) == len(ids):
+            return [papers[paper_id] for paper_id in ids]
+
+    import arxiv  # pyright: ignore[reportMissingImports]
+
+    papers = _fetch(arxiv.Search(
+        query=query,
+        max_results=max_results,
+        sort_by=arxiv.SortCriterion.Relevance,
+        sort_order=arxiv.SortOrder.Descending
+    ))
+    store.put_papers(papers)
+    store.put_query(query, max_results, [paper["id"] for paper in papers])
+    return papers
+
+
 def search_arxiv(query: str, max_results: int = 5) -> List[Dict]:
     """
     Searches arXiv for academic papers matching the query.
@@ -13,35 +174,93 @@ def search_arxiv(query: str, max_results: int = 5) -> List[Dict]:
 
     Returns:
         A list of dictionaries, where each dictionary represents a paper with:
+        - 'id': The arXiv ID of the paper.
         - 'title': The title of the paper.
         - 'authors': A comma-separated string of author names.
         - 'summary': The abstract of the paper.
+        - 'published': The publication date.
         - 'url': The URL to the arXiv page.
         - 'pdf_url': The URL to the PDF document.
     """
     try:
-        search = arxiv.Search(
-            query=query,
-            max_results=max_results,
-            sort_by=arxiv.SortCriterion.Relevance,
-            sort_order=arxiv.SortOrder.Descending
-        )
-
-        results = []
-        for result in search.results():
-            authors = ", ".join([author.name for author in result.authors])
-            results.append({
-                "title": result.title,
-                "authors": authors,
-                "summary": result.summary,
-                "url": result.entry_id,
-                "pdf_url": result.pdf_url
-            })
-        return results
+        return _search(query, max_results)
     except Exception as e:
         return [{"error": f"Error searching arXiv: {e}"}]
 
 
+def search_arxiv_many(queries: list[str], max_results: int = 5) -> List[Dict]:
+    """
+    Runs several arXiv searches in one call.
+    Use this tool instead of repeated search_arxiv calls when you need to search for several topics.
+    A paper already listed for an earlier query is shown again only by its id and title.
+
+    Args:
+        queries: The list of search queries.
+        max_results: The maximum number of search results to return per query.
+
+    Returns:
+        A list of dictionaries, one per query, each with:
+        - 'query': The search query.
+        - 'papers': The matching papers, in the same format as search_arxiv.
+        - 'error': An error message instead of 'papers' if that search failed.
+    """
+    if isinstance(queries, str):
+        queries = [queries]
+
+    results = []
+    seen = set()
+    for query in dict.fromkeys(q.strip() for q in queries if q and q.strip()):
+        try:
+            papers = _search(query, max_results)
+        except Exception as e:
+            results.append({"query": query, "error": f"Error searching arXiv: {e}"})
+            continue
+
+        listed = []
+        for paper in papers:
+            if paper["id"] in seen:
+                listed.append({"id": paper["id"], "title": paper["title"]})
+            else:
+                seen.add(paper["id"])
+                listed.append(paper)
+        results.append({"query": query, "papers": listed})
+    return results
+
+
+def get_arxiv_papers(arxiv_ids: list[str]) -> List[Dict]:
+    """
+    Looks up arXiv papers by their IDs.
+    Use this tool when you already know the arXiv IDs or URLs of papers (e.g., "2107.05580").
+
+    Args:
+        arxiv_ids: The list of arXiv IDs or arXiv URLs.
+
+    Returns:
+        A list of dictionaries in the same format as search_arxiv, one per ID,
+        or a dictionary with 'id' and 'error' for an ID that was not found.
+    """
+    if isinstance(arxiv_ids, str):
+        arxiv_ids = [arxiv_ids]
+    ids = list(dict.fromkeys(normalize_arxiv_id(i) for i in arxiv_ids if i and i.strip()))
+
+    try:
+        store = get_store()
+        papers = store.get_papers(ids)
+        missing = [paper_id for paper_id in ids if paper_id not in papers]
+        if missing:
+            # All unknown IDs are fetched with a single API request
+            import arxiv  # pyright: ignore[reportMissingImports]
+
+            fetched = _fetch(arxiv.Search(id_list=missing, max_results=len(missing)))
+            store.put_papers(fetched)
+            papers.update({paper["id"]: paper for paper in fetched})
+    except Exception as e:
+        return [{"error": f"Error looking up arXiv papers: {e}"}]
+
+    return [papers.get(paper_id) or {"id": paper_id, "error": "Paper not found on arXiv."}
+            for paper_id in ids]
+
+
 if __name__ == "__main__":
     # Example usage:
     # results = search_arxiv("reinforcement learning", max_results=2)
@@ -0,0 +1,216 @@
+import os
+import re
+import pathlib
+import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
+from .doc_storage import FileStorage, content_hash
+
+
+# Directory inside the docs sandbox that holds index files; hidden from the document tools
+INDEX_DIR_NAME = ".index"
+
+# Files with these suffixes are indexed
+INDEXED_SUFFIXES = (".md", ".markdown", ".txt")
+
+_HEADING = re.compile(r"^#\s+(.+)$", re.MULTILINE)
+_QUERY_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def _title_of(path: str, text: str) -> str:
+    match = _HEADING.search(text)
+    return match.group(1).strip() if match else pathlib.PurePosixPath(path).stem
+
+
+def like_prefix(relative: str) -> str:
+    """LIKE pattern (with ESCAPE '\\') for every path under a directory."""
+    escaped = relative.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "/%"
+
+
+def is_hidden(relative: pathlib.PurePath) -> bool:
+    """True for paths inside dot-directories (such as the index directory) or dotfiles."""
+    return any(part.startswith(".") for part in relative.parts)
+
+
+class DocIndex:
+    """
+    Incremental SQLite FTS5 full-text index over the documents in the sandbox.
+
+    Each file row keeps the mtime, size and content hash it was indexed with, so a
+    startup sync only re-reads files that changed. DocumentManager updates the index
+    after every write, rename, move and delete.
+
+    With `locks` (DocLocks), every write transaction holds the "search" lock, so several
+    processes can share the index. A write that fails anyway marks the index for a full
+    sync, which runs before the next search or write.
+    """
+
+    def __init__(self, base_dir: pathlib.Path, db_path=None, storage=None, locks=None):
+        self.base_dir = pathlib.Path(base_dir)
+        self.storage = storage or FileStorage(self.base_dir)
+        self.db_path = db_path or os.getenv("DOC_INDEX_PATH") or str(
+            self.base_dir / INDEX_DIR_NAME / "search.sqlite3")
+        self.locks = locks
+        self.needs_sync = False
+        self._lock = threading.Lock()
+
+        if self.db_path != ":memory:":
+            pathlib.Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Transactions are opened explicitly (BEGIN IMMEDIATE) in _write
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        with self._write():
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL,"
+                " mtime REAL NOT NULL, size INTEGER NOT NULL, hash TEXT NOT NULL)")
+            # The FTS rowid is files.id, so renames only touch the files table
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5("
+                " title, content, tokenize = 'unicode61 remove_diacritics 2')")
+
+    @contextmanager
+    def _write(self):
+        """One write transaction, serialized across threads and (with locks) processes."""
+        with self._lock, (self.locks.named("search") if self.locks else nullcontext()):
+            if self._db.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                self._db.execute("PRAGMA journal_mode=WAL")
+            # Takes the write lock up front instead of failing when a read turns into a write
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                self.needs_sync = True
+                raise
+
+    def _sync_if_needed(self):
+        if self.needs_sync:
+            self.sync()
+
+    def _relative(self, path: pathlib.Path) -> str:
+        return path.relative_to(self.base_dir).as_posix()
+
+    def _indexable(self, path: pathlib.Path) -> bool:
+        return (path.suffix.lower() in INDEXED_SUFFIXES
+                and not is_hidden(path.relative_to(self.base_dir)))
+
+    def _upsert(self, relative, stat, data, digest):
+        text = data.decode("utf-8", errors="replace")
+        mtime, size = stat
+        row = self._db.execute("SELECT id FROM files WHERE path = ?", (relative,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM docs_fts WHERE rowid = ?", (row[0],))
+        # An existing row keeps its id, so its FTS rowid stays valid
+        file_id = self._db.execute(
+            "INSERT OR REPLACE INTO files (id, path, mtime, size, hash) VALUES (?, ?, ?, ?, ?)",
+            (row[0] if row else None, relative, mtime, size, digest)).lastrowid
+        self._db.execute("INSERT INTO docs_fts (rowid, title, content) VALUES (?, ?, ?)",
+                         (file_id, _title_of(relative, text), text))
+
+    def update(self, path: pathlib.Path):
+        """(Re)indexes a single file after it was written."""
+        relative = self._relative(path)
+        stat = self.storage.stat(relative)
+        if stat is None or not self._indexable(path):
+            return
+        data = self.storage.read_bytes(relative)
+        self._sync_if_needed()
+        with self._write():
+            self._upsert(relative, stat, data, content_hash(data))
+
+    def remove(self, path: pathlib.Path):
+        """Drops a file, or every file under a directory, from the index."""
+        relative = self._relative(path)
+        self._sync_if_needed()
+        with self._write():
+            rows = self._db.execute(
+                "SELECT id FROM files WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                (relative, like_prefix(relative))).fetchall()
+            for (file_id,) in rows:
+                self._db.execute("DELETE FROM docs_fts WHERE rowid = ?", (file_id,))
+                self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def rename(self, old_path: pathlib.Path, new_path: pathlib.Path):
+        """Re-keys a renamed or moved file or directory without re-reading its content."""
+        old, new = self._relative(old_path), self._relative(new_path)
+        self._sync_if_needed()
+        with self._write():
+            self._db.execute(
+                "UPDATE files SET path = ? || substr(path, ?) WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                (new, len(old) + 1, old, like_prefix(old)))
+            indexed = self._db.execute("SELECT 1 FROM files WHERE path = ?", (new,)).fetchone()
+        # A file renamed to or from a non-indexed suffix changes its indexability
+        is_file = self.storage.is_file(new)
+        if is_file and not self._indexable(new_path):
+            self.remove(new_path)
+        elif is_file and indexed is None:
+            self.update(new_path)
+
+    def sync(self) -> int:
+        """
+        Brings the index in line with the stored documents. Files whose mtime and size are
+        unchanged are skipped; changed ones are re-read only when their hash differs.
+        Returns the number of files (re)indexed or removed.
+        """
+        changed = 0
+        with self._write():
+            # Cleared first: a failure inside this transaction sets it again
+            self.needs_sync = False
+            known = {path: (mtime, size, digest) for path, mtime, size, digest in
+                     self._db.execute("SELECT path, mtime, size, hash FROM files")}
+
+            for relative, stat in self.storage.scan().items():
+                if not self._indexable(self.base_dir / relative):
+                    continue
+                previous = known.pop(relative, None)
+                if previous and tuple(previous[:2]) == stat:
+                    continue
+
+                data = self.storage.read_bytes(relative)
+                digest = content_hash(data)
+                if previous and previous[2] == digest:
+                    self._db.execute("UPDATE files SET mtime = ?, size = ? WHERE path = ?",
+                                     stat + (relative,))
+                    continue
+                self._upsert(relative, stat, data, digest)
+                changed += 1
+
+            # Whatever is left was deleted while we were not running
+            for relative in known:
+                row = self._db.execute("SELECT id FROM files WHERE path = ?", (relative,)).fetchone()
+                self._db.execute("DELETE FROM docs_fts WHERE rowid = ?", (row[0],))
+                self._db.execute("DELETE FROM files WHERE id = ?", (row[0],))
+                changed += 1
+        return changed
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """Returns [(path, title, snippet)] ranked by BM25, titles weighted above body text."""
+        terms = _QUERY_TERM.findall(query)
+        if not terms:
+            return []
+        # Prefix matching lets "검색" find "검색을" and "index" find "indexing"
+        quoted = ['"' + term.replace('"', '""') + '"*' for term in terms]
+
+        try:
+            self._sync_if_needed()
+        except Exception:
+            pass  # Search what is there; the sync is retried next time
+
+        with self._lock:
+            for match in (" ".join(quoted), " OR ".join(quoted)):
+                rows = self._db.execute(
+                    "SELECT files.path, docs_fts.title,"
+                    " snippet(docs_fts, 1, '[', ']', ' … ', 16)"
+                    " FROM docs_fts JOIN files ON files.id = docs_fts.rowid"
+                    " WHERE docs_fts MATCH ? ORDER BY bm25(docs_fts, 5.0, 1.0) LIMIT ?",
+                    (match, limit)).fetchall()
+                # All terms together first; fall back to any term
+                if rows or len(quoted) == 1:
+                    return rows
+        return []
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,151 @@
+import os
+import zlib
+import pathlib
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt  # pyright: ignore[reportMissingImports]
+
+
+def _lock_file(f, exclusive):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return
+    # msvcrt only has exclusive byte-range locks; LK_LOCK gives up after ~10 seconds, so retry
+    while True:
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class _RWLock:
+    """Readers-writer lock for threads of one process; waiting writers block new readers."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire(self, exclusive):
+        with self._cond:
+            if exclusive:
+                self._waiting_writers += 1
+                while self._writer or self._readers:
+                    self._cond.wait()
+                self._waiting_writers -= 1
+                self._writer = True
+            else:
+                while self._writer or self._waiting_writers:
+                    self._cond.wait()
+                self._readers += 1
+
+    def release(self, exclusive):
+        with self._cond:
+            if exclusive:
+                self._writer = False
+            else:
+                self._readers -= 1
+            self._cond.notify_all()
+
+
+class DocLocks:
+    """
+    Per-path reader/writer locks that also hold across processes.
+
+    Paths are hashed onto a fixed number of stripes. Each stripe is an in-process
+    readers-writer lock plus an advisory lock file (flock on POSIX, msvcrt on Windows),
+    so the web UI and the Telegram bot can share one docs folder. Every operation also
+    holds the tree lock shared; operations that move whole folders hold it exclusively.
+    Locks are not reentrant: take everything an operation needs in one call.
+    """
+
+    TREE = "<tree>"
+
+    def __init__(self, lock_dir, stripes=None):
+        self.lock_dir = pathlib.Path(lock_dir)
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self.stripes = stripes or int(os.getenv("DOC_LOCK_STRIPES", "64"))
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _stripe(self, path) -> str:
+        if path == self.TREE:
+            return "tree"
+        return f"s{zlib.crc32(path.encode('utf-8')) % self.stripes:03d}"
+
+    def _rwlock(self, name) -> _RWLock:
+        with self._guard:
+            return self._locks.setdefault(name, _RWLock())
+
+    @contextmanager
+    def _hold(self, modes):
+        """modes: {lock name: exclusive}; acquired in sorted order so lock order is global."""
+        held = []
+        try:
+            for name in sorted(modes):
+                exclusive = modes[name]
+                rwlock = self._rwlock(name)
+                rwlock.acquire(exclusive)
+                try:
+                    f = open(self.lock_dir / f"{name}.lock", "a+b")
+                    _lock_file(f, exclusive)
+                except BaseException:
+                    rwlock.release(exclusive)
+                    raise
+                held.append((rwlock, f, exclusive))
+            yield
+        finally:
+            for rwlock, f, exclusive in reversed(held):
+                try:
+                    _unlock_file(f)
+                finally:
+                    f.close()
+                    rwlock.release(exclusive)
+
+    def _modes(self, paths, exclusive, tree_exclusive=False):
+        modes = {self._stripe(self.TREE): tree_exclusive}
+        for path in paths:
+            name = self._stripe(path)
+            modes[name] = modes.get(name, False) or exclusive
+        return modes
+
+    def read(self, *paths):
+        return self._hold(self._modes(paths, exclusive=False))
+
+    def write(self, *paths):
+        return self._hold(self._modes(paths, exclusive=True))
+
+    def tree(self):
+        """Excludes every other document operation, e.g. while a folder is renamed."""
+        return self._hold({self._stripe(self.TREE): True})
+
+    @contextmanager
+    def named(self, name):
+        """A dedicated exclusive lock (separate from the path stripes) for shared index files."""
+        rwlock = self._rwlock(f"named-{name}")
+        rwlock.acquire(True)
+        try:
+            with open(self.lock_dir / f"named-{name}.lock", "a+b") as f:
+                _lock_file(f, True)
+                try:
+                    yield
+                finally:
+                    _unlock_file(f)
+        finally:
+            rwlock.release(True)
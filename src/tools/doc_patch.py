@@ -0,0 +1,78 @@
+import re
+
+
+_HUNK_HEADER = re.compile(r"^@@\s*(?:-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?)?\s*@@")
+
+
+class PatchError(ValueError):
+    """Raised when a diff is malformed or does not match the document."""
+
+
+def _parse_hunks(diff: str) -> list:
+    """Returns [(old_start or None, old_lines, new_lines)] from a unified diff."""
+    hunks = []
+    current = None
+    for line in diff.splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            current = (int(header.group(1)) if header.group(1) else None, [], [])
+            hunks.append(current)
+            continue
+        if current is None:
+            # File headers ("--- a/x", "+++ b/x", "diff --git") before the first hunk
+            continue
+        if line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        tag, text = (line[0], line[1:]) if line else (" ", "")
+        if tag == " ":
+            current[1].append(text)
+            current[2].append(text)
+        elif tag == "-":
+            current[1].append(text)
+        elif tag == "+":
+            current[2].append(text)
+        else:
+            raise PatchError(f"Unexpected line in hunk {len(hunks)}: {line!r}")
+    if not hunks:
+        raise PatchError("No hunks found; the diff must contain '@@ ... @@' hunk headers.")
+    return hunks
+
+
+def _find(lines, block, expected, start):
+    """Finds block in lines at or after start, preferring the position closest to expected."""
+    if not block:
+        return max(start, min(expected, len(lines)))
+    candidates = [i for i in range(start, len(lines) - len(block) + 1)
+                  if lines[i:i + len(block)] == block]
+    if not candidates:
+        # Tolerate trailing-whitespace differences the model may have introduced
+        stripped = [b.rstrip() for b in block]
+        candidates = [i for i in range(start, len(lines) - len(block) + 1)
+                      if [x.rstrip() for x in lines[i:i + len(block)]] == stripped]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda i: abs(i - expected))
+
+
+def apply_unified_diff(text: str, diff: str) -> str:
+    """
+    Applies a unified diff to text. Hunks are located by their context and removed lines,
+    so slightly wrong line numbers (or "@@ @@" headers without numbers) still apply.
+    """
+    lines = text.splitlines()
+    trailing_newline = text.endswith("\n") or not text
+    cursor = 0  # hunks apply in order, so each one is searched after the previous
+    offset = 0  # shift between the diff's line numbers and the current text
+
+    for number, (old_start, old_lines, new_lines) in enumerate(_parse_hunks(diff), 1):
+        expected = (old_start - 1 + offset) if old_start else cursor
+        position = _find(lines, old_lines, max(expected, 0), cursor)
+        if position is None:
+            preview = "\n".join(old_lines[:3])
+            raise PatchError(f"Hunk {number} does not match the document near:\n{preview}")
+        lines[position:position + len(old_lines)] = new_lines
+        cursor = position + len(new_lines)
+        if old_start:
+            offset = position - (old_start - 1) + len(new_lines) - len(old_lines)
+
+    return "\n".join(lines) + ("\n" if trailing_newline and lines else "")
@@ -0,0 +1,103 @@
+import io
+import re
+import itertools
+from contextlib import contextmanager
+
+
+_HEADING_LINE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+# The readers take a binary stream from the document storage (e.g. storage.open(path))
+# and leave closing it to the caller.
+
+@contextmanager
+def _open_text(stream):
+    # newline="" keeps "\r\n" intact so byte sizes and line contents match the file
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="replace", newline="")
+    try:
+        yield text
+    finally:
+        text.detach()
+
+
+def iter_headings(lines):
+    """Yields (line_index, level, title, line) for every markdown line; level is 0 for non-headings."""
+    in_fence = False
+    for index, line in enumerate(lines):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_LINE.match(line.rstrip("\r\n"))
+        if match:
+            yield index, len(match.group(1)), match.group(2), line
+        else:
+            yield index, 0, None, line
+
+
+def read_lines(stream, offset=0, limit=0):
+    """Returns (text, more) for lines [offset, offset + limit); only those lines are decoded."""
+    with _open_text(stream) as f:
+        selected = itertools.islice(f, offset, offset + limit if limit else None)
+        text = "".join(selected)
+        more = bool(limit) and f.readline() != ""
+    return text, more
+
+
+def read_bytes(stream, offset=0, limit=0):
+    """Returns (text, more) for the byte range; partial UTF-8 sequences at the edges are dropped."""
+    stream.seek(offset)
+    data = stream.read(limit) if limit else stream.read()
+    more = bool(limit) and stream.read(1) != b""
+    return data.decode("utf-8", errors="ignore"), more
+
+
+def _section_matches(wanted, trail):
+    # "Setup > Linux" must match the heading path; "Linux" matches the heading alone
+    parts = [p.strip().lower() for p in wanted.split(">") if p.strip()]
+    titles = [t.lower() for _, t in trail]
+    return titles[-len(parts):] == parts if len(parts) <= len(titles) else False
+
+
+def read_section(stream, section):
+    """
+    Returns the content under the first heading matching section, up to the next heading
+    of the same or higher level, or None if there is no such heading.
+    """
+    trail = []
+    collected = None
+    level_of_section = 0
+    with _open_text(stream) as f:
+        for _, level, title, line in iter_headings(f):
+            if collected is not None:
+                if level and level <= level_of_section:
+                    break
+                collected.append(line)
+                continue
+            if level:
+                trail[:] = [(lvl, t) for lvl, t in trail if lvl < level] + [(level, title)]
+                if _section_matches(section, trail):
+                    collected = [line]
+                    level_of_section = level
+    return "".join(collected) if collected is not None else None
+
+
+def outline(stream):
+    """
+    Returns ([(level, title, line_index, line_count, char_count)], total_lines) for every
+    heading; a heading's sizes include its subsections.
+    """
+    headings = []
+    open_sections = []  # indices into headings whose section is still running
+    total_lines = 0
+    with _open_text(stream) as f:
+        for index, level, title, line in iter_headings(f):
+            total_lines = index + 1
+            if level:
+                while open_sections and headings[open_sections[-1]][0] >= level:
+                    open_sections.pop()
+                headings.append([level, title, index, 0, 0])
+                open_sections.append(len(headings) - 1)
+            for open_index in open_sections:
+                headings[open_index][3] += 1
+                headings[open_index][4] += len(line)
+    return [tuple(h) for h in headings], total_lines
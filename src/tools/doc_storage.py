@@ -0,0 +1,306 @@
+import io
+import os
+import stat
+import time
+import hashlib
+import pathlib
+import sqlite3
+import tempfile
+import threading
+
+
+# Number of recent changes SQLiteStorage remembers for readers in other processes
+CHANGE_LOG_SIZE = 10000
+
+
+def content_hash(data: bytes) -> str:
+    """Content hash shared by the storage backends and the search indexes."""
+    return hashlib.sha1(data).hexdigest()
+
+
+class FileStorage:
+    """
+    Documents as plain files under the docs folder (the default backend).
+
+    All backends share this interface; paths are relative posix paths, folders exist
+    implicitly while they contain documents, and (mtime, size) pairs act as stats.
+    """
+
+    name = "files"
+    # The files may also be edited by other programs, so DocTree watches the folder
+    external_edits = True
+
+    def __init__(self, base_dir):
+        self.base_dir = pathlib.Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, relative) -> pathlib.Path:
+        return self.base_dir / relative if relative else self.base_dir
+
+    def scan(self, folder="") -> dict:
+        """Returns {relative path: (mtime, size)} for every document (below folder), skipping dot entries."""
+        files = {}
+        pending = [folder]
+        while pending:
+            relative_dir = pending.pop()
+            try:
+                entries = list(os.scandir(self._path(relative_dir)))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                relative = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(relative)
+                elif entry.is_file():
+                    result = entry.stat()
+                    files[relative] = (result.st_mtime, result.st_size)
+        return files
+
+    def stat(self, relative):
+        """Returns (mtime, size) of a document, or None if there is none at this path."""
+        try:
+            result = os.stat(self._path(relative))
+        except OSError:
+            return None
+        return (result.st_mtime, result.st_size) if stat.S_ISREG(result.st_mode) else None
+
+    def changes_since(self, seq):
+        """
+        Returns (latest change number, paths changed after seq), or None for the paths
+        when they are no longer known. Plain files keep no log; DocTree watches them.
+        """
+        return seq, []
+
+    def latest_change(self) -> int:
+        return 0
+
+    def is_file(self, relative) -> bool:
+        return self._path(relative).is_file()
+
+    def is_dir(self, relative) -> bool:
+        return self._path(relative).is_dir()
+
+    def open(self, relative):
+        """Opens a document for binary reading."""
+        return open(self._path(relative), "rb")
+
+    def read_bytes(self, relative) -> bytes:
+        return self._path(relative).read_bytes()
+
+    def digest(self, relative) -> str:
+        return content_hash(self.read_bytes(relative))
+
+    def write_bytes(self, relative, data: bytes, mtime=None):
+        """Writes via a hidden temp file in the same folder and renames it into place."""
+        path = self._path(relative)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if mtime is not None:
+                os.utime(tmp_name, (mtime, mtime))
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+    def delete(self, relative):
+        self._path(relative).unlink()
+
+    def rename(self, old, new):
+        """Renames a document or a whole folder; the target must not exist."""
+        source, target = self._path(old), self._path(new)
+        if not source.exists():
+            raise FileNotFoundError(old)
+        if target.exists():
+            raise FileExistsError(new)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        source.rename(target)
+
+
+class SQLiteStorage:
+    """
+    Every document in one SQLite database, for corpora too large to keep as loose files.
+
+    Content is stored once per distinct hash, so duplicate documents share a blob.
+    Renaming or moving a folder re-keys all of its paths in a single transaction, using
+    a range scan on the path primary key instead of touching each file.
+
+    Nothing watches a database, so every change also logs the paths it touched; other
+    processes sharing the database catch up with changes_since().
+    """
+
+    name = "sqlite"
+    external_edits = False
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        pathlib.Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, data BLOB NOT NULL) WITHOUT ROWID")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " path TEXT PRIMARY KEY, hash TEXT NOT NULL,"
+                " mtime REAL NOT NULL, size INTEGER NOT NULL) WITHOUT ROWID")
+            self._db.execute("CREATE INDEX IF NOT EXISTS documents_hash ON documents (hash)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL)")
+
+    @staticmethod
+    def _below(relative):
+        # Bounds of every path inside a folder: "a/" <= path < "a0" ("0" follows "/")
+        return relative + "/", relative + "0"
+
+    def _drop_unused_blob(self, digest):
+        self._db.execute("DELETE FROM blobs WHERE hash = ? AND NOT EXISTS"
+                         " (SELECT 1 FROM documents WHERE hash = ?)", (digest, digest))
+
+    def _has_folder(self, relative) -> bool:
+        if not relative:
+            return True
+        return self._db.execute("SELECT 1 FROM documents WHERE path >= ? AND path < ? LIMIT 1",
+                                self._below(relative)).fetchone() is not None
+
+    def _has_file(self, relative) -> bool:
+        return self._db.execute("SELECT 1 FROM documents WHERE path = ?", (relative,)).fetchone() is not None
+
+    def _log(self, *paths):
+        """Records changed paths (documents or folders) in the current transaction."""
+        for path in paths:
+            seq = self._db.execute("INSERT INTO changes (path) VALUES (?)", (path,)).lastrowid
+        self._db.execute("DELETE FROM changes WHERE seq <= ?", (seq - CHANGE_LOG_SIZE,))
+
+    def _check_parents(self, relative):
+        # A document cannot live below another document, as on a real file system
+        parents = [str(p) for p in pathlib.PurePosixPath(relative).parents if str(p) != "."]
+        row = self._db.execute(f"SELECT path FROM documents WHERE path IN ({','.join('?' * len(parents))})",
+                               parents).fetchone() if parents else None
+        if row:
+            raise NotADirectoryError(f"{row[0]} is a document, not a folder")
+
+    def scan(self, folder="") -> dict:
+        query, args = "SELECT path, mtime, size FROM documents", ()
+        if folder:
+            query, args = query + " WHERE path >= ? AND path < ?", self._below(folder)
+        with self._lock:
+            return {path: (mtime, size) for path, mtime, size in self._db.execute(query, args)}
+
+    def changes_since(self, seq):
+        with self._lock:
+            rows = self._db.execute("SELECT seq, path FROM changes WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        if not rows:
+            return seq, []
+        # Sequence numbers have no gaps, so a jump means the log was pruned past seq
+        if rows[0][0] != seq + 1:
+            return rows[-1][0], None
+        return rows[-1][0], list(dict.fromkeys(path for _, path in rows))
+
+    def latest_change(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT coalesce(max(seq), 0) FROM changes").fetchone()[0]
+
+    def stat(self, relative):
+        with self._lock:
+            row = self._db.execute("SELECT mtime, size FROM documents WHERE path = ?", (relative,)).fetchone()
+        return tuple(row) if row else None
+
+    def is_file(self, relative) -> bool:
+        with self._lock:
+            return self._has_file(relative)
+
+    def is_dir(self, relative) -> bool:
+        with self._lock:
+            return self._has_folder(relative)
+
+    def open(self, relative):
+        return io.BytesIO(self.read_bytes(relative))
+
+    def read_bytes(self, relative) -> bytes:
+        with self._lock:
+            row = self._db.execute("SELECT blobs.data FROM documents JOIN blobs ON blobs.hash = documents.hash"
+                                   " WHERE documents.path = ?", (relative,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No such document: {relative}")
+        return bytes(row[0])
+
+    def digest(self, relative) -> str:
+        with self._lock:
+            row = self._db.execute("SELECT hash FROM documents WHERE path = ?", (relative,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No such document: {relative}")
+        return row[0]
+
+    def write_bytes(self, relative, data: bytes, mtime=None):
+        digest = content_hash(data)
+        with self._lock, self._db:
+            if self._has_folder(relative):
+                raise IsADirectoryError(f"{relative or '.'} is a folder")
+            self._check_parents(relative)
+
+            previous = self._db.execute("SELECT hash FROM documents WHERE path = ?", (relative,)).fetchone()
+            self._db.execute("INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)", (digest, data))
+            self._db.execute("INSERT OR REPLACE INTO documents (path, hash, mtime, size) VALUES (?, ?, ?, ?)",
+                             (relative, digest, mtime or time.time(), len(data)))
+            if previous and previous[0] != digest:
+                self._drop_unused_blob(previous[0])
+            self._log(relative)
+
+    def delete(self, relative):
+        with self._lock, self._db:
+            row = self._db.execute("SELECT hash FROM documents WHERE path = ?", (relative,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"No such document: {relative}")
+            self._db.execute("DELETE FROM documents WHERE path = ?", (relative,))
+            self._drop_unused_blob(row[0])
+            self._log(relative)
+
+    def rename(self, old, new):
+        with self._lock, self._db:
+            if self._has_file(new) or self._has_folder(new):
+                raise FileExistsError(f"{new} already exists")
+            self._check_parents(new)
+            if self._has_file(old):
+                self._db.execute("UPDATE documents SET path = ? WHERE path = ?", (new, old))
+            elif self._has_folder(old):
+                if new.startswith(old + "/"):
+                    raise OSError(f"Cannot move {old} into itself")
+                self._db.execute("UPDATE documents SET path = ? || substr(path, ?) WHERE path >= ? AND path < ?",
+                                 (new, len(old) + 1) + self._below(old))
+            else:
+                raise FileNotFoundError(f"No such document or folder: {old}")
+            self._log(old, new)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def get_storage(base_dir):
+    """Returns the backend selected by DOC_STORAGE: files (default) or sqlite."""
+    base_dir = pathlib.Path(base_dir)
+    backend = os.getenv("DOC_STORAGE", "files").lower()
+    if backend == "files":
+        return FileStorage(base_dir)
+    if backend == "sqlite":
+        return SQLiteStorage(os.getenv("DOC_STORAGE_PATH") or base_dir.with_name(base_dir.name + ".sqlite3"))
+    raise ValueError(f"Unknown DOC_STORAGE backend: {backend}")
+
+
+def copy_documents(source, target) -> int:
+    """Copies every document from one backend to another, keeping modification times."""
+    count = 0
+    for relative, (mtime, _) in sorted(source.scan().items()):
+        target.write_bytes(relative, source.read_bytes(relative), mtime=mtime)
+        count += 1
+    return count
+
@@ -0,0 +1,342 @@
+import os
+import bisect
+import logging
+import pathlib
+import threading
+from .doc_storage import FileStorage
+
+
+logger = logging.getLogger(__name__)
+
+
+class DocTree:
+    """
+    In-memory index of the files in the docs sandbox, kept in sorted order so prefix,
+    folder and paginated listings never walk the disk.
+
+    DocumentManager applies its own mutations through the same update/remove/rename
+    interface as the search indexes; edits made outside the agent are picked up by a
+    watcher (watchdog when installed, otherwise directory-mtime polling). Every change
+    bumps `version`, so callers can cheaply tell whether anything changed.
+    Backends other than plain files are only changed through DocumentManager, possibly
+    in another process sharing the storage; they are listed from the storage instead
+    of the disk, and the storage's change log is replayed before every listing.
+    """
+
+    def __init__(self, base_dir: pathlib.Path, listener=None, storage=None):
+        self.base_dir = pathlib.Path(base_dir)
+        self.storage = storage or FileStorage(self.base_dir)
+        # Called as listener(action, path) for changes made outside DocumentManager
+        self.listener = listener
+        self.version = 0
+
+        self._paths = []   # sorted relative posix paths
+        self._stats = {}   # path -> (mtime, size)
+        self._dirs = {}    # relative dir ("" for the root) -> mtime, for polling
+        self._folders = None
+        self._change_seq = 0  # last storage change reflected here (backends without a watcher)
+        self._lock = threading.RLock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.sync()
+
+    # --- scanning ---
+
+    def _scan(self, relative_dir, files, dirs):
+        """Walks a directory with scandir (no extra stat for the entry type), skipping dot entries."""
+        directory = self.base_dir / relative_dir if relative_dir else self.base_dir
+        try:
+            dirs[relative_dir] = directory.stat().st_mtime
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            relative = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                self._scan(relative, files, dirs)
+            elif entry.is_file():
+                stat = entry.stat()
+                files[relative] = (stat.st_mtime, stat.st_size)
+
+    def _changed(self):
+        self.version += 1
+        self._folders = None
+
+    def sync(self) -> int:
+        """Rebuilds the tree from disk; returns the number of files added, removed or changed."""
+        files, dirs = {}, {}
+        seq = 0
+        if self.storage.external_edits:
+            self._scan("", files, dirs)
+        else:
+            # Read first: a change made during the scan is replayed again, which is harmless
+            seq = self.storage.latest_change()
+            files = self.storage.scan()
+        with self._lock:
+            self._change_seq = seq
+            changed = sum(1 for path in files.keys() ^ self._stats.keys())
+            changed += sum(1 for path in files.keys() & self._stats.keys() if files[path] != self._stats[path])
+            self._stats, self._dirs = files, dirs
+            self._paths = sorted(files)
+            if changed or not self.version:
+                self._changed()
+        return changed
+
+    # --- mutation interface shared with DocIndex and DocVectors ---
+
+    def _relative(self, path: pathlib.Path) -> str:
+        return path.relative_to(self.base_dir).as_posix()
+
+    def _add(self, relative, stat):
+        """stat is (mtime, size)."""
+        if relative not in self._stats:
+            bisect.insort(self._paths, relative)
+        self._stats[relative] = stat
+
+    def _remove_prefix(self, relative) -> list:
+        removed = [relative] if relative in self._stats else []
+        start = bisect.bisect_left(self._paths, relative + "/")
+        end = start
+        while end < len(self._paths) and self._paths[end].startswith(relative + "/"):
+            removed.append(self._paths[end])
+            end += 1
+        del self._paths[start:end]
+        if relative in self._stats:
+            self._paths.remove(relative)
+        for path in removed:
+            del self._stats[path]
+        for directory in [d for d in self._dirs if d == relative or d.startswith(relative + "/")]:
+            del self._dirs[directory]
+        return removed
+
+    def _note_dir(self, path: pathlib.Path):
+        # Keeps the polling watcher from reporting our own changes as external edits
+        if not self.storage.external_edits:
+            return
+        while path != self.base_dir and path.is_dir():
+            self._dirs[self._relative(path)] = path.stat().st_mtime
+            path = path.parent
+        self._dirs[""] = self.base_dir.stat().st_mtime
+
+    def update(self, path: pathlib.Path):
+        relative = self._relative(path)
+        stat = self.storage.stat(relative)
+        if stat is None:
+            return
+        with self._lock:
+            self._add(relative, stat)
+            self._note_dir(path.parent)
+            self._changed()
+
+    def remove(self, path: pathlib.Path):
+        with self._lock:
+            self._remove_prefix(self._relative(path))
+            self._note_dir(path.parent)
+            self._changed()
+
+    def rename(self, old_path: pathlib.Path, new_path: pathlib.Path):
+        old, new = self._relative(old_path), self._relative(new_path)
+        with self._lock:
+            for path in self._remove_prefix(old):
+                target = new + path[len(old):]
+                stat = self.storage.stat(target)
+                if stat is not None:
+                    self._add(target, stat)
+            if self.storage.external_edits and new_path.is_dir():
+                files, dirs = {}, {}
+                self._scan(new, files, dirs)
+                self._dirs.update(dirs)
+            self._note_dir(old_path.parent)
+            self._note_dir(new_path.parent)
+            self._changed()
+
+    def refresh(self):
+        """Applies changes another process made to a storage backend that is not watched."""
+        if self.storage.external_edits:
+            return
+        with self._lock:
+            seq, paths = self.storage.changes_since(self._change_seq)
+            if paths is None:
+                self.sync()
+                return
+            changed = False
+            for relative in paths:
+                stat = self.storage.stat(relative)
+                if stat is not None and self._stats.get(relative) == stat:
+                    continue
+                # A path may have switched between document and folder, so both are re-read
+                changed |= bool(self._remove_prefix(relative))
+                below = {relative: stat} if stat is not None else self.storage.scan(relative)
+                for path, path_stat in below.items():
+                    self._add(path, path_stat)
+                changed |= bool(below)
+            self._change_seq = seq
+            if changed:
+                self._changed()
+
+    # --- queries ---
+
+    def list(self, prefix="", folder=None, offset=0, limit=None):
+        """
+        Returns (paths, total) in sorted order. prefix matches the start of the relative
+        path; folder ("." for the root) restricts to files directly inside that folder.
+        """
+        self.refresh()
+        with self._lock:
+            if folder is not None:
+                folder = folder.strip("/")
+                folder = "" if folder == "." else folder
+                base = folder + "/" if folder else ""
+                prefix = base + prefix if not prefix.startswith(base) else prefix
+            start = bisect.bisect_left(self._paths, prefix)
+            matches = []
+            for path in self._paths[start:]:
+                if not path.startswith(prefix):
+                    break
+                if folder is not None and "/" in path[len(base):]:
+                    continue
+                matches.append(path)
+        end = offset + limit if limit is not None else None
+        return matches[offset:end], len(matches)
+
+    def folders(self) -> list:
+        """Sorted folders that contain files ("." for the root)."""
+        self.refresh()
+        with self._lock:
+            if self._folders is None:
+                self._folders = sorted({os.path.dirname(path) or "." for path in self._paths})
+            return self._folders
+
+    def stat(self, relative):
+        """Returns (mtime, size) for a known file, or None."""
+        with self._lock:
+            return self._stats.get(relative)
+
+    def __len__(self):
+        return len(self._paths)
+
+    # --- watching for external changes ---
+
+    def _external(self, action, relative):
+        if self.listener is not None:
+            try:
+                self.listener(action, self.base_dir / relative)
+            except Exception as e:
+                logger.warning("Document change listener failed for %s: %s", relative, e)
+
+    def _apply_external(self, relative):
+        """Re-checks one path after an external change and reports what happened."""
+        if any(part.startswith(".") for part in relative.split("/")):
+            return
+        path = self.base_dir / relative
+        with self._lock:
+            if path.is_file():
+                result = path.stat()
+                stat = (result.st_mtime, result.st_size)
+                if self._stats.get(relative) == stat:
+                    return
+                self._add(relative, stat)
+                self._changed()
+                action = "update"
+                affected = [relative]
+            elif path.is_dir():
+                files, dirs = {}, {}
+                self._scan(relative, files, dirs)
+                self._dirs.update(dirs)
+                affected = [p for p, s in files.items() if self._stats.get(p) != s]
+                for p in affected:
+                    self._add(p, files[p])
+                if affected:
+                    self._changed()
+                action = "update"
+            else:
+                affected = self._remove_prefix(relative)
+                if affected:
+                    self._changed()
+                action = "remove"
+        if action == "remove" and affected:
+            self._external("remove", relative)
+        else:
+            for p in affected:
+                self._external("update", p)
+
+    def poll(self):
+        """One polling pass: directories whose mtime changed are re-listed."""
+        with self._lock:
+            dirs = dict(self._dirs)
+        for relative_dir, mtime in dirs.items():
+            directory = self.base_dir / relative_dir if relative_dir else self.base_dir
+            try:
+                current = directory.stat().st_mtime
+            except FileNotFoundError:
+                self._apply_external(relative_dir)
+                continue
+            if current == mtime:
+                continue
+            with self._lock:
+                self._dirs[relative_dir] = current
+                prefix = relative_dir + "/" if relative_dir else ""
+                known = {p for p in self.list(prefix=prefix, folder=relative_dir or ".")[0]}
+            names = {entry.name for entry in os.scandir(directory) if not entry.name.startswith(".")}
+            for name in names:
+                self._apply_external(prefix + name)
+            for path in known:
+                if path[len(prefix):] not in names:
+                    self._apply_external(path)
+
+    def start_watching(self, mode=None, interval=None):
+        """Starts the external-change watcher: DOC_WATCH = auto | watchdog | poll | off."""
+        mode = mode or os.getenv("DOC_WATCH", "auto")
+        interval = interval or float(os.getenv("DOC_WATCH_INTERVAL", "5"))
+        if mode == "off" or self._watcher is not None:
+            return
+
+        if mode in ("auto", "watchdog"):
+            try:
+                self._watcher = self._start_watchdog()
+                return
+            except ImportError:
+                if mode == "watchdog":
+                    logger.warning("watchdog is not installed; polling the docs directory instead")
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.warning("Polling the docs directory failed: %s", e)
+
+        self._watcher = threading.Thread(target=run, name="doc-tree-poll", daemon=True)
+        self._watcher.start()
+
+    def _start_watchdog(self):
+        from watchdog.events import FileSystemEventHandler  # pyright: ignore[reportMissingImports]
+        from watchdog.observers import Observer  # pyright: ignore[reportMissingImports]
+
+        tree = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for raw in (event.src_path, getattr(event, "dest_path", "")):
+                    if not raw:
+                        continue
+                    try:
+                        relative = pathlib.Path(os.fsdecode(raw)).relative_to(tree.base_dir).as_posix()
+                    except ValueError:
+                        continue
+                    if relative != ".":
+                        tree._apply_external(relative)
+
+        observer = Observer()
+        observer.schedule(Handler(), str(self.base_dir), recursive=True)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None and hasattr(self._watcher, "stop"):
+            self._watcher.stop()
+        self._watcher = None
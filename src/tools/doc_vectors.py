@@ -0,0 +1,375 @@
+import os
+import re
+import zlib
+import sqlite3
+import pathlib
+import threading
+from contextlib import contextmanager, nullcontext
+import numpy as np  # pyright: ignore[reportMissingImports]
+from .doc_index import INDEX_DIR_NAME, INDEXED_SUFFIXES, is_hidden, like_prefix
+from .doc_storage import FileStorage, content_hash
+
+
+# Sections longer than this are split further on paragraph boundaries
+CHUNK_CHARS = int(os.getenv("DOC_CHUNK_CHARS", "1500"))
+# Sections shorter than this are merged into the following one
+MIN_CHUNK_CHARS = 200
+
+_HEADING_LINE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def split_markdown(text: str) -> list:
+    """
+    Splits a markdown document into [(heading_path, chunk_text)] on its headings.
+    heading_path is e.g. "Setup > Linux"; very long sections are split on blank lines.
+    """
+    sections = []
+    headings = []
+    lines = []
+
+    def flush():
+        body = "\n".join(lines).strip()
+        if body:
+            sections.append((" > ".join(h for _, h in headings), body))
+        lines.clear()
+
+    for line in text.splitlines():
+        match = _HEADING_LINE.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            headings[:] = [(lvl, h) for lvl, h in headings if lvl < level] + [(level, match.group(2))]
+        lines.append(line)
+    flush()
+
+    chunks = []
+    pending_heading, pending = None, ""
+    for heading, body in sections:
+        if pending:
+            # A short section (often just a parent heading) is kept as context for the next one
+            body = pending + "\n\n" + body
+        if len(body) < MIN_CHUNK_CHARS:
+            pending_heading, pending = heading, body
+            continue
+        pending_heading, pending = None, ""
+        chunks.extend((heading, part) for part in _split_long(body))
+    if pending:
+        chunks.append((pending_heading, pending))
+    return chunks
+
+
+def _split_long(body: str) -> list:
+    if len(body) <= CHUNK_CHARS:
+        return [body]
+    parts, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", body):
+        if current and len(current) + len(paragraph) > CHUNK_CHARS:
+            parts.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+        while len(current) > CHUNK_CHARS:
+            parts.append(current[:CHUNK_CHARS])
+            current = current[CHUNK_CHARS:]
+    if current.strip():
+        parts.append(current)
+    return parts
+
+
+class HashingEmbedder:
+    """
+    Dependency-free CPU embedder: words and character trigrams are hashed into a fixed
+    number of signed buckets (the hashing trick) and the vector is L2-normalized.
+    Trigrams make partial matches work for inflected words, including Korean.
+    """
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        for word in _WORD.findall(text.lower()):
+            yield word
+            if len(word) > 3:
+                padded = f"<{word}>"
+                for i in range(len(padded) - 2):
+                    yield padded[i:i + 3]
+
+    def embed(self, texts) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in self._features(text)),
+                                 dtype=np.uint32)
+            if not hashes.size:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        # Sublinear term frequency, then unit length so a dot product is cosine similarity
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class SentenceTransformerEmbedder:
+    """Embeds with a local sentence-transformers model on the CPU (optional dependency)."""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer  # pyright: ignore[reportMissingImports]
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def embed(self, texts) -> np.ndarray:
+        return self.model.encode(list(texts), batch_size=32, normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(np.float32)
+
+
+def get_embedder():
+    """
+    DOC_EMBEDDER selects the embedder: "hashing" (default) or
+    "sentence-transformers:<model name>", e.g. "sentence-transformers:all-MiniLM-L6-v2".
+    """
+    spec = os.getenv("DOC_EMBEDDER", "hashing")
+    if spec.startswith("sentence-transformers:"):
+        return SentenceTransformerEmbedder(spec.split(":", 1)[1])
+    return HashingEmbedder()
+
+
+class DocVectors:
+    """
+    Chunk-level vector store over the documents in the sandbox.
+
+    Vectors live in a memory-mapped float32 matrix (vectors.f32) with one row per chunk.
+    A SQLite database next to it (vectors.sqlite3) maps rows to their document, heading
+    and text, records each file's mtime, size and hash, and lists free rows for reuse,
+    so a change only writes the rows it touches. The matrix file is only ever extended
+    in place (a new embedder gets a new file), so other processes can keep it mapped.
+    With `locks` (DocLocks), changes are serialized across processes.
+    """
+
+    def __init__(self, base_dir: pathlib.Path, embedder=None, index_dir=None, locks=None, storage=None):
+        self.base_dir = pathlib.Path(base_dir)
+        self.storage = storage or FileStorage(self.base_dir)
+        self.embedder = embedder or get_embedder()
+        self.index_dir = pathlib.Path(index_dir or self.base_dir / INDEX_DIR_NAME)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.matrix_path = self.index_dir / "vectors.f32"
+        self.db_path = self.index_dir / "vectors.sqlite3"
+        self._lock = threading.Lock()
+        self.locks = locks
+
+        self.capacity = 0
+        self._matrix = None
+        self._matrix_id = None  # (inode, size) of the matrix file as mapped
+        # Transactions are opened explicitly (BEGIN IMMEDIATE) in _exclusive
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30, isolation_level=None)
+        with self._exclusive():
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL, hash TEXT NOT NULL)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " row INTEGER PRIMARY KEY, path TEXT NOT NULL, heading TEXT NOT NULL, text TEXT NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY)")
+            if self._meta("embedder") != self.embedder.name or self._meta("dim") != str(self.embedder.dim):
+                # No index yet, or it was built by another embedder: start over
+                self._reset()
+        # Superseded by the database
+        (self.index_dir / "vectors.json").unlink(missing_ok=True)
+
+    # --- persistence ---
+
+    @contextmanager
+    def _exclusive(self):
+        """One write transaction, serialized across threads and (with locks) processes."""
+        with self._lock, (self.locks.named("vectors") if self.locks else nullcontext()):
+            if self._db.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._map_matrix()
+                yield
+                if self._matrix is not None:
+                    # Vectors reach the file before the rows pointing at them are committed
+                    self._matrix.flush()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _reset(self):
+        for table in ("files", "chunks", "free_rows"):
+            self._db.execute(f"DELETE FROM {table}")
+        self._db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+            ("embedder", self.embedder.name), ("dim", str(self.embedder.dim)), ("row_count", "0")])
+        # A new file instead of truncating the old one, which other processes may have mapped
+        tmp_path = self.matrix_path.with_suffix(".f32.tmp")
+        open(tmp_path, "wb").close()
+        os.replace(tmp_path, self.matrix_path)
+        self._map_matrix()
+
+    def _map_matrix(self):
+        """Maps the matrix file again if it was replaced or grown since it was mapped."""
+        try:
+            stat = os.stat(self.matrix_path)
+        except FileNotFoundError:
+            stat = None
+        matrix_id = (stat.st_ino, stat.st_size) if stat else None
+        if matrix_id == self._matrix_id:
+            return
+        self._matrix = None
+        self.capacity = stat.st_size // (self.embedder.dim * 4) if stat else 0
+        if self.capacity:
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+",
+                                     shape=(self.capacity, self.embedder.dim))
+        self._matrix_id = matrix_id
+
+    def _grow(self, rows):
+        if rows <= self.capacity:
+            return
+        if self._matrix is not None:
+            self._matrix.flush()
+        with open(self.matrix_path, "r+b") as f:
+            f.truncate(max(rows, self.capacity * 2, 256) * self.embedder.dim * 4)
+        self._map_matrix()
+
+    # --- row management ---
+
+    def _free_rows(self, relative):
+        """Frees the chunk rows of one file and forgets the file."""
+        rows = [row for (row,) in self._db.execute("SELECT row FROM chunks WHERE path = ?", (relative,))]
+        if rows:
+            self._matrix[rows] = 0
+            self._db.execute("DELETE FROM chunks WHERE path = ?", (relative,))
+            self._db.executemany("INSERT INTO free_rows (row) VALUES (?)", [(row,) for row in rows])
+        self._db.execute("DELETE FROM files WHERE path = ?", (relative,))
+
+    def _allocate(self, count) -> list:
+        rows = [row for (row,) in self._db.execute("SELECT row FROM free_rows ORDER BY row LIMIT ?", (count,))]
+        self._db.executemany("DELETE FROM free_rows WHERE row = ?", [(row,) for row in rows])
+        if len(rows) < count:
+            start = int(self._meta("row_count"))
+            end = start + count - len(rows)
+            rows.extend(range(start, end))
+            self._db.execute("UPDATE meta SET value = ? WHERE key = 'row_count'", (str(end),))
+            self._grow(end)
+        return rows
+
+    def _add_file(self, relative, text, stat, digest):
+        self._free_rows(relative)
+        chunks = split_markdown(text)
+        if chunks:
+            vectors = self.embedder.embed([f"{heading}\n{body}" for heading, body in chunks])
+            rows = self._allocate(len(chunks))
+            self._matrix[rows] = vectors
+            self._db.executemany("INSERT INTO chunks (row, path, heading, text) VALUES (?, ?, ?, ?)",
+                                 [(row, relative, heading or "", body) for row, (heading, body) in zip(rows, chunks)])
+        self._db.execute("INSERT INTO files (path, mtime, size, hash) VALUES (?, ?, ?, ?)",
+                         (relative, stat[0], stat[1], digest))
+
+    def _paths_under(self, relative) -> list:
+        return [path for (path,) in self._db.execute(
+            "SELECT path FROM files WHERE path = ? OR path LIKE ? ESCAPE '\\'", (relative, like_prefix(relative)))]
+
+    def _indexable(self, path: pathlib.Path) -> bool:
+        return (path.suffix.lower() in INDEXED_SUFFIXES
+                and not is_hidden(path.relative_to(self.base_dir)))
+
+    # --- DocIndex-compatible mutation interface ---
+
+    def update(self, path: pathlib.Path):
+        """Re-chunks and re-embeds one file after it was written."""
+        relative = path.relative_to(self.base_dir).as_posix()
+        stat = self.storage.stat(relative)
+        if stat is None or not self._indexable(path):
+            return
+        data = self.storage.read_bytes(relative)
+        with self._exclusive():
+            self._add_file(relative, data.decode("utf-8", errors="replace"), stat,
+                           content_hash(data))
+
+    def remove(self, path: pathlib.Path):
+        relative = path.relative_to(self.base_dir).as_posix()
+        with self._exclusive():
+            for known in self._paths_under(relative):
+                self._free_rows(known)
+
+    def rename(self, old_path: pathlib.Path, new_path: pathlib.Path):
+        """Re-keys chunks of a renamed file or directory; vectors are unchanged."""
+        old = old_path.relative_to(self.base_dir).as_posix()
+        new = new_path.relative_to(self.base_dir).as_posix()
+
+        with self._exclusive():
+            # Whatever the rename replaced
+            for known in self._paths_under(new):
+                self._free_rows(known)
+            for table in ("files", "chunks"):
+                self._db.execute(
+                    f"UPDATE {table} SET path = ? || substr(path, ?) WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                    (new, len(old) + 1, old, like_prefix(old)))
+            is_file = self.storage.is_file(new)
+            if is_file and not self._indexable(new_path):
+                self._free_rows(new)
+            indexed = self._db.execute("SELECT 1 FROM files WHERE path = ?", (new,)).fetchone()
+        if is_file and self._indexable(new_path) and not indexed:
+            self.update(new_path)
+
+    def sync(self) -> int:
+        """Embeds files changed since the last run (by mtime/size, then hash) and drops deleted ones."""
+        changed = 0
+        with self._exclusive():
+            known_files = {path: (mtime, size, digest) for path, mtime, size, digest in
+                           self._db.execute("SELECT path, mtime, size, hash FROM files")}
+            seen = set()
+            for relative, stat in self.storage.scan().items():
+                if not self._indexable(self.base_dir / relative):
+                    continue
+                seen.add(relative)
+                known = known_files.get(relative)
+                if known and known[:2] == stat:
+                    continue
+                data = self.storage.read_bytes(relative)
+                digest = content_hash(data)
+                if known and known[2] == digest:
+                    self._db.execute("UPDATE files SET mtime = ?, size = ? WHERE path = ?",
+                                     (stat[0], stat[1], relative))
+                    continue
+                self._add_file(relative, data.decode("utf-8", errors="replace"), stat, digest)
+                changed += 1
+
+            for relative in [p for p in known_files if p not in seen]:
+                self._free_rows(relative)
+                changed += 1
+        return changed
+
+    # --- retrieval ---
+
+    def search(self, query: str, top_k: int = 5) -> list:
+        """Returns [(score, meta)] for the top_k chunks most similar to the query."""
+        with self._lock:
+            self._map_matrix()
+            count = min(int(self._meta("row_count") or 0), self.capacity)
+            if not count or not query.strip():
+                return []
+            query_vector = self.embedder.embed([query])[0]
+            scores = np.asarray(self._matrix[:count] @ query_vector)
+
+            top_k = min(top_k, count)
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            # Free rows are zeroed, so they never score above 0
+            best = [int(row) for row in best[np.argsort(-scores[best])] if scores[row] > 0]
+            if not best:
+                return []
+            chunks = {row: {"path": path, "heading": heading, "text": text}
+                      for row, path, heading, text in self._db.execute(
+                          f"SELECT row, path, heading, text FROM chunks WHERE row IN ({', '.join('?' * len(best))})",
+                          best)}
+            # A row another process is writing right now may not be committed yet
+            return [(float(scores[row]), chunks[row]) for row in best if row in chunks]
@@ -1,62 +1,345 @@
+import os
+import logging
 import pathlib
+from .doc_index import INDEX_DIR_NAME, DocIndex
+from .doc_locks import DocLocks
+from .doc_patch import PatchError, apply_unified_diff
+from .doc_reader import outline, read_bytes, read_lines, read_section
+from .doc_storage import content_hash, get_storage
+from .doc_tree import DocTree
+from .doc_vectors import DocVectors
+from .index_maintainer import IndexMaintainer
+
+
+logger = logging.getLogger(__name__)
+
+
+def _version(digest: str) -> str:
+    """Document version (etag) used for optimistic compare-and-swap: a prefix of its content hash."""
+    return digest[:12]
 
 
 class DocumentManager:
     """Manages documents within a sandboxed directory."""
 
-    def __init__(self, base_dir: str = "docs"):
+    # Default page size of list_docs
+    LIST_LIMIT = 200
+
+    def __init__(self, base_dir: str = "docs", watch: bool = True, storage=None):
         self.base_dir = pathlib.Path(base_dir).resolve()
         self.base_dir.mkdir(parents=True, exist_ok=True)
 
+        # Where documents live: plain files (default) or a single SQLite database (DOC_STORAGE)
+        self.storage = storage or get_storage(self.base_dir)
+
+        # Per-path reader/writer locks shared with other processes using the same folder
+        self.locks = DocLocks(self.base_dir / INDEX_DIR_NAME / "locks")
+
+        # In-memory file tree for listings; external edits reach it through a watcher
+        self.tree = DocTree(self.base_dir, listener=self._external_change, storage=self.storage)
+
+        # Full-text index; only files changed since the last run are re-read
+        self.index = None
+        self._open_index()
+
+        # Chunk embeddings for retrieve_docs, kept current the same way
+        try:
+            self.vectors = DocVectors(self.base_dir, locks=self.locks, storage=self.storage)
+            self.vectors.sync()
+        except Exception as e:
+            logger.warning("Document vector index is unavailable: %s", e)
+            self.vectors = None
+
+        # index.md files regenerated from document metadata after changes (DOC_AUTO_INDEX)
+        self.index_maintainer = None
+        if os.getenv("DOC_AUTO_INDEX", "true").lower() in ("1", "true", "yes", "on"):
+            self.index_maintainer = IndexMaintainer(self.base_dir, self.tree, self._atomic_write,
+                                                    lock=self.locks.write, storage=self.storage)
+
+        if watch and self.storage.external_edits:
+            self.tree.start_watching()
+
+    def _open_index(self):
+        """Opens and syncs the search index; on failure search_docs tries again later."""
+        try:
+            if self.index is None:
+                self.index = DocIndex(self.base_dir, storage=self.storage, locks=self.locks)
+            self.index.sync()
+        except Exception as e:
+            logger.warning("Document search index is unavailable: %s", e)
+
+    def _external_change(self, action, path):
+        # Files edited outside the agent; the tree has already been updated
+        self._reindex(action, path, indexes=(self.index, self.vectors, self.index_maintainer))
+
+    def _reindex(self, action, *paths, indexes=None):
+        # The indexes must never make a successful file operation look failed
+        for index in indexes or (self.tree, self.index, self.vectors, self.index_maintainer):
+            if index is None:
+                continue
+            try:
+                getattr(index, action)(*paths)
+            except Exception as e:
+                logger.warning("Failed to update %s (%s): %s", type(index).__name__, action, e)
+
     def _safe_path(self, filepath: str) -> pathlib.Path:
         # Resolve the path and ensure it's within the base_dir
         target_path = (self.base_dir / filepath).resolve()
         if not str(target_path).startswith(str(self.base_dir)):
             raise ValueError(
                 f"Access denied: {filepath} is outside the sandbox.")
+        if target_path != self.base_dir and \
+                target_path.relative_to(self.base_dir).parts[0] == INDEX_DIR_NAME:
+            raise ValueError(f"Access denied: {filepath} is reserved for the search index.")
         return target_path
 
-    def write_doc(self, filepath: str, content: str) -> str:
+    def _rel(self, path: pathlib.Path) -> str:
+        # Storage key of a sandbox path ("" for the sandbox root)
+        return path.relative_to(self.base_dir).as_posix() if path != self.base_dir else ""
+
+    def _read_text(self, relative) -> str:
+        return self.storage.read_bytes(relative).decode("utf-8")
+
+    def _current_version(self, relative) -> str:
+        return _version(self.storage.digest(relative)) if self.storage.is_file(relative) else ""
+
+    def get_version(self, filepath: str) -> str:
+        """Returns the current version of a document, or "" if it does not exist."""
+        relative = self._rel(self._safe_path(filepath))
+        with self.locks.read(relative):
+            return self._current_version(relative)
+
+    def _version_conflict(self, filepath, relative, expected_version):
+        """Returns an error message if expected_version is given and no longer current."""
+        if not expected_version:
+            return None
+        current = self._current_version(relative)
+        if current == expected_version:
+            return None
+        return (f"Error: version conflict on {filepath}: expected version {expected_version}, "
+                f"current version is {current or '(missing)'}. The document was changed by someone else; "
+                f"read it again and retry.")
+
+    def _atomic_write(self, path: pathlib.Path, content: str) -> str:
+        """
+        Replaces a document in one step (the storage never exposes partial content) and
+        updates the indexes. The caller holds the path's write lock. Returns the new version.
+        """
+        data = content.encode("utf-8")
+        self.storage.write_bytes(self._rel(path), data)
+        self._reindex("update", path)
+        return _version(content_hash(data))
+
+    def write_doc(self, filepath: str, content: str, expected_version: str = "") -> str:
         """
         Creates or updates a markdown document (.md) in the 'docs/' sandbox.
-        Use this tool to save new information, update existing documents (like 'index.md' or 'user_info.md'),
-        or create structured notes. Always provide the full content for the file.
+        Use this tool to create new documents or to rewrite most of a document.
+        Always provide the full content for the file. For small changes to an existing file,
+        use append_doc, replace_in_doc or patch_doc instead of rewriting it.
+        Pass expected_version (from a previous read or write) to write only if nobody changed the file since.
         """
 
         try:
             path = self._safe_path(filepath)
-            path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_text(content, encoding="utf-8")
-            return f"Successfully wrote to {filepath}"
+            relative = self._rel(path)
+            with self.locks.write(relative):
+                conflict = self._version_conflict(filepath, relative, expected_version)
+                if conflict:
+                    return conflict
+                version = self._atomic_write(path, content)
+            return f"Successfully wrote to {filepath} (version {version})"
         except Exception as e:
             return f"Error writing doc: {e}"
 
-    def read_doc(self, filepath: str) -> str:
+    def append_doc(self, filepath: str, content: str, expected_version: str = "") -> str:
+        """
+        Appends content to the end of a document in the 'docs/' sandbox, creating it if needed.
+        Use this tool to add entries (e.g., a new line in 'index.md' or a new note section)
+        without resending the existing content.
+        """
+
+        try:
+            path = self._safe_path(filepath)
+            relative = self._rel(path)
+            with self.locks.write(relative):
+                conflict = self._version_conflict(filepath, relative, expected_version)
+                if conflict:
+                    return conflict
+                existing = self._read_text(relative) if self.storage.is_file(relative) else ""
+                if existing and not existing.endswith("\n"):
+                    existing += "\n"
+                version = self._atomic_write(path, existing + content)
+            return f"Successfully appended {len(content)} characters to {filepath} (version {version})"
+        except Exception as e:
+            return f"Error appending to doc: {e}"
+
+    def replace_in_doc(self, filepath: str, old_text: str, new_text: str, expected_count: int = 1,
+                       expected_version: str = "") -> str:
+        """
+        Replaces exact text in a document in the 'docs/' sandbox without resending the whole file.
+        old_text must match the document exactly (including whitespace) and occur exactly expected_count times
+        (default 1); include enough surrounding text to make it unique. An empty new_text deletes old_text.
+        """
+
+        try:
+            path = self._safe_path(filepath)
+            relative = self._rel(path)
+            if not old_text:
+                return "Error replacing in doc: old_text must not be empty."
+
+            with self.locks.write(relative):
+                if not self.storage.is_file(relative):
+                    return f"File not found: {filepath}"
+                conflict = self._version_conflict(filepath, relative, expected_version)
+                if conflict:
+                    return conflict
+
+                content = self._read_text(relative)
+                count = content.count(old_text)
+                if count == 0:
+                    return f"Error replacing in doc: old_text was not found in {filepath}. Read the document and copy the text exactly."
+                if count != expected_count:
+                    return (f"Error replacing in doc: old_text occurs {count} times in {filepath}, "
+                            f"expected {expected_count}. Include more surrounding text to make it unique, "
+                            f"or pass expected_count={count} to replace every occurrence.")
+
+                version = self._atomic_write(path, content.replace(old_text, new_text))
+            return f"Successfully replaced {count} occurrence(s) in {filepath} (version {version})"
+        except Exception as e:
+            return f"Error replacing in doc: {e}"
+
+    def patch_doc(self, filepath: str, diff: str, expected_version: str = "") -> str:
+        """
+        Applies a unified diff (as produced by 'diff -u') to a document in the 'docs/' sandbox.
+        Use this tool for several scattered edits in one call. Each hunk starts with an '@@ -l,n +l,n @@' header
+        and lists context lines (' '), removed lines ('-') and added lines ('+'); the patch is applied
+        only if every hunk matches.
+        """
+
+        try:
+            path = self._safe_path(filepath)
+            relative = self._rel(path)
+            with self.locks.write(relative):
+                if not self.storage.is_file(relative):
+                    return f"File not found: {filepath}"
+                conflict = self._version_conflict(filepath, relative, expected_version)
+                if conflict:
+                    return conflict
+                content = self._read_text(relative)
+                version = self._atomic_write(path, apply_unified_diff(content, diff))
+            return f"Successfully patched {filepath} (version {version})"
+        except PatchError as e:
+            return f"Error patching doc: {e}. The document was not changed."
+        except Exception as e:
+            return f"Error patching doc: {e}"
+
+    def read_doc(self, filepath: str, offset: int = 0, limit: int = 0, unit: str = "lines",
+                 section: str = "", include_version: bool = False) -> str:
         """
         Reads the content of a document from the 'docs/' sandbox.
         Use this tool to retrieve information from existing files,
         such as 'index.md', 'user_info.md', or any other markdown document you have stored.
+        For large documents, read only what you need: pass section (a heading such as 'Results' or
+        'Setup > Linux') to get the content under that heading, or offset/limit to read a range of
+        lines (unit='lines', the default) or bytes (unit='bytes'). Use outline_doc to see the headings first.
+        Set include_version to get the document's version, to pass as expected_version when editing it.
         """
 
         try:
-            path = self._safe_path(filepath)
-            if not path.exists():
-                return f"File not found: {filepath}"
-            return path.read_text(encoding="utf-8")
+            relative = self._rel(self._safe_path(filepath))
+            with self.locks.read(relative):
+                if not self.storage.is_file(relative):
+                    return f"File not found: {filepath}"
+                with self.storage.open(relative) as f:
+                    text = self._read_doc(filepath, relative, f, offset, limit, unit, section)
+                if include_version:
+                    text = f"[version: {self._current_version(relative)}]\n{text}"
+                return text
         except Exception as e:
             return f"Error reading doc: {e}"
 
-    def list_docs(self) -> str:
+    def _read_doc(self, filepath, relative, f, offset, limit, unit, section):
+        offset = max(0, offset or 0)
+        limit = max(0, limit or 0)
+
+        if section:
+            text = read_section(f, section)
+            if text is None:
+                return f"Section not found in {filepath}: {section}. Use outline_doc to list its headings."
+            if offset or limit:
+                lines = text.splitlines(keepends=True)
+                more = bool(limit) and offset + limit < len(lines)
+                text = "".join(lines[offset:offset + limit] if limit else lines[offset:])
+                if more:
+                    text += (f"\n[Section continues. Call read_doc again with section and "
+                             f"offset={offset + limit} to read more.]")
+            return text
+
+        if unit == "bytes":
+            text, more = read_bytes(f, offset, limit)
+            if more:
+                text += (f"\n[Showing bytes {offset}-{offset + limit} of {self.storage.stat(relative)[1]}. "
+                         f"Call read_doc again with unit='bytes' and offset={offset + limit} to read more.]")
+            return text
+        if unit != "lines":
+            return "Error reading doc: unit must be 'lines' or 'bytes'."
+
+        if not offset and not limit:
+            return f.read().decode("utf-8")
+        text, more = read_lines(f, offset, limit)
+        if not text and offset:
+            return f"No lines after offset {offset} in {filepath}."
+        if more:
+            text += (f"\n[Showing lines {offset + 1}-{offset + limit}. "
+                     f"Call read_doc again with offset={offset + limit} to read more.]")
+        return text
+
+    def outline_doc(self, filepath: str) -> str:
+        """
+        Returns the heading tree of a markdown document in the 'docs/' sandbox with the line number and size
+        of each section, without its content. Use this tool before reading a large document, then read only
+        the relevant part with read_doc (section or offset/limit).
+        """
+
+        try:
+            relative = self._rel(self._safe_path(filepath))
+            with self.locks.read(relative):
+                if not self.storage.is_file(relative):
+                    return f"File not found: {filepath}"
+                with self.storage.open(relative) as f:
+                    headings, total_lines = outline(f)
+                size = self.storage.stat(relative)[1]
+                version = self._current_version(relative)
+            header = f"{filepath}: {total_lines} lines, {size} bytes, version {version}"
+            if not headings:
+                return header + "\n(no headings)"
+            rows = [f"{'  ' * (level - 1)}- {title} (line {line + 1}, {lines} lines, {chars} chars)"
+                    for level, title, line, lines, chars in headings]
+            return header + "\n" + "\n".join(rows)
+        except Exception as e:
+            return f"Error outlining doc: {e}"
+
+    def list_docs(self, prefix: str = "", folder: str = "", offset: int = 0, limit: int = LIST_LIMIT) -> str:
         """
         Lists all markdown documents recursively within the 'docs/' sandbox.
         Use this tool to get an overview of the current file structure or to identify specific files
         when updating 'index.md' or searching for content.
+        Optionally pass a path prefix (e.g., 'projects/2024') or a folder (e.g., 'notes', or '.' for the root)
+        to list only part of the tree; long listings are paginated with offset and limit.
         """
 
         try:
-            files = [str(p.relative_to(self.base_dir))
-                     for p in self.base_dir.rglob("*") if p.is_file()]
-            return "\n".join(files) if files else "No documents found."
+            limit = limit if limit and limit > 0 else self.LIST_LIMIT
+            files, total = self.tree.list(prefix=prefix or "", folder=folder or None,
+                                          offset=max(0, offset or 0), limit=limit)
+            if not files:
+                return "No documents found." if not total else f"No documents after offset {offset} (total {total})."
+            listing = "\n".join(files)
+            end = offset + len(files)
+            if end < total:
+                listing += (f"\n\n[Showing {offset + 1}-{end} of {total} documents. "
+                            f"Call list_docs again with offset={end} to see more.]")
+            return listing
         except Exception as e:
             return f"Error listing docs: {e}"
 
@@ -68,8 +351,6 @@ class DocumentManager:
 
         try:
             old_path = self._safe_path(filepath)
-            if not old_path.exists():
-                return f"File not found: {filepath}"
 
             # The new path should be in the same parent directory
             new_path = old_path.with_name(new_name)
@@ -77,11 +358,29 @@ class DocumentManager:
             if not str(new_path.resolve()).startswith(str(self.base_dir)):
                 raise ValueError("Target path is outside the sandbox.")
 
-            old_path.rename(new_path)
+            error = self._locked_rename(filepath, old_path, new_path)
+            if error:
+                return error
             return f"Successfully renamed {filepath} to {new_name}"
         except Exception as e:
             return f"Error renaming doc: {e}"
 
+    def _exists(self, relative) -> bool:
+        return self.storage.is_file(relative) or self.storage.is_dir(relative)
+
+    def _locked_rename(self, filepath, source, target):
+        """Renames a file (locking both paths) or a folder (locking the whole tree); returns an error or None."""
+        old, new = self._rel(source), self._rel(target)
+        lock = self.locks.tree() if self.storage.is_dir(old) else self.locks.write(old, new)
+        with lock:
+            if not self._exists(old):
+                return f"File not found: {filepath}"
+            if self._exists(new):
+                return f"Error: {new} already exists."
+            self.storage.rename(old, new)
+            self._reindex("rename", source, target)
+        return None
+
     def move_doc(self, filepath: str, target_dir: str) -> str:
         """
         Moves a document to a different directory within the 'docs/' sandbox.
@@ -90,18 +389,21 @@ class DocumentManager:
 
         try:
             source_path = self._safe_path(filepath)
-            if not source_path.exists():
+            if not self._exists(self._rel(source_path)):
                 return f"File not found: {filepath}"
 
             dest_dir_path = self._safe_path(target_dir)
-            dest_dir_path.mkdir(parents=True, exist_ok=True)
+            if self.storage.is_file(self._rel(dest_dir_path)):
+                return f"Error moving doc: {target_dir} is a file, not a directory."
 
             dest_path = dest_dir_path / source_path.name
             # Security check
             if not str(dest_path.resolve()).startswith(str(self.base_dir)):
                 raise ValueError("Target path is outside the sandbox.")
 
-            source_path.rename(dest_path)
+            error = self._locked_rename(filepath, source_path, dest_path)
+            if error:
+                return error
             return f"Successfully moved {filepath} to {target_dir}/"
         except Exception as e:
             return f"Error moving doc: {e}"
@@ -114,12 +416,59 @@ class DocumentManager:
 
         try:
             path = self._safe_path(filepath)
-            if not path.exists():
-                return f"File not found: {filepath}"
-            if not path.is_file():
-                return f"Error: {filepath} is not a file. Only files can be deleted."
+            relative = self._rel(path)
+            with self.locks.write(relative):
+                if not self.storage.is_file(relative):
+                    if self.storage.is_dir(relative):
+                        return f"Error: {filepath} is not a file. Only files can be deleted."
+                    return f"File not found: {filepath}"
 
-            path.unlink()
+                self.storage.delete(relative)
+                self._reindex("remove", path)
             return f"Successfully deleted {filepath}"
         except Exception as e:
             return f"Error deleting doc: {e}"
+
+    def search_docs(self, query: str, limit: int = 10) -> str:
+        """
+        Searches the full text of all documents in the 'docs/' sandbox and returns the best matches.
+        Use this tool first when looking for stored information, instead of listing and reading files one by one.
+        Returns ranked file paths with titles and matching snippets; read a file with read_doc for its full content.
+        """
+
+        try:
+            if self.index is None:
+                self._open_index()
+            if self.index is None:
+                return "Error searching docs: the search index is unavailable."
+            rows = self.index.search(query, limit=max(1, min(limit, 50)))
+            if not rows:
+                return f"No documents match '{query}'."
+            return "\n".join(f"{i}. {path} ({title})\n   {' '.join(snippet.split())}"
+                             for i, (path, title, snippet) in enumerate(rows, 1))
+        except Exception as e:
+            return f"Error searching docs: {e}"
+
+    def retrieve_docs(self, query: str, top_k: int = 5) -> str:
+        """
+        Retrieves the document sections most relevant to a question from the 'docs/' sandbox.
+        Use this tool to answer questions from stored knowledge; it returns only the relevant sections,
+        so reading whole files with read_doc is rarely needed afterwards.
+        Unless a semantic embedding model is configured, sections are ranked by the words and word
+        fragments they share with the query, not by meaning: synonyms and paraphrases do not match,
+        so use the terms the documents are likely to contain.
+        """
+
+        try:
+            if self.vectors is None:
+                return "Error retrieving docs: the vector index is unavailable."
+            results = self.vectors.search(query, top_k=max(1, min(top_k, 20)))
+            if not results:
+                return f"No relevant document sections found for '{query}'."
+            sections = []
+            for i, (score, chunk) in enumerate(results, 1):
+                location = f"{chunk['path']} > {chunk['heading']}" if chunk["heading"] else chunk["path"]
+                sections.append(f"[{i}] {location} (score {score:.2f})\n{chunk['text']}")
+            return "\n---\n".join(sections)
+        except Exception as e:
+            return f"Error retrieving docs: {e}"
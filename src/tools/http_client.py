@@ -0,0 +1,129 @@
+import os
+import re
+import threading
+import requests  # pyright: ignore[reportMissingModuleSource]
+from requests.adapters import HTTPAdapter  # pyright: ignore[reportMissingModuleSource]
+from urllib3.util.retry import Retry  # pyright: ignore[reportMissingImports]
+
+
+# Shared HTTP settings for every web tool. Each can be overridden with an environment
+# variable of the same name; they are read lazily so values from .env are honored.
+DEFAULTS = {
+    "HTTP_CONNECT_TIMEOUT": 5.0,
+    "HTTP_READ_TIMEOUT": 20.0,
+    "HTTP_MAX_RETRIES": 2,
+    "HTTP_BACKOFF_FACTOR": 0.5,
+    "HTTP_POOL_HOSTS": 32,
+    "HTTP_POOL_SIZE": 16,
+    "HTTP_MAX_RESPONSE_BYTES": 50 * 1024 * 1024,
+}
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+}
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def setting(name: str):
+    default = DEFAULTS[name]
+    return type(default)(os.getenv(name, default))
+
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """Raised when a response body exceeds the configured size limit."""
+
+
+def _create_session() -> requests.Session:
+    retry = Retry(
+        total=setting("HTTP_MAX_RETRIES"),
+        backoff_factor=setting("HTTP_BACKOFF_FACTOR"),
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Hand the last response back so callers see the real status
+    )
+    adapter = HTTPAdapter(pool_connections=setting("HTTP_POOL_HOSTS"),
+                          pool_maxsize=setting("HTTP_POOL_SIZE"),
+                          max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Returns the process-wide session whose connection pools are kept alive between calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+def request(method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+    """Sends a request through the shared session with connect/read timeouts applied."""
+    if timeout is None:
+        timeout = (setting("HTTP_CONNECT_TIMEOUT"), setting("HTTP_READ_TIMEOUT"))
+    return get_session().request(method, url, timeout=timeout, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def iter_body(response: requests.Response, max_bytes=None, chunk_size=64 * 1024):
+    """Yields the body of a streamed response, raising ResponseTooLarge past max_bytes."""
+    max_bytes = max_bytes or setting("HTTP_MAX_RESPONSE_BYTES")
+
+    declared = response.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise ResponseTooLarge(f"Response is {declared} bytes (limit {max_bytes}).")
+
+    received = 0
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        received += len(chunk)
+        if received > max_bytes:
+            raise ResponseTooLarge(f"Response exceeds the {max_bytes} byte limit.")
+        yield chunk
+
+
+def read_body(response: requests.Response, max_bytes=None) -> bytes:
+    """Reads a streamed response into memory, enforcing the size limit."""
+    return b"".join(iter_body(response, max_bytes))
+
+
+def decode_body(response: requests.Response, body: bytes) -> str:
+    """Decodes a body using the declared charset, a <meta> charset, or detection."""
+    content_type = response.headers.get("Content-Type", "")
+    match = re.search(r"charset=([\w-]+)", content_type, re.IGNORECASE)
+    encoding = match.group(1) if match else None
+
+    if encoding is None:
+        meta = _META_CHARSET.search(body[:4096])
+        if meta:
+            encoding = meta.group(1).decode("ascii", "ignore")
+
+    if encoding:
+        try:
+            return body.decode(encoding, errors="replace")
+        except LookupError:
+            pass
+
+    try:
+        return body.decode("utf-8")
+    except UnicodeDecodeError:
+        from charset_normalizer import from_bytes  # pyright: ignore[reportMissingImports]
+
+        best = from_bytes(body).best()
+        return str(best) if best is not None else body.decode("latin-1")
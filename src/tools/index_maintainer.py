@@ -0,0 +1,254 @@
+import os
+import re
+import atexit
+import logging
+import pathlib
+import threading
+from contextlib import nullcontext
+from .doc_storage import FileStorage
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.md"
+BLOCK_START = "<!-- auto-index:start (maintained automatically; edits inside this block are replaced) -->"
+BLOCK_END = "<!-- auto-index:end -->"
+
+_BLOCK = re.compile(re.escape("<!-- auto-index:start") + r".*?" + re.escape(BLOCK_END), re.DOTALL)
+_HEADING = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$")
+_FRONT_MATTER_KEY = re.compile(r"^(\w+)\s*:\s*(.*)$")
+
+# Only the beginning of each document is read to extract its metadata
+HEAD_BYTES = 8 * 1024
+SUMMARY_CHARS = 160
+
+
+def _parse_tags(value, following_lines):
+    value = value.strip()
+    if value.startswith("[") and value.endswith("]"):
+        value = value[1:-1]
+    tags = [t.strip().strip("'\"") for t in value.split(",") if t.strip()]
+    if not tags:
+        # YAML block list: "tags:\n  - a\n  - b"
+        for line in following_lines:
+            if not line.strip().startswith("- "):
+                break
+            tags.append(line.strip()[2:].strip().strip("'\""))
+    return [t.lstrip("#") for t in tags if t]
+
+
+def extract_metadata(head: str, name: str) -> dict:
+    """
+    Returns {"title", "summary", "tags"} from front matter, the first heading and the first
+    paragraph of a document's beginning; the title defaults to the file name without suffix.
+    """
+    lines = head.splitlines()
+
+    meta = {"title": None, "summary": "", "tags": []}
+    body_start = 0
+    if lines and lines[0].strip() == "---":
+        for end in range(1, len(lines)):
+            if lines[end].strip() in ("---", "..."):
+                for i in range(1, end):
+                    match = _FRONT_MATTER_KEY.match(lines[i])
+                    if not match:
+                        continue
+                    key, value = match.group(1).lower(), match.group(2)
+                    if key == "title" and value.strip():
+                        meta["title"] = value.strip().strip("'\"")
+                    elif key in ("tags", "keywords"):
+                        meta["tags"] = _parse_tags(value, lines[i + 1:end])
+                    elif key in ("summary", "description") and value.strip():
+                        meta["summary"] = value.strip().strip("'\"")
+                body_start = end + 1
+                break
+
+    paragraph = []
+    in_fence = False
+    for line in lines[body_start:]:
+        stripped = line.strip()
+        if stripped.startswith(("```", "~~~")):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+        heading = _HEADING.match(stripped)
+        if heading:
+            if meta["title"] is None:
+                meta["title"] = heading.group(1)
+            if paragraph:
+                break
+            continue
+        if not stripped:
+            if paragraph:
+                break
+            continue
+        paragraph.append(stripped)
+
+    if not meta["summary"] and paragraph:
+        summary = " ".join(paragraph)
+        meta["summary"] = summary if len(summary) <= SUMMARY_CHARS else summary[:SUMMARY_CHARS].rstrip() + "…"
+    meta["title"] = meta["title"] or pathlib.PurePosixPath(name).stem
+    return meta
+
+
+class IndexMaintainer:
+    """
+    Keeps `index.md` in every folder of the sandbox up to date without the model's help.
+
+    It follows the same update/remove/rename interface as the search indexes: each
+    mutation marks the affected folder (and its ancestors, whose folder listings may
+    change) dirty, and dirty folders are regenerated together after a short quiet
+    period. Only the block between the auto-index markers is rewritten, so notes
+    written above or below it are preserved, and unchanged indexes are not rewritten.
+    """
+
+    def __init__(self, base_dir: pathlib.Path, tree, writer, debounce=None, lock=None, storage=None):
+        self.base_dir = pathlib.Path(base_dir)
+        self.storage = storage or FileStorage(self.base_dir)
+        self.tree = tree
+        self.writer = writer  # writer(path, content), e.g. DocumentManager._atomic_write
+        # lock(relative path) guards the read-modify-write of an index, e.g. DocLocks.write
+        self.lock = lock or (lambda relative: nullcontext())
+        self.debounce = debounce if debounce is not None else float(os.getenv("DOC_INDEX_DEBOUNCE", "1.0"))
+
+        self._dirty = set()
+        self._metadata = {}  # relative path -> ((mtime, size), meta)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def _folder_of(self, relative: str) -> str:
+        return os.path.dirname(relative)
+
+    def _mark(self, folder: str):
+        with self._lock:
+            while True:
+                self._dirty.add(folder)
+                if not folder:
+                    break
+                folder = os.path.dirname(folder)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _relative(self, path: pathlib.Path) -> str:
+        return path.relative_to(self.base_dir).as_posix()
+
+    # --- mutation interface shared with the search indexes ---
+
+    def update(self, path: pathlib.Path):
+        relative = self._relative(path)
+        if os.path.basename(relative) == INDEX_FILE:
+            return  # our own output, or the model editing the notes around the block
+        self._mark(self._folder_of(relative))
+
+    def remove(self, path: pathlib.Path):
+        relative = self._relative(path)
+        with self._lock:
+            for known in [p for p in self._metadata if p == relative or p.startswith(relative + "/")]:
+                del self._metadata[known]
+        self._mark(self._folder_of(relative))
+
+    def rename(self, old_path: pathlib.Path, new_path: pathlib.Path):
+        # Links inside a moved folder are relative, so only the old and new parents change
+        self.remove(old_path)
+        self._mark(self._folder_of(self._relative(new_path)))
+
+    def sync(self) -> int:
+        return 0  # Indexes are only regenerated after changes, not on every startup
+
+    # --- generation ---
+
+    def _metadata_of(self, relative: str) -> dict:
+        stat = self.tree.stat(relative)
+        with self._lock:
+            cached = self._metadata.get(relative)
+        if cached and cached[0] == stat:
+            return cached[1]
+        with self.storage.open(relative) as f:
+            head = f.read(HEAD_BYTES).decode("utf-8", errors="replace")
+        meta = extract_metadata(head, relative)
+        with self._lock:
+            self._metadata[relative] = (stat, meta)
+        return meta
+
+    def render(self, folder: str) -> str:
+        """Returns the auto-index block for a folder ("" for the root)."""
+        files, _ = self.tree.list(folder=folder or ".")
+        prefix = folder + "/" if folder else ""
+        documents = []
+        for relative in files:
+            name = relative[len(prefix):]
+            if name == INDEX_FILE:
+                continue
+            meta = self._metadata_of(relative) if name.endswith((".md", ".markdown")) else \
+                {"title": name, "summary": "", "tags": []}
+            line = f"- [{meta['title']}]({name})"
+            if meta["summary"]:
+                line += f" — {meta['summary']}"
+            if meta["tags"]:
+                line += " " + " ".join(f"`#{tag}`" for tag in meta["tags"])
+            documents.append(line)
+
+        # Immediate subfolders with the number of documents anywhere below them
+        counts = {}
+        for relative in self.tree.list(prefix=prefix)[0]:
+            rest = relative[len(prefix):]
+            if "/" in rest and os.path.basename(rest) != INDEX_FILE:
+                child = rest.split("/", 1)[0]
+                counts[child] = counts.get(child, 0) + 1
+        subfolders = [f"- [{child}/]({child}/{INDEX_FILE}) — {count} document{'s' if count != 1 else ''}"
+                      for child, count in sorted(counts.items())]
+
+        parts = [BLOCK_START]
+        if documents:
+            parts += ["## Documents", ""] + documents + [""]
+        if subfolders:
+            parts += ["## Folders", ""] + subfolders + [""]
+        if not documents and not subfolders:
+            parts += ["_No documents yet._", ""]
+        parts.append(BLOCK_END)
+        return "\n".join(parts)
+
+    def _regenerate(self, folder: str):
+        own_index = f"{folder}/{INDEX_FILE}" if folder else INDEX_FILE
+        index_path = self.base_dir / own_index
+        if not self.storage.is_dir(folder):
+            return
+        first_files, _ = self.tree.list(prefix=(folder + "/") if folder else "", limit=2)
+        if not self.storage.is_file(own_index) and all(p == own_index for p in first_files):
+            return
+
+        block = self.render(folder)
+        # The model (or another process) may be editing the notes around the block
+        with self.lock(own_index):
+            if self.storage.is_file(own_index):
+                current = self.storage.read_bytes(own_index).decode("utf-8")
+                if _BLOCK.search(current):
+                    updated = _BLOCK.sub(lambda _: block, current, count=1)
+                else:
+                    updated = current.rstrip("\n") + "\n\n" + block + "\n"
+            else:
+                title = f"# {folder} Index" if folder else "# Index"
+                current, updated = None, f"{title}\n\n{block}\n"
+            if updated != current:
+                self.writer(index_path, updated)
+
+    def flush(self):
+        """Regenerates every dirty folder index now."""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            # Deepest folders first, so parents see their children's final state
+            for folder in sorted(dirty, key=lambda f: f.count("/") + bool(f), reverse=True):
+                try:
+                    self._regenerate(folder)
+                except Exception as e:
+                    logger.warning("Failed to update the index of '%s': %s", folder or ".", e)
@@ -1,54 +1,290 @@
 import requests  # pyright: ignore[reportMissingModuleSource]
-import fitz  # pyright: ignore[reportMissingImports]
 import os
-import uuid
+import math
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from . import http_client
+from .tool_cache import record_validators
 
 
-def read_pdf_from_url(pdf_url: str) -> str:
+# Default cap on returned characters so a 300-page paper does not flood the context
+DEFAULT_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "50000"))
+
+# Requests whose character budget needs at least this many more pages are extracted in a process pool
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "48"))
+PAGES_PER_TASK = 16
+
+# Number of documents whose extracted page texts are kept in memory
+TEXT_CACHE_SIZE = int(os.getenv("PDF_TEXT_CACHE_SIZE", "32"))
+
+
+class _PdfTextCache:
+    """LRU of extracted page texts keyed by content hash, plus the last hash seen per URL."""
+
+    def __init__(self, max_documents):
+        self.max_documents = max_documents
+        self._documents = OrderedDict()  # digest -> {"page_count": int, "pages": {index: text}}
+        self._urls = {}                  # url -> (digest, validators)
+        self._lock = threading.Lock()
+
+    def document(self, digest, page_count=None):
+        with self._lock:
+            entry = self._documents.get(digest)
+            if entry is None:
+                if page_count is None:
+                    return None
+                entry = {"page_count": page_count, "pages": {}}
+                self._documents[digest] = entry
+                while len(self._documents) > self.max_documents:
+                    self._documents.popitem(last=False)
+            self._documents.move_to_end(digest)
+            return entry
+
+    def remember_url(self, url, digest, validators):
+        with self._lock:
+            self._urls[url] = (digest, validators)
+
+    def url_entry(self, url):
+        with self._lock:
+            return self._urls.get(url)
+
+
+_text_cache = _PdfTextCache(TEXT_CACHE_SIZE)
+
+# One pool per process, started with the first large document
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _open_pdf(source):
+    """Opens a PDF from bytes or from a file path."""
+    # PyMuPDF is slow to import, so it is loaded with the first PDF instead of at startup
+    import fitz  # pyright: ignore[reportMissingImports]
+
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _extract_pages(path, page_indices) -> list:
+    # Runs in a pool worker; the document is passed as a temporary file instead of pickled bytes
+    document = _open_pdf(path)
+    try:
+        return [document.load_page(i).get_text() for i in page_indices]
+    finally:
+        document.close()
+
+
+def _parse_pages(pages: str, page_count: int) -> list:
+    """Parses a 1-based page spec such as "1-5,8,10-" into 0-based indices."""
+    if not pages or not pages.strip():
+        return list(range(page_count))
+
+    indices = []
+    for item in pages.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "-" in item:
+            start, _, end = item.partition("-")
+            start = int(start) if start.strip() else 1
+            end = int(end) if end.strip() else page_count
+        else:
+            start = end = int(item)
+        if start < 1 or end < start:
+            raise ValueError(f"invalid page range '{item}'")
+        indices.extend(range(start - 1, min(end, page_count)))
+    return list(dict.fromkeys(indices))
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forking a process that runs threads can deadlock the child, so workers
+            # come from a fork server where there is one, and are spawned elsewhere
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            workers = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+            _pool = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context)
+        return _pool
+
+
+def _discard_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _pages_for_budget(indices, cached_pages, budget) -> list:
+    """
+    Returns the uncached pages, in order, that the character budget probably still needs,
+    estimated from the average length of the requested pages extracted so far.
+    """
+    todo = [i for i in indices if i not in cached_pages]
+    lengths = [len(cached_pages[i]) for i in indices if i in cached_pages]
+    if not lengths:
+        return todo
+    remaining = budget - sum(lengths)
+    if remaining <= 0:
+        return []
+    return todo[:math.ceil(remaining / max(sum(lengths) / len(lengths), 1))]
+
+
+def _extract_in_pool(data, indices, todo, cached_pages, budget):
+    """Extracts the todo pages in the process pool, stopping early once budget chars are reached."""
+    tasks = [todo[i:i + PAGES_PER_TASK] for i in range(0, len(todo), PAGES_PER_TASK)]
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(data)
+    futures = []
+    try:
+        pool = _get_pool()
+        futures = [(task, pool.submit(_extract_pages, f.name, task)) for task in tasks]
+        total = sum(len(cached_pages[i]) for i in indices if i in cached_pages)
+        for task, future in futures:
+            if total >= budget:
+                break
+            for index, text in zip(task, future.result()):
+                cached_pages[index] = text
+                total += len(text)
+    finally:
+        for _, future in futures:
+            future.cancel()
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+
+
+def _extract_in_process(document, indices, cached_pages, budget, limit=None):
+    """Extracts uncached pages in order until budget chars are reached or limit pages were read."""
+    total = sum(len(cached_pages[i]) for i in indices if i in cached_pages)
+    extracted = 0
+    for index in indices:
+        if total >= budget or extracted == limit:
+            break
+        if index not in cached_pages:
+            cached_pages[index] = document.load_page(index).get_text()
+            total += len(cached_pages[index])
+            extracted += 1
+
+
+def _download(pdf_url, conditional=True):
+    """
+    Downloads the PDF into memory and returns (digest, data).
+    When the server confirms the previously seen copy is unchanged, data is None.
+    """
+    known = _text_cache.url_entry(pdf_url) if conditional else None
+    headers = {}
+    if known:
+        validators = known[1]
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    with http_client.get(pdf_url, stream=True, headers=headers) as response:
+        if response.status_code == 304 and known:
+            return known[0], None
+        response.raise_for_status()  # Raise an exception for HTTP errors
+        record_validators(pdf_url, response.headers)
+        data = http_client.read_body(response)
+        validators = {key: response.headers[name] for key, name in
+                      (("etag", "ETag"), ("last_modified", "Last-Modified"))
+                      if response.headers.get(name)}
+
+    digest = hashlib.sha256(data).hexdigest()
+    _text_cache.remember_url(pdf_url, digest, validators)
+    return digest, data
+
+
+def read_pdf_from_url(pdf_url: str, pages: str = "", max_chars: int = 0) -> str:
     """
     Downloads a PDF from a given URL, extracts its text content, and returns it.
     Use this tool when the user provides a PDF URL or asks to read content from a PDF document.
-    The downloaded PDF is saved to a temporary location and then deleted.
+    Long documents are truncated; read further by requesting specific pages.
 
     Args:
         pdf_url: The URL to the PDF document.
+        pages: Optional 1-based pages to read, e.g. "1-5", "3,7,9" or "10-" (default: all pages).
+        max_chars: Optional maximum number of characters to return (default: 50000).
 
     Returns:
         The extracted text content from the PDF, or an error message if extraction fails.
     """
-    temp_dir = "temp"  # Using a relative path for temporary files
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_filepath = os.path.join(temp_dir, f"{uuid.uuid4()}.pdf")
+    budget = max_chars if max_chars and max_chars > 0 else DEFAULT_MAX_CHARS
+    document = None
 
     try:
-        # Download the PDF
-        response = requests.get(pdf_url, stream=True)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        with open(temp_filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        # Extract text using PyMuPDF
-        document = fitz.open(temp_filepath)
-        text_content = ""
-        for page_num in range(document.page_count):
-            page = document.load_page(page_num)
-            text_content += page.get_text()
-        document.close()
+        # The PDF is kept in memory; unchanged documents reuse previously extracted text
+        digest, data = _download(pdf_url)
+        entry = _text_cache.document(digest)
+        if entry is None and data is None:
+            digest, data = _download(pdf_url, conditional=False)
+
+        if data is not None:
+            document = _open_pdf(data)
+            entry = _text_cache.document(digest, document.page_count)
+
+        indices = _parse_pages(pages, entry["page_count"])
+        missing = [i for i in indices if i not in entry["pages"]]
+
+        if missing and data is None:
+            # Only part of the document was extracted before; fetch the bytes again
+            digest, data = _download(pdf_url, conditional=False)
+            document = _open_pdf(data)
+            entry = _text_cache.document(digest, document.page_count)
+            indices = _parse_pages(pages, entry["page_count"])
+            missing = [i for i in indices if i not in entry["pages"]]
+
+        if not indices:
+            return f"Error: the PDF has only {entry['page_count']} pages."
+
+        cached_pages = entry["pages"]
+        if missing:
+            # The first pages show how long pages are, and so how many the budget needs
+            _extract_in_process(document, indices, cached_pages, budget, limit=PAGES_PER_TASK)
+            todo = _pages_for_budget(indices, cached_pages, budget)
+            if len(todo) >= PARALLEL_MIN_PAGES:
+                try:
+                    _extract_in_pool(data, indices, todo, cached_pages, budget)
+                except BrokenProcessPool:
+                    _discard_pool()
+            # Whatever the pool did not get to (or the whole rest of a small request)
+            _extract_in_process(document, indices, cached_pages, budget)
+
+        # Assemble the requested pages in order, stopping at the character budget
+        parts = []
+        total = 0
+        last_page = None
+        for index in indices:
+            if total >= budget or index not in cached_pages:
+                break
+            parts.append(cached_pages[index])
+            total += len(cached_pages[index])
+            last_page = index
 
+        text_content = "".join(parts)
+        cut = len(text_content) > budget
+        if cut or (indices and last_page != indices[-1]):
+            next_page = (last_page + 1 if cut else last_page + 2) if last_page is not None else 1
+            text_content = text_content[:budget] + (
+                f"\n\n[Truncated at {budget} characters of {entry['page_count']} pages. "
+                f"Call read_pdf_from_url again with pages=\"{next_page}-\" to continue.]")
         return text_content
+    except ValueError as e:
+        return f"Error: {e}"
     except requests.exceptions.RequestException as e:
         return f"Error downloading PDF from {pdf_url}: {e}"
-    except fitz.FileNotFoundError:
-        return f"Error: Downloaded PDF file not found at {temp_filepath}."
     except Exception as e:
         return f"Error extracting text from PDF: {e}"
     finally:
-        # Clean up the temporary file
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
-        # Optionally remove the temp directory if it's empty, but not strictly necessary
-        # try:
-        #     os.rmdir(temp_dir)
-        # except OSError:
-        #     pass # Directory not empty
+        if document is not None:
+            document.close()
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import inspect
+import pathlib
+import threading
+import functools
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+
+# Default time-to-live (seconds) per tool; override with TOOL_CACHE_TTL_<TOOL_NAME>
+DEFAULT_TTLS = {
+    "search_web": 15 * 60,
+    "fetch_web_content": 60 * 60,
+    "read_pdf_from_url": 7 * 24 * 60 * 60,
+}
+
+_ERROR_PREFIXES = ("Error", "An error", "An unexpected error", "No search results", "No organic")
+
+# Validators (ETag / Last-Modified) recorded by the tool running on this thread
+_validators = threading.local()
+
+
+def record_validators(url: str, headers) -> None:
+    """
+    Called by URL-fetching tools to hand the response's cache validators to the cache,
+    so an expired entry can later be revalidated with a conditional request.
+    """
+    validators = {"url": url}
+    if headers.get("ETag"):
+        validators["etag"] = headers["ETag"]
+    if headers.get("Last-Modified"):
+        validators["last_modified"] = headers["Last-Modified"]
+    _validators.last = validators if len(validators) > 1 else None
+
+
+def revalidate_url(validators: dict) -> bool:
+    """Sends a conditional GET; returns True if the server answers 304 Not Modified."""
+    from . import http_client
+
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    try:
+        with http_client.get(validators["url"], headers=headers, stream=True) as response:
+            return response.status_code == 304
+    except Exception:
+        return False
+
+
+def _normalize_value(name, value):
+    if isinstance(value, str):
+        value = value.strip()
+        if name in ("url", "pdf_url"):
+            parts = urlsplit(value)
+            # Scheme and host are case-insensitive; fragments never reach the server
+            return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/",
+                               parts.query, ""))
+        if name == "query":
+            return " ".join(value.lower().split())
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(name, v) for v in value]
+    return value
+
+
+def _is_error(result) -> bool:
+    if isinstance(result, str):
+        return result.startswith(_ERROR_PREFIXES)
+    if isinstance(result, list):
+        return any(isinstance(item, dict) and "error" in item for item in result)
+    return False
+
+
+class _Entry:
+    __slots__ = ("tool", "value", "size", "expires_at", "validators")
+
+    def __init__(self, tool, value, size, expires_at, validators=None):
+        self.tool = tool
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.validators = validators
+
+
+class ToolCache:
+    """
+    TTL- and size-bounded cache for network tool results.
+
+    Entries are keyed on the tool name and its normalized arguments and kept in an
+    in-memory LRU with byte-size accounting. An optional SQLite tier (TOOL_CACHE_PATH)
+    survives restarts. Expired URL entries with an ETag or Last-Modified validator are
+    revalidated with a conditional request instead of being fetched again.
+    """
+
+    def __init__(self, max_bytes=None, disk_path=None):
+        self.max_bytes = max_bytes or int(os.getenv("TOOL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.disk_path = disk_path if disk_path is not None else os.getenv("TOOL_CACHE_PATH", "")
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._inflight = {}  # key -> Event, so concurrent identical calls run once
+        self._stats = {}
+
+        self._db = None
+        if self.disk_path:
+            pathlib.Path(self.disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, tool TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, validators TEXT)")
+            self._db.commit()
+
+    def _count(self, tool, counter):
+        tool_stats = self._stats.setdefault(
+            tool, {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0})
+        tool_stats[counter] += 1
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters, overall and per tool."""
+        with self._lock:
+            totals = {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0}
+            for tool_stats in self._stats.values():
+                for counter, value in tool_stats.items():
+                    totals[counter] += value
+            return {
+                **totals,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "tools": {tool: dict(s) for tool, s in self._stats.items()},
+            }
+
+    @staticmethod
+    def make_key(tool_name, signature, args, kwargs) -> str:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        normalized = {name: _normalize_value(name, value) for name, value in bound.arguments.items()}
+        payload = json.dumps([tool_name, normalized], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _store_memory(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        # Very large results would flush the whole LRU; leave those to the disk tier
+        if entry.size > self.max_bytes // 4:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._count(evicted.tool, "evictions")
+
+    def _load_disk(self, key, tool):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, expires_at, validators FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, validators = row
+        return _Entry(tool, json.loads(value), len(value.encode("utf-8")), expires_at,
+                      json.loads(validators) if validators else None)
+
+    def _store_disk(self, key, entry):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (key, tool, value, expires_at, validators) VALUES (?, ?, ?, ?, ?)",
+            (key, entry.tool, json.dumps(entry.value, ensure_ascii=False), entry.expires_at,
+             json.dumps(entry.validators) if entry.validators else None))
+        self._db.commit()
+
+    def _lookup(self, key, tool, revalidate):
+        """Returns a fresh (or successfully revalidated) entry, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            else:
+                entry = self._load_disk(key, tool)
+                if entry is not None:
+                    self._store_memory(key, entry)
+
+        if entry is None:
+            return None
+        if entry.expires_at > time.time():
+            return entry
+        if revalidate is not None and entry.validators and revalidate(entry.validators):
+            with self._lock:
+                entry.expires_at = time.time() + self._ttl_of(tool)
+                self._store_disk(key, entry)
+                self._count(tool, "revalidated")
+            return entry
+        return None
+
+    def _ttl_of(self, tool) -> float:
+        return float(os.getenv(f"TOOL_CACHE_TTL_{tool.upper()}", DEFAULT_TTLS.get(tool, 600)))
+
+    def get_or_call(self, tool, key, call, revalidate=None):
+        while True:
+            entry = self._lookup(key, tool, revalidate)
+            if entry is not None:
+                with self._lock:
+                    self._count(tool, "hits")
+                return entry.value
+
+            with self._lock:
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._inflight[key] = threading.Event()
+                    break
+            # The same call is already running on another thread; reuse its result
+            waiter.wait()
+
+        try:
+            with self._lock:
+                self._count(tool, "misses")
+            _validators.last = None
+            result = call()
+
+            if not _is_error(result):
+                encoded = json.dumps(result, ensure_ascii=False)
+                entry = _Entry(tool, result, len(encoded.encode("utf-8")),
+                               time.time() + self._ttl_of(tool), _validators.last)
+                with self._lock:
+                    self._store_memory(key, entry)
+                    self._store_disk(key, entry)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def cached(self, func, revalidate=None):
+        """Wraps a tool so its results are cached; name, docstring and signature are preserved."""
+        tool = func.__name__
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = self.make_key(tool, signature, args, kwargs)
+            except TypeError:
+                # Invalid arguments; let the tool report the error itself
+                return func(*args, **kwargs)
+            return self.get_or_call(tool, key, lambda: func(*args, **kwargs), revalidate)
+
+        return wrapper
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
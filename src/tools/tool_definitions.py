@@ -1,10 +1,11 @@
 import os
 from .document_manager import DocumentManager
 from .time_utils import get_current_datetime
-from .arxiv_utils import search_arxiv
+from .arxiv_utils import search_arxiv, search_arxiv_many, get_arxiv_papers
 from .pdf_utils import read_pdf_from_url
 from .web_search_utils import search_web
-from .web_fetch_utils import fetch_web_content
+from .web_fetch_utils import fetch_web_content, make_fetch_many
+from .tool_cache import ToolCache, revalidate_url
 
 
 # Initialize Document Manager
@@ -12,17 +13,32 @@ from .web_fetch_utils import fetch_web_content
 docs_base_dir = os.environ.get("DOCS_BASE_DIR", "docs")
 doc_manager = DocumentManager(base_dir=docs_base_dir)
 
+# Cache for network tool results (TTL per tool, LRU in memory, optional disk tier)
+tool_cache = ToolCache()
+cached_fetch_web_content = tool_cache.cached(fetch_web_content, revalidate=revalidate_url)
+
 # Define tools for the model
 tools = [
     doc_manager.write_doc,
+    doc_manager.append_doc,
+    doc_manager.replace_in_doc,
+    doc_manager.patch_doc,
     doc_manager.read_doc,
+    doc_manager.outline_doc,
     doc_manager.list_docs,
+    doc_manager.search_docs,
+    doc_manager.retrieve_docs,
     doc_manager.rename_doc,
     doc_manager.move_doc,
     doc_manager.delete_doc,
     get_current_datetime,
+    # arXiv results are cached in their own SQLite metadata store
     search_arxiv,
-    read_pdf_from_url,
-    search_web,
-    fetch_web_content
+    search_arxiv_many,
+    get_arxiv_papers,
+    tool_cache.cached(read_pdf_from_url, revalidate=revalidate_url),
+    tool_cache.cached(search_web),
+    cached_fetch_web_content,
+    # Batch fetches share the per-URL cache entries with fetch_web_content
+    make_fetch_many(cached_fetch_web_content)
 ]
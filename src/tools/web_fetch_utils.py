@@ -1,51 +1,282 @@
+import os
+import re
+import time
+import asyncio
+import threading
 import requests  # pyright: ignore[reportMissingModuleSource]
-from bs4 import BeautifulSoup  # pyright: ignore[reportMissingImports]
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from . import http_client
+from .tool_cache import record_validators
 
+try:
+    import lxml  # noqa: F401  # pyright: ignore[reportMissingImports]
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
 
-def fetch_web_content(url: str) -> str:
+
+# Pages larger than this are cut off while downloading
+MAX_PAGE_BYTES = int(os.getenv("WEB_FETCH_MAX_BYTES", str(3 * 1024 * 1024)))
+DEFAULT_MAX_CHARS = 5000
+
+# Extracted page texts kept briefly so later chunks (offset) do not refetch the page
+EXTRACTED_CACHE_SIZE = 32
+EXTRACTED_CACHE_TTL = 10 * 60
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_CONTENT_TYPES = ("text/plain", "text/markdown")
+
+# Tags that never contain main content
+NOISE_TAGS = ["script", "style", "noscript", "header", "footer", "nav", "aside",
+              "form", "iframe", "svg", "button", "template"]
+NOISE_PATTERN = re.compile(
+    r"comment|sidebar|footer|header|menu|nav|banner|popup|cookie|share|social|related|promo|\bads?\b",
+    re.IGNORECASE)
+# Elements that also look like content are kept (e.g. "main-content", "article-header"), as in Readability
+CONTENT_PATTERN = re.compile(r"article|body|content|main", re.IGNORECASE)
+BLOCK_TAGS = ["p", "pre", "td", "blockquote", "li", "h1", "h2", "h3", "h4"]
+
+# Limits for fetch_many_web_contents
+BATCH_MAX_URLS = int(os.getenv("WEB_FETCH_BATCH_MAX_URLS", "10"))
+BATCH_CONCURRENCY = int(os.getenv("WEB_FETCH_CONCURRENCY", "8"))
+BATCH_PER_HOST = int(os.getenv("WEB_FETCH_PER_HOST", "2"))
+BATCH_DEADLINE = float(os.getenv("WEB_FETCH_DEADLINE", "30"))
+BATCH_MAX_CHARS = 3000
+
+_extracted = OrderedDict()  # url -> (timestamp, text)
+_extracted_lock = threading.Lock()
+
+
+def _clean_lines(text: str) -> str:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return '\n'.join(lines)
+
+
+def _link_density(node) -> float:
+    text_length = len(node.get_text(strip=True)) or 1
+    link_length = sum(len(a.get_text(strip=True)) for a in node.find_all("a"))
+    return link_length / text_length
+
+
+def extract_main_text(html: str) -> str:
+    """
+    Extracts the main readable content of an HTML page using readability-style scoring:
+    paragraphs award points to their ancestors, and the best-scoring container wins.
+    """
+    # Imported on first use; BeautifulSoup is the slowest part of loading this module
+    from bs4 import BeautifulSoup  # pyright: ignore[reportMissingImports]
+
+    soup = BeautifulSoup(html, HTML_PARSER)
+    title = soup.title.get_text(strip=True) if soup.title else ""
+
+    # 불필요한 태그 제거 (스크립트, 스타일, 네비게이션 등)
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+    for tag in soup.find_all(True):
+        if tag.decomposed or tag.name in ("html", "body", "article", "main"):
+            continue
+        marker = " ".join(tag.get("class", [])) + " " + (tag.get("id") or "")
+        if marker.strip() and NOISE_PATTERN.search(marker) and not CONTENT_PATTERN.search(marker):
+            tag.decompose()
+
+    body = soup.body or soup
+
+    # Explicit main-content containers take priority
+    candidate = soup.find("article") or soup.find("main") or soup.find(attrs={"role": "main"})
+
+    if candidate is None:
+        scores = {}
+        nodes = {}
+        for block in body.find_all(BLOCK_TAGS):
+            text = block.get_text(" ", strip=True)
+            if len(text) < 25:
+                continue
+            score = 1 + text.count(",") + text.count("，") + min(len(text) // 100, 3)
+            parent = block.parent
+            grandparent = parent.parent if parent is not None else None
+            for ancestor, weight in ((parent, 1.0), (grandparent, 0.5)):
+                if ancestor is None:
+                    continue
+                scores[id(ancestor)] = scores.get(id(ancestor), 0) + score * weight
+                nodes[id(ancestor)] = ancestor
+
+        best_score = 0
+        for key, score in scores.items():
+            score *= 1 - _link_density(nodes[key])
+            if score > best_score:
+                best_score, candidate = score, nodes[key]
+
+    text = _clean_lines(candidate.get_text(separator='\n')) if candidate is not None else ""
+    if len(text) < 250:
+        # Scoring found nothing substantial; fall back to the whole body
+        text = _clean_lines(body.get_text(separator='\n'))
+
+    return f"Title: {title}\n\n{text}" if title else text
+
+
+def _remember(url, text):
+    with _extracted_lock:
+        _extracted[url] = (time.monotonic(), text)
+        _extracted.move_to_end(url)
+        while len(_extracted) > EXTRACTED_CACHE_SIZE:
+            _extracted.popitem(last=False)
+
+
+def _recall(url):
+    with _extracted_lock:
+        item = _extracted.get(url)
+    if item and time.monotonic() - item[0] < EXTRACTED_CACHE_TTL:
+        return item[1]
+    return None
+
+
+def _fetch_text(url: str) -> str:
+    with http_client.get(url, stream=True) as response:
+        response.raise_for_status()
+
+        # Abort non-text content before downloading the body
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type and content_type not in HTML_CONTENT_TYPES + TEXT_CONTENT_TYPES:
+            hint = " Use read_pdf_from_url for PDF documents." if "pdf" in content_type else ""
+            raise ValueError(f"Unsupported content type '{content_type}'.{hint}")
+
+        record_validators(url, response.headers)
+
+        # Read at most MAX_PAGE_BYTES; the rest of an oversized page is dropped
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            received += len(chunk)
+            if received >= MAX_PAGE_BYTES:
+                break
+        body = b"".join(chunks)[:MAX_PAGE_BYTES]
+
+        # 인코딩 설정 (한글 깨짐 방지)
+        text = http_client.decode_body(response, body)
+
+    if content_type in TEXT_CONTENT_TYPES:
+        return _clean_lines(text)
+    return extract_main_text(text)
+
+
+def fetch_web_content(url: str, max_chars: int = DEFAULT_MAX_CHARS, offset: int = 0) -> str:
     """
-    Fetches the text content of a given URL.
+    Fetches the main text content of a given URL.
     Use this tool when you need to read the full content of a specific webpage or link.
+    Long pages are returned in chunks; pass the offset given at the end of a chunk to read further.
 
     Args:
         url: The URL of the webpage to fetch content from.
+        max_chars: The maximum number of characters to return (default: 5000).
+        offset: The character offset to start reading from (default: 0).
 
     Returns:
         The text content of the webpage, or an error message if the fetch fails.
     """
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
-    }
-
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+        text = _recall(url) if offset > 0 else None
+        if text is None:
+            text = _fetch_text(url)
+            _remember(url, text)
 
-        # 인코딩 설정 (한글 깨짐 방지)
-        response.encoding = response.apparent_encoding
-
-        # BeautifulSoup을 사용하여 HTML 파싱 및 텍스트 추출
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # 불필요한 태그 제거 (스크립트, 스타일, 네비게이션 등)
-        for script_or_style in soup(["script", "style", "header", "footer", "nav"]):
-            script_or_style.decompose()
-
-        # 텍스트 추출 및 줄바꿈 정리
-        text = soup.get_text(separator='\n')
-        lines = [line.strip() for line in text.splitlines() if line.strip()]
-        clean_text = '\n'.join(lines)
+        max_chars = max_chars if max_chars and max_chars > 0 else DEFAULT_MAX_CHARS
+        offset = max(0, offset or 0)
+        chunk = text[offset:offset + max_chars]
 
-        # 내용이 너무 길 경우 에이전트의 컨텍스트 제한을 고려해 일부 자름 (약 5000자)
-        return clean_text[:5000]
+        end = offset + len(chunk)
+        if end < len(text):
+            chunk += (f"\n\n[Showing characters {offset}-{end} of {len(text)}. "
+                      f"Call fetch_web_content again with offset={end} to read more.]")
+        return chunk
 
+    except ValueError as e:
+        return f"Error fetching the URL: {e}"
     except requests.exceptions.RequestException as e:
         return f"Error fetching the URL: {e}"
     except Exception as e:
         return f"An unexpected error occurred while fetching content: {e}"
 
 
+# Blocking fetches of a batch run here; a private pool means a batch that hits its
+# deadline returns immediately instead of waiting for straggling downloads.
+_batch_pool = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="web-fetch")
+
+
+async def _fetch_batch(fetch, urls, max_chars, deadline):
+    loop = asyncio.get_running_loop()
+    overall = asyncio.Semaphore(BATCH_CONCURRENCY)
+    hosts = {}
+
+    async def fetch_one(url):
+        host = urlsplit(url).netloc.lower()
+        per_host = hosts.setdefault(host, asyncio.Semaphore(BATCH_PER_HOST))
+        # Per host first: a URL waiting on a busy host must not hold one of the overall slots
+        async with per_host, overall:
+            return await loop.run_in_executor(_batch_pool, fetch, url, max_chars)
+
+    tasks = [asyncio.ensure_future(fetch_one(url)) for url in urls]
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+
+    results = []
+    for url, task in zip(urls, tasks):
+        if task in pending:
+            results.append(f"Error fetching the URL: no response within the {deadline:g}s deadline.")
+        elif task.exception() is not None:
+            results.append(f"An unexpected error occurred while fetching content: {task.exception()}")
+        else:
+            results.append(task.result())
+    return results
+
+
+def make_fetch_many(fetch=fetch_web_content):
+    """Builds the batch tool on top of a single-URL fetch (e.g. a cached fetch_web_content)."""
+
+    def fetch_many_web_contents(urls: list[str], max_chars: int = BATCH_MAX_CHARS) -> str:
+        """
+        Fetches the main text content of several URLs at once.
+        Use this tool instead of repeated fetch_web_content calls when you need to read several links,
+        for example the top results of a web search. Failed URLs are reported without affecting the others.
+
+        Args:
+            urls: The list of URLs to fetch (up to 10).
+            max_chars: The maximum number of characters to return per URL (default: 3000).
+
+        Returns:
+            The text content of each URL in order, each preceded by its URL, or an error message per URL.
+        """
+        if isinstance(urls, str):
+            urls = [urls]
+        urls = list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+        if not urls:
+            return "Error: no URLs were given."
+
+        skipped = urls[BATCH_MAX_URLS:]
+        urls = urls[:BATCH_MAX_URLS]
+        max_chars = max_chars if max_chars and max_chars > 0 else BATCH_MAX_CHARS
+
+        # Tools run on worker threads without an event loop, so each batch gets its own
+        results = asyncio.run(_fetch_batch(fetch, urls, max_chars, BATCH_DEADLINE))
+
+        failed = sum(1 for result in results if result.startswith(("Error", "An unexpected error")))
+        sections = [f"Fetched {len(urls) - failed} of {len(urls)} URLs."]
+        sections += [f"[{i}] {url}\n{result}" for i, (url, result) in enumerate(zip(urls, results), 1)]
+        if skipped:
+            sections.append(f"Skipped {len(skipped)} URLs over the limit of {BATCH_MAX_URLS}: "
+                            + ", ".join(skipped))
+        return "\n---\n".join(sections)
+
+    return fetch_many_web_contents
+
+
+fetch_many_web_contents = make_fetch_many()
+
+
 if __name__ == "__main__":
 
     print(fetch_web_content("https://cadabra.tistory.com/164"))
@@ -1,7 +1,79 @@
 import json
 import os
+import time
+import threading
 import requests  # pyright: ignore[reportMissingModuleSource]
-from ddgs import DDGS  # pyright: ignore[reportMissingImports]
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from . import http_client
+
+
+# "hedge": return the first backend with results; "merge": combine all backends that answer in time
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hedge")
+# Seconds to wait for each backend; override per backend with SEARCH_TIMEOUT_<NAME>
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "8"))
+# A backend failing this many times in a row is skipped for SEARCH_BREAKER_COOLDOWN seconds
+BREAKER_FAILURES = int(os.getenv("SEARCH_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.getenv("SEARCH_BREAKER_COOLDOWN", "60"))
+
+_TRACKING_PARAMS = ("utm_", "gclid", "fbclid")
+
+
+def _format_results(results) -> str:
+    return "\n---\n".join(
+        f"Title: {r['title']}\nSnippet: {r['snippet']}\nLink: {r['link']}\n" for r in results)
+
+
+def _serper_results(query: str, num_results: int) -> list:
+    """Queries Serper and returns [{"title", "snippet", "link"}]; raises on failure."""
+    api_key = os.getenv("SEARCH_API_KEY")
+    if not api_key:
+        raise ValueError("SEARCH_API_KEY not found in environment variables. Please set it in a .env file.")
+
+    url = os.getenv("SERPER_API_URL") or "https://google.serper.dev/search"
+    headers = {
+        'X-API-KEY': api_key,
+        'Content-Type': 'application/json'
+    }
+    payload = json.dumps({"q": query, "num": num_results})
+
+    response = http_client.post(url, headers=headers, data=payload)
+    response.raise_for_status()  # Raise an exception for HTTP errors
+
+    results = []
+    for result in response.json().get("organic") or []:
+        title = result.get("title")
+        snippet = result.get("snippet")
+        link = result.get("link")
+        if title and snippet and link:
+            results.append({"title": title, "snippet": snippet, "link": link})
+    return results
+
+
+def _ddgs_results(query: str, num_results: int) -> list:
+    """Queries DuckDuckGo and returns [{"title", "snippet", "link"}]; raises on failure."""
+    from ddgs import DDGS  # pyright: ignore[reportMissingImports]
+
+    results = []
+
+    # DDGS 컨텍스트 매니저를 사용하여 검색 수행
+    with DDGS() as ddgs:
+        # region="wt-wt"는 전세계를 의미하며, 한국어 결과 위주라면 "kr-kr" 사용 가능
+        for r in ddgs.text(query, max_results=num_results, region="wt-wt"):
+            title = r.get("title")
+            snippet = r.get("body")  # DDG는 snippet 대신 body 키를 사용함
+            link = r.get("href")    # DDG는 link 대신 href 키를 사용함
+
+            if title and snippet and link:
+                results.append({"title": title, "snippet": snippet, "link": link})
+    return results
+
+
+# Search backends by name. A backend takes (query, num_results) and returns result dicts.
+BACKENDS = {
+    "ddgs": _ddgs_results,
+    "serper": _serper_results,
+}
 
 
 def search_web_serper(query: str, num_results: int = 20) -> str:
@@ -18,34 +90,13 @@ def search_web_serper(query: str, num_results: int = 20) -> str:
         or an error message if the search fails.
     """
 
-    api_key = os.getenv("SEARCH_API_KEY")
-    if not api_key:
-        return "Error: SEARCH_API_KEY not found in environment variables. Please set it in a .env file."
-
-    url = "https://google.serper.dev/search"
-    headers = {
-        'X-API-KEY': api_key,
-        'Content-Type': 'application/json'
-    }
-    payload = json.dumps({"q": query, "num": num_results})
-
     try:
-        response = requests.post(url, headers=headers, data=payload)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        search_results = response.json()
-
-        if search_results.get("organic"):
-            formatted_results = []
-            for result in search_results["organic"]:
-                title = result.get("title")
-                snippet = result.get("snippet")
-                link = result.get("link")
-                if title and snippet and link:
-                    formatted_results.append(
-                        f"Title: {title}\nSnippet: {snippet}\nLink: {link}\n")
-            return "\n---\n".join(formatted_results)
-        else:
+        results = _serper_results(query, num_results)
+        if not results:
             return "No organic search results found."
+        return _format_results(results)
+    except ValueError as e:
+        return f"Error: {e}"
     except requests.exceptions.RequestException as e:
         return f"Error performing web search: {e}"
     except Exception as e:
@@ -65,30 +116,139 @@ def search_web_ddgs(query: str, num_results: int = 5) -> str:
     """
 
     try:
-        formatted_results = []
+        results = _ddgs_results(query, num_results)
+        if not results:
+            return "No search results found on DuckDuckGo."
+        return _format_results(results)
 
-        # DDGS 컨텍스트 매니저를 사용하여 검색 수행
-        with DDGS() as ddgs:
-            # region="wt-wt"는 전세계를 의미하며, 한국어 결과 위주라면 "kr-kr" 사용 가능
-            results = ddgs.text(query, max_results=num_results, region="wt-wt")
+    except Exception as e:
+        return f"An error occurred during DuckDuckGo search: {e}"
 
-            for r in results:
-                title = r.get("title")
-                snippet = r.get("body")  # DDG는 snippet 대신 body 키를 사용함
-                link = r.get("href")    # DDG는 link 대신 href 키를 사용함
 
-                if title and snippet and link:
-                    formatted_results.append(
-                        f"Title: {title}\nSnippet: {snippet}\nLink: {link}\n"
-                    )
+class _CircuitBreaker:
+    """Skips a backend for a cooldown period after repeated consecutive failures."""
 
-        if not formatted_results:
-            return "No search results found on DuckDuckGo."
+    def __init__(self, max_failures, cooldown):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
 
-        return "\n---\n".join(formatted_results)
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.failures < self.max_failures:
+                return True
+            if now < self.open_until:
+                return False
+            # Half-open: this call is the one probe, and the breaker stays open for everyone
+            # else until it reports. A probe that never reports (e.g. one a hedged search
+            # stopped waiting for) is replaced by another after a further cooldown.
+            self.open_until = now + self.cooldown
+            return True
 
-    except Exception as e:
-        return f"An error occurred during DuckDuckGo search: {e}"
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.max_failures:
+                self.open_until = time.monotonic() + self.cooldown
+
+
+_breakers = {name: _CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN) for name in BACKENDS}
+
+# Backend calls run here; calls that miss their timeout finish in the background
+_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="web-search")
+# How often _run_backends checks whether a queued backend call has started
+QUEUED_POLL_SECONDS = 0.05
+
+
+def _configured_backends() -> list:
+    """Backends from SEARCH_BACKENDS, or DuckDuckGo plus Serper when an API key is set."""
+    names = os.getenv("SEARCH_BACKENDS", "")
+    if names.strip():
+        return [name.strip() for name in names.split(",") if name.strip() in BACKENDS]
+    return ["ddgs", "serper"] if os.getenv("SEARCH_API_KEY") else ["ddgs"]
+
+
+def _backend_timeout(name) -> float:
+    return float(os.getenv(f"SEARCH_TIMEOUT_{name.upper()}", SEARCH_TIMEOUT))
+
+
+def canonical_url(url: str) -> str:
+    """Normalizes a URL for deduplication (case, www., fragment, trailing slash, tracking params)."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith(_TRACKING_PARAMS))
+    return urlunsplit(("", host, parts.path.rstrip("/"), urlencode(query), ""))
+
+
+def merge_results(ranked_lists, num_results) -> list:
+    """Interleaves the backends' results rank by rank, dropping duplicate URLs."""
+    merged = []
+    seen = set()
+    for rank in range(max((len(results) for results in ranked_lists), default=0)):
+        for results in ranked_lists:
+            if rank >= len(results):
+                continue
+            key = canonical_url(results[rank]["link"])
+            if key not in seen:
+                seen.add(key)
+                merged.append(results[rank])
+    return merged[:num_results]
+
+
+def _run_backends(query, num_results, names, mode):
+    """Queries the backends concurrently; returns ({name: results}, {name: error})."""
+    answered = {}
+    errors = {}
+    started = {}  # name -> when its call began; time spent queued in _search_pool does not count
+
+    def call(name):
+        started[name] = time.monotonic()
+        return BACKENDS[name](query, num_results)
+
+    pending = {_search_pool.submit(call, name): name for name in names}
+
+    while pending:
+        now = time.monotonic()
+        for future, name in list(pending.items()):
+            if name in started and now - started[name] >= _backend_timeout(name):
+                del pending[future]
+                errors[name] = f"timed out after {_backend_timeout(name):g}s"
+                _breakers[name].record_failure()
+        if not pending:
+            break
+
+        deadlines = [started[name] + _backend_timeout(name) for name in pending.values() if name in started]
+        if len(deadlines) < len(pending):
+            # A call still waiting for a pool thread gets its deadline once it starts
+            deadlines.append(now + QUEUED_POLL_SECONDS)
+        done, _ = wait(pending, timeout=max(0, min(deadlines) - now), return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future)
+            try:
+                results = future.result()
+            except Exception as e:
+                errors[name] = str(e)
+                _breakers[name].record_failure()
+                continue
+            _breakers[name].record_success()
+            if results:
+                answered[name] = results
+                if mode == "hedge":
+                    # First good answer wins; slower backends finish in the background
+                    return answered, errors
+
+    return answered, errors
 
 
 def search_web(query: str, num_results: int = 20) -> str:
@@ -104,7 +264,19 @@ def search_web(query: str, num_results: int = 20) -> str:
         A formatted string containing title, snippet, and link.
     """
 
-    return search_web_ddgs(query, num_results)
+    names = [name for name in _configured_backends() if _breakers[name].allow()]
+    if not names:
+        return "Error performing web search: all search backends are temporarily disabled after repeated failures."
+
+    answered, errors = _run_backends(query, num_results, names, SEARCH_MODE)
+    if answered:
+        # Keep the configured backend order so ranks interleave deterministically
+        ranked_lists = [answered[name] for name in names if name in answered]
+        return _format_results(merge_results(ranked_lists, num_results))
+    if errors:
+        details = "; ".join(f"{name}: {errors[name]}" for name in names if name in errors)
+        return f"Error performing web search: {details}"
+    return "No search results found."
 
 
 if __name__ == "__main__":
@@ -113,6 +285,6 @@ if __name__ == "__main__":
     # from dotenv import load_dotenv
     # load_dotenv()
     # print(search_web_serper("what is the weather like in Seoul"))
-    print(search_web_ddg("what is the weather like in Seoul"))
+    print(search_web_ddgs("what is the weather like in Seoul"))
 
     pass
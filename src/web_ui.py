@@ -1,7 +1,9 @@
-from src.agent_core import MyAgent
+from src.agent_core import AIStreamEvent, MyAgent
+from src.session_store import SessionStore
 from src.tools.tool_definitions import doc_manager
 import streamlit as st  # pyright: ignore[reportMissingImports]
 import os
+import uuid
 
 
 st.set_page_config(
@@ -20,13 +22,26 @@ if "my_agent_instance" not in st.session_state:
 
 agent = st.session_state.my_agent_instance
 
+
+@st.cache_resource
+def get_session_store(_agent):
+    # Shared by all browser tabs; sessions are bounded in memory and persisted to disk
+    return SessionStore(_agent)
+
+
+session_store = get_session_store(agent)
+
+# The session id lives in the URL so a conversation survives reloads and restarts
+if "sid" not in st.query_params:
+    st.query_params["sid"] = uuid.uuid4().hex
+session_key = f"web:{st.query_params['sid']}"
+
+# Get or rehydrate the chat session
+chat_session = session_store.get(session_key)
+
 # Initialize chat history
 if "messages" not in st.session_state:
-    st.session_state.messages = []
-
-# Initialize chat session if it doesn't exist
-if "chat_session" not in st.session_state:
-    st.session_state.chat_session = agent.create_session()
+    st.session_state.messages = agent.session_history(chat_session)
 
 
 # Use a container to hold messages
@@ -49,14 +64,18 @@ if st.session_state.get("show_doc_in_chat_trigger"):
         with st.spinner("my_agent is reading..."):
             # Send to agent as if user typed it
             user_prompt_for_agent = f"Please output the content of the file at '{selected_doc}'."
-            _ = agent.send_message(
-                user_prompt_for_agent, st.session_state.chat_session)
+            try:
+                _ = agent.send_message(user_prompt_for_agent, chat_session)
+            except BaseException:
+                session_store.discard(session_key)
+                raise
+            session_store.save(session_key, chat_session)
 
 # User input (this will naturally sit below the container if it doesn't float)
 if prompt := st.chat_input("Ask my_agent a question or give a command..."):
     if prompt.strip() == "/clear":
         st.session_state.messages = []
-        st.session_state.chat_session = agent.create_session()
+        session_store.reset(session_key)
         st.rerun()
 
     st.session_state.messages.append({"role": "user", "content": prompt})
@@ -65,25 +84,42 @@ if prompt := st.chat_input("Ask my_agent a question or give a command..."):
         with st.chat_message("user"):
             st.markdown(prompt)
 
-    with st.spinner("my_agent is thinking..."):
-        # agent_core의 send_message 호출
-        response_obj = agent.send_message(
-            prompt, st.session_state.chat_session)
-
-        full_response_content = ""
-
-        with msg_container:
-            with st.chat_message("assistant"):
-                if hasattr(response_obj, 'candidates') and response_obj.candidates:
-                    for part in response_obj.candidates[0].content.parts:
-                        if part.text:
-                            st.markdown(part.text)
-                            full_response_content += part.text
-                else:
-                    st.error(getattr(response_obj, 'text',
-                                     "Unknown Error Occurred"))
-                    full_response_content = getattr(
-                        response_obj, 'text', "")
+    full_response_content = ""
+
+    with msg_container:
+        with st.chat_message("assistant"):
+            status = st.status("my_agent is thinking...", expanded=False)
+            placeholder = st.empty()
+            response_obj = None
+
+            # Render text deltas as soon as they arrive
+            try:
+                for event in agent.stream_message(prompt, chat_session):
+                    if event.type == AIStreamEvent.TEXT:
+                        full_response_content += event.text
+                        placeholder.markdown(full_response_content + "▌")
+                    elif event.type == AIStreamEvent.TOOL_CALL:
+                        status.write(f"🛠️ Tool Called: `{event.function_call.name}`")
+                        if full_response_content and not full_response_content.endswith("\n"):
+                            full_response_content += "\n\n"
+                    elif event.type == AIStreamEvent.DONE:
+                        response_obj = event.response
+            except BaseException:
+                # A failed turn, or Streamlit stopping or rerunning the script mid tool loop,
+                # leaves half a turn in the session; fall back to the last saved state
+                session_store.discard(session_key)
+                raise
+
+            status.update(label="Done", state="complete")
+
+            if response_obj is not None and response_obj.candidates:
+                placeholder.markdown(full_response_content)
+            else:
+                placeholder.error(getattr(response_obj, 'text',
+                                          "Unknown Error Occurred"))
+                full_response_content = getattr(response_obj, 'text', "")
+
+    session_store.save(session_key, chat_session)
 
     st.session_state.messages.append(
         {"role": "assistant", "content": full_response_content})
@@ -91,24 +127,24 @@ if prompt := st.chat_input("Ask my_agent a question or give a command..."):
 
 st.sidebar.title("🤖 My Agent")
 
+# Longest document list rendered in the explorer selectbox
+MAX_EXPLORER_DOCS = 1000
+
 
 @st.fragment
 def document_explorer():
     st.subheader("Existing Documents")
 
-    docs_raw = doc_manager.list_docs()
-    # 빈 줄 제외, 리스트 변환 및 정렬하여 순서 보장
-    documents_list = sorted([d.strip()
-                             for d in docs_raw.split('\n') if d.strip()]) if docs_raw else []
-
-    if documents_list and documents_list[0] != "No documents found.":
-        # Extract unique folders and sort them
-        folder_set = set()
-        for d in documents_list:
-            folder = os.path.dirname(d)
-            folder_set.add(folder if folder else ".")
+    # The tree's version changes only when documents change, so the derived
+    # lists are rebuilt only then instead of on every rerun.
+    tree = doc_manager.tree
+    if st.session_state.get("docs_version") != tree.version:
+        st.session_state.docs_version = tree.version
+        st.session_state.docs_folders = ["All"] + tree.folders()
+        st.session_state.docs_filtered = {}
 
-        folders = ["All"] + sorted(list(folder_set))
+    if len(tree):
+        folders = st.session_state.docs_folders
 
         # 1. 전용 세션 상태 변수 초기화 및 값 유지
         if "last_folder" not in st.session_state:
@@ -138,17 +174,21 @@ def document_explorer():
             key="doc_filter_input"
         ).lower()
 
-        # Filter by folder
-        if selected_folder != "All":
-            filtered_docs = [
-                d for d in documents_list if (os.path.dirname(d) or ".") == selected_folder]
-        else:
-            filtered_docs = documents_list
-
-        # 필터링 적용 (Search query)
-        if filter_query:
-            filtered_docs = [
-                doc for doc in filtered_docs if filter_query in doc.lower()]
+        # Filter by folder and search query, memoized per docs version
+        cache_key = (selected_folder, filter_query)
+        filtered_docs = st.session_state.docs_filtered.get(cache_key)
+        if filtered_docs is None:
+            filtered_docs, _ = tree.list(folder=None if selected_folder == "All" else selected_folder)
+            # 필터링 적용 (Search query)
+            if filter_query:
+                filtered_docs = [
+                    doc for doc in filtered_docs if filter_query in doc.lower()]
+            st.session_state.docs_filtered[cache_key] = filtered_docs
+
+        if len(filtered_docs) > MAX_EXPLORER_DOCS:
+            st.caption(f"Showing the first {MAX_EXPLORER_DOCS} of {len(filtered_docs)} documents. "
+                       "Narrow the list with the folder or the filter.")
+            filtered_docs = filtered_docs[:MAX_EXPLORER_DOCS]
 
         if filtered_docs:
             # 2. 문서 선택 상태 유지
@@ -172,7 +212,12 @@ def document_explorer():
             )
 
             if selected_doc:
-                doc_content = doc_manager.read_doc(selected_doc)
+                # Re-read the document only when it changed (one stat instead of a full read)
+                doc_key = (selected_doc, doc_manager.storage.stat(selected_doc))
+                if st.session_state.get("doc_view_key") != doc_key:
+                    st.session_state.doc_view_key = doc_key
+                    st.session_state.doc_view_content = doc_manager.read_doc(selected_doc)
+                doc_content = st.session_state.doc_view_content
                 st.text_area(f"Content of {selected_doc}",
                              doc_content, height=600)
 
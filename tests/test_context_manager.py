@@ -0,0 +1,50 @@
+from src.context_manager import (
+    STUB_PREFIX, SUMMARY_PREFIX, SUMMARY_REMOVED, ContextManager, OpenAIMessageAdapter)
+
+
+def turn(n, tool_chars=0):
+    messages = [{"role": "user", "content": f"question {n}"}]
+    if tool_chars:
+        messages.append({"role": "assistant", "content": "", "tool_calls": [
+            {"id": f"c{n}", "type": "function", "function": {"name": "read_doc", "arguments": "{}"}}]})
+        messages.append({"role": "tool", "tool_call_id": f"c{n}", "name": "read_doc", "content": "x" * tool_chars})
+    messages.append({"role": "assistant", "content": f"answer {n}"})
+    return messages
+
+
+def session_of(turns, tool_chars=0):
+    session = [{"role": "system", "content": "You are a test."}]
+    for n in range(turns):
+        session += turn(n, tool_chars)
+    return session
+
+
+def test_under_budget_nothing_changes():
+    session = session_of(3, tool_chars=100)
+    before = [dict(m) for m in session]
+    ContextManager(OpenAIMessageAdapter(), token_budget=10000, keep_turns=2).compact(session)
+    assert session == before
+
+
+def test_old_tool_results_are_stubbed_first():
+    session = session_of(4, tool_chars=2000)
+    manager = ContextManager(OpenAIMessageAdapter(), token_budget=1200, keep_turns=2, stub_chars=50)
+    total = manager.compact(session)
+    tool_results = [m["content"] for m in session if m["role"] == "tool"]
+    assert all(r.startswith(STUB_PREFIX) for r in tool_results[:2])
+    assert tool_results[2:] == ["x" * 2000] * 2
+    assert len(session) == len(session_of(4, tool_chars=2000))
+    assert total <= 1200
+
+
+def test_old_turns_are_dropped_keeping_system_prompt_and_recent_turns():
+    session = session_of(6, tool_chars=400)
+    recent = [dict(m) for m in session[-2 * 4:]]  # last two turns, four messages each
+    manager = ContextManager(OpenAIMessageAdapter(), token_budget=300, keep_turns=2, stub_chars=20)
+    manager.compact(session)
+
+    assert session[0] == {"role": "system", "content": "You are a test."}
+    assert session[1]["content"] == f"{SUMMARY_PREFIX}\n{SUMMARY_REMOVED}"
+    assert session[2:] == recent
+    # Tool calls are never separated from their results
+    assert session[2]["role"] == "user"
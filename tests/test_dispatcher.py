@@ -0,0 +1,143 @@
+import asyncio
+import pytest
+from src.dispatcher import UserDispatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def started(**kwargs):
+    dispatcher = UserDispatcher(**kwargs)
+    await dispatcher.start()
+    return dispatcher
+
+
+def test_jobs_of_one_user_run_in_order():
+    async def main():
+        dispatcher = await started(workers=4, max_queue=10, rate=100, burst=10)
+        order = []
+
+        def job(n, delay):
+            async def run_job():
+                await asyncio.sleep(delay)
+                order.append(n)
+            return run_job
+
+        for n, delay in enumerate([0.05, 0.0, 0.02]):
+            assert dispatcher.submit("u", job(n, delay)) == UserDispatcher.ACCEPTED
+        while dispatcher.pending("u"):
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        return order
+
+    assert run(main()) == [0, 1, 2]
+
+
+def test_users_run_concurrently():
+    async def main():
+        dispatcher = await started(workers=2, rate=100, burst=10)
+        both = asyncio.Barrier(2)
+
+        async def job():
+            await asyncio.wait_for(both.wait(), 2)
+
+        dispatcher.submit("a", job)
+        dispatcher.submit("b", job)
+        while dispatcher.pending("a") or dispatcher.pending("b"):
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        return both.n_waiting
+
+    assert run(main()) == 0
+
+
+def test_queue_full_and_rate_limited():
+    async def main():
+        dispatcher = await started(workers=1, max_queue=2, rate=0.001, burst=3)
+        gate = asyncio.Event()
+
+        async def job():
+            await gate.wait()
+
+        results = [dispatcher.submit("u", job) for _ in range(3)]
+        # The queue is freed, but the bucket has only one token left
+        gate.set()
+        while dispatcher.pending("u"):
+            await asyncio.sleep(0.01)
+        results += [dispatcher.submit("u", job) for _ in range(2)]
+        await dispatcher.stop()
+        return results
+
+    assert run(main()) == [UserDispatcher.ACCEPTED, UserDispatcher.ACCEPTED, UserDispatcher.QUEUE_FULL,
+                           UserDispatcher.ACCEPTED, UserDispatcher.RATE_LIMITED]
+
+
+def test_cancel_stops_the_running_job_only():
+    async def main():
+        dispatcher = await started(workers=1, rate=100, burst=10)
+        events = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                events.append("cancelled")
+                raise
+
+        async def next_job():
+            events.append("next")
+
+        dispatcher.submit("u", slow)
+        dispatcher.submit("u", next_job)
+        await asyncio.sleep(0.05)
+        assert dispatcher.cancel("u")
+        while dispatcher.pending("u"):
+            await asyncio.sleep(0.01)
+        assert not dispatcher.cancel("u")
+        await dispatcher.stop()
+        return events
+
+    assert run(main()) == ["cancelled", "next"]
+
+
+def test_forget_drops_rate_limit_state():
+    async def main():
+        dispatcher = await started(workers=1, rate=0.001, burst=1)
+
+        async def job():
+            pass
+
+        first = dispatcher.submit("u", job)
+        limited = dispatcher.submit("u", job)
+        dispatcher.forget("u")
+        again = dispatcher.submit("u", job)
+        await dispatcher.stop()
+        return first, limited, again
+
+    assert run(main()) == (UserDispatcher.ACCEPTED, UserDispatcher.RATE_LIMITED, UserDispatcher.ACCEPTED)
+
+
+@pytest.mark.parametrize("idle", [True, False])
+def test_idle_full_buckets_are_pruned(idle):
+    async def main():
+        dispatcher = await started(workers=1, rate=1000, burst=1)
+        dispatcher._prune_at = 3
+        gate = asyncio.Event()
+
+        async def job():
+            await gate.wait()
+
+        if idle:
+            gate.set()
+        for user in range(3):
+            dispatcher.submit(user, job)
+        await asyncio.sleep(0.05)
+        dispatcher.submit("new", job)
+        count = len(dispatcher._buckets)
+        gate.set()
+        await dispatcher.stop()
+        return count
+
+    # Only users with nothing queued or running lose their bucket
+    assert run(main()) == (1 if idle else 4)
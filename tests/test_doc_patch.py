@@ -0,0 +1,39 @@
+import pytest
+from src.tools.doc_patch import PatchError, apply_unified_diff
+
+
+TEXT = "one\ntwo\nthree\nfour\nfive\n"
+
+
+def test_applies_a_hunk():
+    diff = "--- a/x.md\n+++ b/x.md\n@@ -2,2 +2,2 @@\n two\n-three\n+THREE\n"
+    assert apply_unified_diff(TEXT, diff) == "one\ntwo\nTHREE\nfour\nfive\n"
+
+
+def test_tolerates_wrong_line_numbers_and_bare_headers():
+    assert apply_unified_diff(TEXT, "@@ -40,1 +40,1 @@\n-four\n+4\n") == "one\ntwo\nthree\n4\nfive\n"
+    assert apply_unified_diff(TEXT, "@@ @@\n five\n+six\n") == TEXT + "six\n"
+
+
+def test_applies_several_hunks_in_order():
+    diff = "@@ -1,1 +1,2 @@\n one\n+one and a half\n@@ -5,1 +6,1 @@\n-five\n+5\n"
+    assert apply_unified_diff(TEXT, diff) == "one\none and a half\ntwo\nthree\nfour\n5\n"
+
+
+def test_tolerates_trailing_whitespace():
+    # Matched context lines are written back as the diff has them
+    assert apply_unified_diff("a  \nb\n", "@@ -1,2 +1,2 @@\n a\n-b\n+c\n") == "a\nc\n"
+
+
+def test_keeps_a_missing_final_newline():
+    assert apply_unified_diff("a\nb", "@@ -2 +2 @@\n-b\n+c\n\\ No newline at end of file\n") == "a\nc"
+
+
+@pytest.mark.parametrize("diff, message", [
+    ("just text\n", "No hunks found"),
+    ("@@ -1 +1 @@\n-missing\n+x\n", "does not match"),
+    ("@@ -1 +1 @@\n*one\n", "Unexpected line"),
+])
+def test_rejects_bad_diffs(diff, message):
+    with pytest.raises(PatchError, match=message):
+        apply_unified_diff(TEXT, diff)
@@ -0,0 +1,84 @@
+import threading
+import pytest
+from src.tools import doc_storage
+from src.tools.doc_locks import DocLocks
+from src.tools.doc_storage import FileStorage, SQLiteStorage
+from src.tools.doc_tree import DocTree
+
+
+@pytest.fixture(params=["files", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "files":
+        return FileStorage(tmp_path / "docs")
+    return SQLiteStorage(tmp_path / "docs.sqlite3")
+
+
+def test_write_read_rename_delete(storage):
+    storage.write_bytes("notes/a.md", b"alpha")
+    assert storage.read_bytes("notes/a.md") == b"alpha"
+    assert storage.is_dir("notes") and storage.is_file("notes/a.md")
+    storage.rename("notes", "archive")
+    assert list(storage.scan()) == ["archive/a.md"]
+    assert list(storage.scan("archive")) == ["archive/a.md"]
+    storage.write_bytes("b.md", b"")
+    with pytest.raises(FileExistsError):
+        storage.rename("b.md", "archive/a.md")
+    storage.delete("archive/a.md")
+    assert storage.stat("archive/a.md") is None
+
+
+def test_sqlite_tree_sees_other_connections(tmp_path, monkeypatch):
+    db = tmp_path / "docs.sqlite3"
+    writer, reader = SQLiteStorage(db), SQLiteStorage(db)
+    tree = DocTree(tmp_path / "docs", storage=reader)
+
+    writer.write_bytes("notes/x.md", b"x")
+    writer.write_bytes("a.md", b"a")
+    assert tree.list() == (["a.md", "notes/x.md"], 2)
+
+    writer.rename("notes", "archive")
+    writer.delete("a.md")
+    assert tree.list() == (["archive/x.md"], 1)
+    assert tree.folders() == ["archive"]
+
+    # Once the log no longer reaches back, the tree re-scans
+    monkeypatch.setattr(doc_storage, "CHANGE_LOG_SIZE", 2)
+    for n in range(4):
+        writer.write_bytes(f"bulk/{n}.md", b"")
+    assert tree.list(prefix="bulk/")[1] == 4
+
+
+def test_write_locks_exclude_each_other(tmp_path):
+    locks = DocLocks(tmp_path / "locks")
+    inside = []
+    overlaps = []
+
+    def worker():
+        for _ in range(50):
+            with locks.write("a.md"):
+                inside.append(1)
+                overlaps.append(len(inside) > 1)
+                inside.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(overlaps) == 200 and not any(overlaps)
+
+
+def test_read_locks_are_shared(tmp_path):
+    locks = DocLocks(tmp_path / "locks")
+    both = threading.Barrier(2, timeout=5)
+
+    def reader():
+        with locks.read("a.md"):
+            both.wait()
+
+    threads = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not both.broken
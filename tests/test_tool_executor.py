@@ -0,0 +1,87 @@
+import time
+import asyncio
+import threading
+from src.tool_executor import ToolCall, ToolExecutor
+
+
+def make_executor(log, delays=None):
+    """Fake document tools that record the order in which they ran."""
+    lock = threading.Lock()
+    delays = delays or {}
+
+    def record(name, filepath, **kwargs):
+        time.sleep(delays.get(filepath, 0))
+        with lock:
+            log.append((name, filepath))
+        return f"{name}:{filepath}"
+
+    def write_doc(filepath, content=""):
+        return record("write_doc", filepath)
+
+    def read_doc(filepath):
+        return record("read_doc", filepath)
+
+    def rename_doc(filepath, new_name):
+        return record("rename_doc", filepath)
+
+    def now():
+        return "now"
+
+    return ToolExecutor([write_doc, read_doc, rename_doc, now], max_workers=4)
+
+
+def test_results_keep_call_order():
+    log = []
+    executor = make_executor(log, delays={"slow.md": 0.2})
+    calls = [ToolCall("read_doc", {"filepath": "slow.md"}), ToolCall("read_doc", {"filepath": "fast.md"}),
+             ToolCall("now", {})]
+    assert executor.run(calls) == ["read_doc:slow.md", "read_doc:fast.md", "now"]
+    # The fast call did not wait for the slow one
+    assert log[0] == ("read_doc", "fast.md")
+
+
+def test_calls_on_one_path_run_in_order():
+    log = []
+    executor = make_executor(log, delays={"a.md": 0.05})
+    calls = [ToolCall("write_doc", {"filepath": "a.md"}), ToolCall("read_doc", {"filepath": "./A.md"}),
+             ToolCall("write_doc", {"filepath": "a.md"})]
+    executor.run(calls)
+    assert log == [("write_doc", "a.md"), ("read_doc", "./A.md"), ("write_doc", "a.md")]
+
+
+def test_independent_paths_run_in_parallel():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def read_doc(filepath):
+        barrier.wait()  # Breaks (and raises) if the two calls ran one after the other
+        return filepath
+
+    executor = ToolExecutor([read_doc], max_workers=2)
+    calls = [ToolCall("read_doc", {"filepath": "a.md"}), ToolCall("read_doc", {"filepath": "b.md"})]
+    assert executor.run(calls) == ["a.md", "b.md"]
+
+
+def test_rename_joins_the_lanes_of_both_paths():
+    executor = make_executor([])
+    calls = [ToolCall("write_doc", {"filepath": "dir/old.md"}), ToolCall("write_doc", {"filepath": "dir/new.md"}),
+             ToolCall("rename_doc", {"filepath": "dir/old.md", "new_name": "new.md"}),
+             ToolCall("read_doc", {"filepath": "other.md"})]
+    assert executor._lanes(calls) == [[0, 1, 2], [3]]
+
+
+def test_run_async_matches_run():
+    log = []
+    executor = make_executor(log, delays={"slow.md": 0.1})
+    calls = [ToolCall("write_doc", {"filepath": "slow.md"}), ToolCall("read_doc", {"filepath": "x.md"}),
+             ToolCall("read_doc", {"filepath": "slow.md"})]
+    results = asyncio.run(executor.run_async(calls))
+    assert results == ["write_doc:slow.md", "read_doc:x.md", "read_doc:slow.md"]
+    assert log.index(("write_doc", "slow.md")) < log.index(("read_doc", "slow.md"))
+
+
+def test_bad_calls_become_error_results():
+    executor = make_executor([])
+    results = executor.run([ToolCall("missing", {}), ToolCall("read_doc", ["a.md"]), ToolCall("now", None)])
+    assert results[0] == "Error: Unknown tool missing"
+    assert results[1].startswith("Error executing read_doc")
+    assert results[2] == "now"
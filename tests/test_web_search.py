@@ -0,0 +1,70 @@
+import time
+import pytest
+from src.tools import web_search_utils as search
+
+
+def result(link):
+    return {"title": link, "link": link, "snippet": ""}
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    """Replaces the search backends with fakes: name -> (delay seconds, results or exception)."""
+    def install(**specs):
+        def backend(name):
+            delay, outcome = specs[name]
+
+            def call(query, num_results):
+                time.sleep(delay)
+                if isinstance(outcome, Exception):
+                    raise outcome
+                return outcome
+            return call
+
+        monkeypatch.setattr(search, "BACKENDS", {name: backend(name) for name in specs})
+        monkeypatch.setattr(search, "_breakers", {name: search._CircuitBreaker(2, 60) for name in specs})
+        for name in specs:
+            monkeypatch.setenv(f"SEARCH_TIMEOUT_{name.upper()}", "0.5")
+    return install
+
+
+def test_hedge_returns_the_first_backend_with_results(backends):
+    backends(fast=(0.0, [result("https://a.com")]), slow=(0.3, [result("https://b.com")]))
+    started = time.monotonic()
+    answered, errors = search._run_backends("q", 5, ["slow", "fast"], "hedge")
+    assert list(answered) == ["fast"] and not errors
+    assert time.monotonic() - started < 0.25
+
+
+def test_hedge_skips_empty_and_failing_backends(backends):
+    backends(empty=(0.0, []), broken=(0.0, RuntimeError("down")), good=(0.1, [result("https://a.com")]))
+    answered, errors = search._run_backends("q", 5, ["empty", "broken", "good"], "hedge")
+    assert list(answered) == ["good"]
+    assert errors == {"broken": "down"}
+
+
+def test_merge_interleaves_and_deduplicates(backends):
+    backends(one=(0.0, [result("https://www.a.com/x/"), result("https://b.com")]),
+             two=(0.05, [result("https://a.com/x?utm_source=feed"), result("https://c.com")]))
+    answered, _ = search._run_backends("q", 5, ["one", "two"], "merge")
+    merged = search.merge_results([answered["one"], answered["two"]], 10)
+    assert [r["link"] for r in merged] == ["https://www.a.com/x/", "https://b.com", "https://c.com"]
+
+
+def test_slow_backend_times_out(backends):
+    backends(stuck=(2.0, [result("https://a.com")]), good=(0.0, [result("https://b.com")]))
+    answered, errors = search._run_backends("q", 5, ["stuck", "good"], "merge")
+    assert list(answered) == ["good"]
+    assert errors == {"stuck": "timed out after 0.5s"}
+
+
+def test_breaker_opens_and_lets_one_probe_through():
+    breaker = search._CircuitBreaker(max_failures=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()